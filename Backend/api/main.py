@@ -1,10 +1,35 @@
+import os
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.routes.sales import router as sales 
 from api.routes.model import router as models
 
-app = FastAPI(title="AI Sales Advisor API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Índices declarados en los modelos (p. ej. ventas(sale_date, invoice_number)); idempotente
+    try:
+        from database import engine
+        from repositories.sale_repository import SaleRepository
+        SaleRepository.ensure_indexes(engine)
+    except Exception as e:
+        print(f"[WARN] no se pudieron verificar los índices: {e}")
+
+    # Precarga opcional de modelos/scalers en el registro (MODEL_PRELOAD=1)
+    if os.getenv("MODEL_PRELOAD", "0").lower() in ("1", "true", "yes"):
+        from services.model_service import ModelService
+        print(ModelService.warmup())
+
+    # Rollup diario de ventas al día en segundo plano (SALES_ROLLUP_INTERVAL; las lecturas no lo actualizan)
+    from database import SessionLocal
+    from services.rollup_job import RollupJob
+    rollup_job = RollupJob.from_env(SessionLocal).start()
+    yield
+    rollup_job.stop()
+
+app = FastAPI(title="AI Sales Advisor API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,15 +1,168 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from services.model_service import ModelService
-from database import get_db
+from services.global_model_service import GlobalModelService
+from services.baseline_service import BaselineService
+from services.champion_service import ChampionService
+from services.model_registry import model_registry
+from services.forecast_cache import forecast_cache
+from services.forecast_encoding import ForecastEncoding
+from services.training_jobs import training_jobs
+from database import get_db, SessionLocal
 
 router = APIRouter()
 
+class BuildJobRequest(BaseModel):
+    products: Optional[List[str]] = None
+    workers: Optional[int] = None
+    force: bool = False
+    incremental: bool = False
+    tiered: bool = False
+
 @router.get("/build")
-def build_models(db: Session = Depends(get_db)):
-    return ModelService.build_models(db)
+def build_models(workers: Optional[int] = None, force: bool = False, incremental: bool = False, tiered: bool = False,
+                 db: Session = Depends(get_db)):
+    return ModelService.build_models(db, workers=workers, force=force, incremental=incremental, tiered=tiered)
+
+@router.post("/build/jobs")
+def submit_build_job(req: BuildJobRequest):
+    """Lanza un build en segundo plano para un subconjunto de productos."""
+    return training_jobs.submit(req.products, workers=req.workers, force=req.force, incremental=req.incremental,
+                                tiered=req.tiered)
+
+@router.get("/build/jobs")
+def list_build_jobs():
+    return training_jobs.list()
+
+@router.get("/build/jobs/{job_id}")
+def build_job_status(job_id: str):
+    """Estado y avance por producto (épocas, loss actual) del job."""
+    job = training_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job
+
+@router.post("/build/jobs/{job_id}/cancel")
+def cancel_build_job(job_id: str):
+    job = training_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    return job
+
+@router.get("/build/jobs/{job_id}/result")
+def build_job_result(job_id: str):
+    """Métricas y resumen finales (mismo formato que /models/build)."""
+    job = training_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job no encontrado")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job en estado '{job['status']}'")
+    return training_jobs.result(job_id)
+
+@router.get("/build/global")
+def build_global_models(force: bool = False, db: Session = Depends(get_db)):
+    """Entrena un modelo por arquitectura compartido por todos los productos."""
+    return GlobalModelService.build(db, force=force)
+
+def product_filter(products):
+    """Acepta ?products=P001&products=P002 o ?products=P001,P002."""
+    if not products:
+        return None
+    return [p.strip() for item in products for p in item.split(",") if p.strip()]
 
 @router.get("/predict")
-def predict(db: Session = Depends(get_db)):
-    return ModelService.predict(db)
+def predict(request: Request, mode: str = "product", products: Optional[List[str]] = Query(None), offset: int = 0,
+            limit: Optional[int] = None, format: Optional[str] = None, compare: bool = False, db: Session = Depends(get_db)):
+    """
+    Por defecto sólo la arquitectura campeona de cada producto; compare=true trae todas (comparación).
+    format: "json" (por defecto), "compact" (histórico una vez por producto, floats float32 en base64)
+    o "msgpack" (también con Accept: application/x-msgpack). Comprime con br/gzip según Accept-Encoding.
+    mode: "product", "global", "baseline" (tier estadístico) o "auto" (redes para la cabeza, tier estadístico para la cola).
+    """
+    if mode not in ("product", "global", "baseline", "auto"):
+        raise HTTPException(status_code=400, detail="mode debe ser 'product', 'global', 'baseline' o 'auto'")
+    try:
+        fmt = ForecastEncoding.negotiate(request.headers.get("accept", ""), format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = ModelService.predict(db, mode=mode, products=product_filter(products), offset=offset, limit=limit, compare=compare)
+    try:
+        body, media_type, content_encoding = ForecastEncoding.encode(rows, fmt, request.headers.get("accept-encoding", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@router.get("/predict/stream")
+async def predict_stream(request: Request, products: Optional[List[str]] = Query(None), offset: int = 0,
+                         limit: Optional[int] = None, compare: bool = False):
+    """
+    Forecast en NDJSON: una línea por (producto, arquitectura) apenas termina,
+    precedida por una línea "meta" (productos de la página) y seguida de "end".
+    Si el cliente se desconecta se cierra el generador y no se procesan más bloques.
+    """
+    async def lines():
+        db = SessionLocal()  # sesión propia: vive lo mismo que la respuesta
+        events = ModelService.iter_predict(db, product_filter(products), offset, limit, compare=compare)
+        try:
+            while not await request.is_disconnected():
+                event = await run_in_threadpool(next, events, None)
+                if event is None:
+                    break
+                yield ForecastEncoding.dumps_json(event) + b"\n"
+        finally:
+            events.close()
+            db.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/tiers")
+def product_tiers(products: Optional[List[str]] = Query(None), db: Session = Depends(get_db)):
+    """Tier de cada producto (redes o estadístico) según intermitencia y volumen."""
+    return BaselineService.tiers(db, product_filter(products))
+
+@router.get("/champions")
+def champions():
+    """Campeón por producto, la métrica usada y los puntajes de cada arquitectura."""
+    return ChampionService.load()
+
+@router.post("/champions/refresh")
+def refresh_champions(products: Optional[List[str]] = Query(None), db: Session = Depends(get_db)):
+    """Backtest de las cuatro arquitecturas y actualización de los campeones."""
+    try:
+        return ChampionService.refresh(db, product_filter(products))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/global/benchmark")
+def global_benchmark(db: Session = Depends(get_db)):
+    """Métricas de validación del modelo global vs. los modelos por producto."""
+    result = GlobalModelService.benchmark(db)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No hay modelos globales entrenados")
+    return result
+
+@router.get("/registry")
+def registry_stats():
+    """Contadores del registro de modelos en memoria (hits/misses/evictions)."""
+    return model_registry.stats()
+
+@router.post("/registry/warmup")
+def registry_warmup(compare: bool = False):
+    return ModelService.warmup(compare=compare)
+
+@router.get("/cache")
+def forecast_cache_stats():
+    return forecast_cache.stats()
 
+@router.delete("/cache")
+def forecast_cache_clear():
+    forecast_cache.clear()
+    return forecast_cache.stats()
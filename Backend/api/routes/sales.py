@@ -1,11 +1,42 @@
-from fastapi import APIRouter, Depends
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.orm import Session
 from services.sale_service import SaleService
+from services.period_service import PeriodService
+from services.ingest_service import IngestService
 from database import get_db
 
 router = APIRouter()
 
 @router.get("/dashboard")
-def get_dashboard_summary(db: Session = Depends(get_db)):
+def get_dashboard_summary(reference_date: Optional[date] = None, range_type: str = "Trimestre", db: Session = Depends(get_db)):
     """Devuelve el resumen del dashboard de ventas."""
-    return SaleService.getDashboardSummary(db)
+    if range_type not in ("Trimestre", "cuatrimestre", "semestre"):
+        raise HTTPException(status_code=400, detail="range_type debe ser 'Trimestre', 'cuatrimestre' o 'semestre'")
+    return SaleService.getDashboardSummary(db, reference_date=reference_date, range_type=range_type)
+
+@router.get("/periods")
+def compare_periods(granularity: str = "quarter", reference_date: Optional[date] = None, periods: int = 3,
+                    daily_start: Optional[date] = None, daily_end: Optional[date] = None, db: Session = Depends(get_db)):
+    """
+    Compara los últimos 'periods' periodos (day/week/month/quarter/4-month/half/year) hasta
+    reference_date, con serie diaria año contra año para [daily_start, daily_end].
+    """
+    try:
+        return PeriodService.compare(db, granularity, reference_date, periods, daily_start, daily_end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/ingest")
+def ingest_sales(file: UploadFile = File(...), format: Optional[str] = None, on_invalid: str = "skip",
+                 on_duplicate: str = "skip", dry_run: bool = False, db: Session = Depends(get_db)):
+    """
+    Carga masiva de líneas de factura (CSV o Parquet, columnas con los nombres de Sale) en 'ventas'.
+    Retorna filas leídas/insertadas/rechazadas, repetidas, errores de validación y filas por segundo.
+    """
+    try:
+        return IngestService.ingest(db, file.file, fmt=format, filename=file.filename, on_invalid=on_invalid,
+                                    on_duplicate=on_duplicate, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,102 @@
+"""
+Runtime de inferencia: NumPy (.npw, sin TensorFlow) contra Keras (.keras).
+
+Mide por arquitectura, en un proceso nuevo por variante:
+- arranque en frío: importar el servicio + cargar el modelo + primer pronóstico,
+- RSS pico del proceso,
+- latencia por pronóstico (mediana de --repeat llamadas de HORIZON pasos),
+- diferencia máxima contra Keras (sólo la variante numpy).
+
+Uso (desde Backend/):
+    python -m benchmarks.inference_runtime                    # primer producto entrenado
+    python -m benchmarks.inference_runtime --product P001 --archs MLP LSTM
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+RUNTIMES = ("numpy", "keras")
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux: KB
+
+
+def run_variant(runtime, arch, product, MODELS_DIR, repeat):
+    """Corre una variante en este proceso (INFERENCE_RUNTIME ya fijado por el padre)."""
+    started = time.perf_counter()
+    import numpy as np
+    from services.model_service import ModelService
+    from services.inference_engine import inference_engine
+
+    model = ModelService.load_arch_model(arch, product, MODELS_DIR)
+    if model is None:
+        raise FileNotFoundError(f"no hay modelo {arch}/{product}")
+    window = np.random.default_rng(0).standard_normal((1, 60)).astype(np.float32)   # LOOKBACK
+    first = inference_engine.forecast(arch, [model], window, 90)
+    cold = time.perf_counter() - started
+
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        inference_engine.forecast(arch, [model], window, 90)
+        times.append(time.perf_counter() - t)
+
+    result = {"runtime": runtime, "arch": arch, "cold_start_s": round(cold, 3),
+              "forecast_ms": round(1000 * float(np.median(times)), 3),
+              "peak_rss_mb": round(peak_rss_mb(), 1), "tensorflow": "tensorflow" in sys.modules}
+    if runtime == "numpy":
+        from services.model_service import load_model
+        reference = load_model(os.path.join(MODELS_DIR, arch, f"{product}.keras"))
+        expected = inference_engine.forecast(arch, [reference], window, 90)
+        result["max_abs_diff"] = float(np.abs(first - expected).max())
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.inference_runtime", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models-dir", default="./data/models")
+    parser.add_argument("--product", default=None, help="por defecto el primer producto entrenado")
+    parser.add_argument("--archs", nargs="+", default=["MLP", "CNN1D", "LSTM", "CNN_LSTM"])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--variant", nargs=2, metavar=("RUNTIME", "ARCH"), help=argparse.SUPPRESS)  # proceso hijo
+    args = parser.parse_args(argv)
+
+    if args.variant:
+        runtime, arch = args.variant
+        print(json.dumps(run_variant(runtime, arch, args.product, args.models_dir, args.repeat)))
+        return 0
+
+    if args.product is None:
+        from services.model_service import ModelService
+        available = ModelService.trained_products(args.models_dir, args.archs)
+        if not available:
+            print("no hay modelos entrenados", file=sys.stderr)
+            return 1
+        args.product = available[0]
+
+    print(f"producto {args.product} ({args.models_dir})")
+    for arch in args.archs:
+        for runtime in RUNTIMES:
+            env = dict(os.environ, INFERENCE_RUNTIME=runtime, TF_CPP_MIN_LOG_LEVEL="3")
+            out = subprocess.run([sys.executable, "-m", "benchmarks.inference_runtime", "--models-dir", args.models_dir,
+                                  "--product", args.product, "--repeat", str(args.repeat), "--variant", runtime, arch],
+                                 capture_output=True, text=True, env=env)
+            if out.returncode != 0:
+                reason = (out.stderr.strip().splitlines() or ["?"])[-1]
+                print(f"{arch:9s} {runtime:6s} falló ({reason})")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            diff = f"  dif. máx. {r['max_abs_diff']:.1e}" if "max_abs_diff" in r else ""
+            print(f"{arch:9s} {runtime:6s} frío {r['cold_start_s']:6.2f} s  pronóstico {r['forecast_ms']:8.2f} ms  "
+                  f"RSS pico {r['peak_rss_mb']:7.1f} MB{diff}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
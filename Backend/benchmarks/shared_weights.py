@@ -0,0 +1,104 @@
+"""
+Memoria de N workers (como uvicorn --workers N) con todos los modelos cargados:
+pesos mapeados (.npw con mmap, compartidos por el page cache) contra copias en el heap
+de cada proceso (NumPy en heap, o Keras).
+
+Cada worker carga todas las redes y scalers disponibles, corre un pronóstico por red (para
+tocar todas las páginas de pesos) y espera; con los N vivos a la vez se lee
+/proc/<pid>/smaps_rollup de cada uno:
+- Rss: memoria residente del proceso (cuenta completas las páginas compartidas),
+- Pss: Rss con las páginas compartidas prorrateadas entre los procesos que las usan,
+- Shared: páginas compartidas con otros procesos.
+La suma de Pss es la memoria real que ocupan los N workers juntos.
+
+Uso (desde Backend/):
+    python -m benchmarks.shared_weights --workers 4
+    python -m benchmarks.shared_weights --workers 8 --variants mmap heap
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+VARIANTS = {
+    "mmap": "runtime NumPy, pesos .npw mapeados (por defecto)",
+    "heap": "runtime NumPy, pesos copiados al heap de cada worker",
+    "keras": "INFERENCE_RUNTIME=keras, modelos .keras",
+}
+
+
+def smaps(pid):
+    """Campos de /proc/<pid>/smaps_rollup en MB."""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1]) / 1024.0
+    shared = out.get("Shared_Clean", 0.0) + out.get("Shared_Dirty", 0.0)
+    return {"rss_mb": round(out.get("Rss", 0.0), 1), "pss_mb": round(out.get("Pss", 0.0), 1),
+            "shared_mb": round(shared, 1)}
+
+
+def worker(variant, MODELS_DIR):
+    """Proceso hijo: carga todo, avisa por stdout y espera a que el padre cierre stdin."""
+    import numpy as np
+    from services.model_service import ModelService
+    from services.numpy_runtime import NumpyNetwork
+    from services.inference_engine import inference_engine
+
+    window = np.zeros((1, 60), dtype=np.float32)   # LOOKBACK
+    loaded = []
+    for product in ModelService.trained_products(MODELS_DIR):
+        ModelService.load_scaler(product, os.path.join(MODELS_DIR, "scalers"))
+        for arch in ModelService.ARCHS:
+            model = ModelService.load_arch_model(arch, product, MODELS_DIR)
+            if model is None:
+                continue
+            if variant == "heap":
+                model = NumpyNetwork(model.spec, {k: np.array(w) for k, w in model.weights.items()})
+            inference_engine.forecast(arch, [model], window, 1)
+            loaded.append(model)   # mantener referencias vivas
+    print(json.dumps({"networks": len(loaded)}), flush=True)
+    sys.stdin.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.shared_weights", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models-dir", default="./data/models")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--worker", choices=list(VARIANTS), help=argparse.SUPPRESS)  # proceso hijo
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(args.worker, args.models_dir)
+        return 0
+
+    for variant in args.variants:
+        env = dict(os.environ, INFERENCE_RUNTIME="keras" if variant == "keras" else "numpy", TF_CPP_MIN_LOG_LEVEL="3")
+        procs = [subprocess.Popen([sys.executable, "-m", "benchmarks.shared_weights", "--models-dir", args.models_dir,
+                                   "--worker", variant], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, text=True, env=env)
+                 for _ in range(args.workers)]
+        try:
+            ready = [json.loads(p.stdout.readline() or "null") for p in procs]
+            if None in ready:
+                print(f"{variant:6s} falló (un worker terminó antes de cargar)")
+                continue
+            stats = [smaps(p.pid) for p in procs]
+        finally:
+            for p in procs:
+                p.stdin.close()
+                p.wait()
+        total_pss = sum(s["pss_mb"] for s in stats)
+        print(f"{variant:6s} {args.workers} workers × {ready[0]['networks']} redes  "
+              f"Rss/worker {stats[0]['rss_mb']:7.1f} MB  Pss/worker {total_pss / len(stats):7.1f} MB  "
+              f"compartido {stats[0]['shared_mb']:7.1f} MB  total (ΣPss) {total_pss:8.1f} MB  {VARIANTS[variant]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
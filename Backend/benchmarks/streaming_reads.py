@@ -0,0 +1,135 @@
+"""
+Memoria pico (RSS) de las lecturas de 'ventas': materializar objetos Sale con .all()
+contra leer en streaming (yield_per + columnas proyectadas) hacia agregados acumulados.
+
+Uso (desde Backend/):
+    python -m benchmarks.streaming_reads                      # 5M filas en un SQLite temporal
+    python -m benchmarks.streaming_reads --rows 1000000
+    python -m benchmarks.streaming_reads --url postgresql://...  # tabla sintética en otra base
+
+Cada variante corre en un proceso nuevo para que el pico de RSS sea sólo el suyo.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from datetime import date, timedelta
+
+VARIANTS = {
+    "orm_all": "get_all_by_range + cantidad por día en Python (objetos Sale completos)",
+    "stream": "iter_by_range (yield_per, 2 columnas) + cantidad por día acumulada",
+    "daily_all": "get_daily_quantities().all() + SeriesMatrix.from_daily_rows",
+    "daily_stream": "iter_daily_quantities + SeriesMatrix.from_daily_chunks (load_data)",
+}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # Linux: KB
+
+
+def populate(url, rows, products, days, batch=100_000):
+    """Crea la tabla sintética si no tiene ya 'rows' filas."""
+    import numpy as np
+    from sqlalchemy import create_engine, func, select
+    from models.sale_model import Base, Sale
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=[Sale.__table__])
+    with engine.connect() as conn:
+        existing = conn.execute(select(func.count()).select_from(Sale.__table__)).scalar()
+    if existing >= rows:
+        return existing
+
+    rng = np.random.default_rng(0)
+    start = date(2021, 1, 1)
+    calendar = [start + timedelta(days=i) for i in range(days)]
+    with engine.begin() as conn:
+        conn.execute(Sale.__table__.delete())
+        for offset in range(0, rows, batch):
+            n = min(batch, rows - offset)
+            day = np.sort(rng.integers(0, days, n))
+            product = rng.integers(1, products + 1, n)
+            qty = rng.integers(1, 5, n)
+            price = np.round(rng.uniform(5, 200, n), 2)
+            conn.execute(Sale.__table__.insert(), [
+                {"invoice_number": f"B{(offset + i) // 4:09d}", "product_code": f"P{product[i]:05d}",
+                 "product_name": "producto sintético", "client_category": "A",
+                 "price": float(price[i]), "price_retail": float(price[i]), "sale_date": calendar[day[i]],
+                 "quantity": int(qty[i]), "total": float(price[i] * qty[i]), "description": "x" * 40}
+                for i in range(n)])
+            print(f"  {offset + n:,} filas", file=sys.stderr)
+    return rows
+
+
+def run_variant(url, variant):
+    """Corre una variante en este proceso y retorna segundos y RSS pico."""
+    os.environ["DATABASE_URL"] = url
+    os.environ["SALES_ROLLUP"] = "0"   # medir las lecturas sobre la tabla cruda
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from repositories.sale_repository import SaleRepository
+    from models.series_matrix import SeriesMatrix
+
+    db = sessionmaker(bind=create_engine(url))()
+    lo, hi = SaleRepository.get_date_bounds(db)
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    totals = {}
+    if variant == "orm_all":
+        for sale in SaleRepository.get_all_by_range(db, lo, hi):
+            totals[sale.sale_date] = totals.get(sale.sale_date, 0) + sale.quantity
+    elif variant == "stream":
+        for chunk in SaleRepository.iter_by_range(db, lo, hi, columns=["sale_date", "quantity"]):
+            for d, q in chunk:
+                totals[d] = totals.get(d, 0) + q
+    elif variant == "daily_all":
+        matrix = SeriesMatrix.from_daily_rows(SaleRepository.get_daily_quantities(db), lo, hi)
+        totals = {"cells": matrix.values.size}
+    elif variant == "daily_stream":
+        matrix = SeriesMatrix.from_daily_chunks(SaleRepository.iter_daily_quantities(db), lo, hi)
+        totals = {"cells": matrix.values.size}
+    else:
+        raise ValueError(f"variante desconocida: {variant}")
+    seconds = time.perf_counter() - started
+    db.close()
+    return {"variant": variant, "seconds": round(seconds, 2), "baseline_rss_mb": round(baseline, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1), "groups": len(totals)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.streaming_reads", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="por defecto un SQLite en /tmp")
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=1500)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--variant", choices=list(VARIANTS), help=argparse.SUPPRESS)  # proceso hijo
+    args = parser.parse_args(argv)
+
+    url = args.url or f"sqlite:////tmp/ventas_bench_{args.rows}.db"
+    if args.variant:
+        print(json.dumps(run_variant(url, args.variant)))
+        return 0
+
+    print(f"tabla sintética: {populate(url, args.rows, args.products, args.days):,} filas ({url})")
+    for variant in args.variants:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.streaming_reads", "--url", url, "--variant", variant],
+                             capture_output=True, text=True)
+        if out.returncode != 0:
+            # p. ej. SIGKILL del OOM killer: justamente el caso que evitan las lecturas en streaming
+            reason = f"señal {-out.returncode}" if out.returncode < 0 else (out.stderr.strip().splitlines() or ["?"])[-1]
+            print(f"{variant:13s} falló ({reason})  {VARIANTS[variant]}")
+            continue
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{variant:13s} {result['seconds']:8.2f} s  RSS pico {result['peak_rss_mb']:8.1f} MB "
+              f"(+{result['peak_rss_mb'] - result['baseline_rss_mb']:.1f})  {VARIANTS[variant]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Registro de campeones por producto (data/models/champions.json).
+
+Uso (desde Backend/):
+    python -m cli.champions show                    # campeón y puntajes de cada producto
+    python -m cli.champions refresh                 # backtest programado de todos los productos
+    python -m cli.champions refresh --products P001 P002
+"""
+import sys
+import json
+import argparse
+
+from database import SessionLocal
+from services.champion_service import ChampionService
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.champions", description="Campeón por producto")
+    parser.add_argument("command", choices=["show", "refresh"])
+    parser.add_argument("--products", nargs="+", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        print(json.dumps(ChampionService.load(), indent=2, ensure_ascii=False))
+        return 0
+
+    db = SessionLocal()
+    try:
+        result = ChampionService.refresh(db, args.products)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Exporta los modelos .keras a .npw para el runtime de inferencia NumPy (sin TensorFlow).
+
+Los modelos nuevos se exportan al guardarse y los que falten se exportan al cargarlos,
+pero eso importa TensorFlow en la API; este comando deja todo listo de antemano
+(p. ej. después de actualizar desde una versión sin runtime NumPy).
+
+Uso (desde Backend/):
+    python -m cli.export            # sólo los .npw faltantes u obsoletos
+    python -m cli.export --force    # re-exporta todos
+    python -m cli.export --check    # informa sin escribir (código 1 si falta alguno)
+"""
+import os
+import sys
+import json
+import argparse
+
+from services.model_service import ModelService, load_model
+from services.numpy_runtime import NumpyNetwork
+
+
+def keras_paths(MODELS_DIR):
+    """Modelos por arquitectura y globales (<dir>/<ARCH>/*.keras y <dir>/global/*.keras)."""
+    for sub in ModelService.ARCHS + ("global",):
+        arch_dir = os.path.join(MODELS_DIR, sub)
+        if not os.path.isdir(arch_dir):
+            continue
+        for fname in sorted(os.listdir(arch_dir)):
+            if fname.endswith(".keras") and not fname.startswith("."):
+                yield os.path.join(arch_dir, fname)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.export", description="Exporta modelos .keras a .npw")
+    parser.add_argument("--models-dir", default="./data/models")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args(argv)
+
+    result = {"exported": [], "fresh": 0, "stale": [], "failed": {}}
+    for path in keras_paths(args.models_dir):
+        npw = NumpyNetwork.weights_path(path)
+        if not args.force and NumpyNetwork.is_fresh(npw, path):
+            result["fresh"] += 1
+            continue
+        if args.check:
+            result["stale"].append(path)
+            continue
+        try:
+            NumpyNetwork.export(load_model(path, compile=False), npw, source=path)
+            result["exported"].append(path)
+        except (OSError, ValueError) as e:
+            result["failed"][path] = str(e)
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 1 if result["stale"] or result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Carga masiva de líneas de factura (CSV o Parquet) en 'ventas'.
+
+Uso (desde Backend/):
+    python -m cli.ingest ventas_2025.csv
+    python -m cli.ingest ventas.parquet --on-duplicate fail
+    python -m cli.ingest ventas.csv.gz --dry-run    # sólo valida
+"""
+import sys
+import json
+import argparse
+
+from database import SessionLocal
+from services.ingest_service import IngestService, INGEST_CHUNK_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.ingest", description="Carga masiva de ventas")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IngestService.FORMATS, default=None, help="por defecto según la extensión")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--on-invalid", choices=["skip", "fail"], default="skip")
+    parser.add_argument("--on-duplicate", choices=IngestService.POLICIES, default="skip")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        result = IngestService.ingest(db, args.path, fmt=args.format, chunk_size=args.chunk_size,
+                                      on_invalid=args.on_invalid, on_duplicate=args.on_duplicate, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2, default=str, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
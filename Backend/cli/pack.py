@@ -0,0 +1,54 @@
+"""
+Empaqueta los scalers y calibraciones sueltos de data/models/scalers en artifacts.pack.
+
+El entrenamiento no empaqueta: deja los archivos sueltos (tienen prioridad sobre el pack)
+y este comando es el paso explícito de despliegue que los incorpora.
+
+Uso (desde Backend/):
+    python -m cli.pack              # incorpora los archivos sueltos (no borra nada)
+    python -m cli.pack --remove     # además borra los incorporados (nunca los versionados en git)
+    python -m cli.pack --list       # claves del pack actual
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from services.artifact_pack import ArtifactPack
+
+
+def git_tracked(directory):
+    """Archivos del directorio versionados en git (vacío si no es un repositorio o no hay git)."""
+    try:
+        out = subprocess.run(["git", "ls-files", "--full-name", "-z", "."], cwd=directory,
+                             capture_output=True, check=True).stdout
+        top = subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=directory,
+                             capture_output=True, check=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {os.path.join(top, name) for name in out.decode("utf-8").split("\0") if name}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.pack", description="Pack de scalers y calibraciones")
+    parser.add_argument("--scalers-dir", default="./data/models/scalers")
+    parser.add_argument("--remove", action="store_true", help="borrar los archivos sueltos incorporados")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.scalers_dir):
+        print(f"error: no existe {args.scalers_dir}", file=sys.stderr)
+        return 1
+    if args.list:
+        path = ArtifactPack.path_for(args.scalers_dir)
+        keys = ArtifactPack(path).keys() if os.path.exists(path) else []
+        print(json.dumps(keys, indent=2))
+        return 0
+    keep = git_tracked(args.scalers_dir) if args.remove else ()
+    print(json.dumps(ArtifactPack.compact(args.scalers_dir, remove=args.remove, keep=keep), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
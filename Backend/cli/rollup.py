@@ -0,0 +1,41 @@
+"""
+Mantenimiento del rollup diario de ventas (ventas_daily).
+
+Uso (desde Backend/):
+    python -m cli.rollup catch-up   # incorpora las ventas nuevas (id > marca de agua y margen SALES_ROLLUP_RESCAN_IDS)
+    python -m cli.rollup rebuild    # reconstruye todo desde 'ventas'
+    python -m cli.rollup verify     # compara el rollup con la tabla cruda
+"""
+import sys
+import json
+import time
+import argparse
+
+from database import SessionLocal
+from repositories.sale_rollup_repository import SaleRollupRepository
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.rollup", description="Rollup diario de ventas")
+    parser.add_argument("command", choices=["catch-up", "rebuild", "verify"])
+    parser.add_argument("--limit", type=int, default=20, help="máximo de diferencias a mostrar en verify")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        if args.command == "catch-up":
+            result = SaleRollupRepository.catch_up(db)
+        elif args.command == "rebuild":
+            result = SaleRollupRepository.rebuild(db)
+        else:
+            result = SaleRollupRepository.verify(db, limit=args.limit)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        print(json.dumps(result, indent=2, default=str))
+        return 0 if result.get("ok", True) else 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
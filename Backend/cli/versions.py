@@ -0,0 +1,42 @@
+"""
+Versiones archivadas por el fine-tuning incremental (data/models/<ARCH>/versions).
+
+Cada versión guarda juntos el .keras, el .npw y la calibración; restore los repone juntos,
+así el runtime NumPy y las bandas no quedan de otra versión.
+
+Uso (desde Backend/):
+    python -m cli.versions list P001
+    python -m cli.versions restore P001 3            # todas las arquitecturas con esa versión
+    python -m cli.versions restore P001 3 --arch MLP
+"""
+import sys
+import json
+import argparse
+
+from services.model_service import ModelService
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli.versions", description="Versiones de modelos por producto")
+    parser.add_argument("command", choices=["list", "restore"])
+    parser.add_argument("product")
+    parser.add_argument("version", type=int, nargs="?")
+    parser.add_argument("--arch", action="append", choices=ModelService.ARCHS, help="repetible; por defecto todas")
+    parser.add_argument("--models-dir", default="./data/models")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        print(json.dumps(ModelService.archived_versions(args.product, args.models_dir, args.arch), indent=2))
+        return 0
+    if args.version is None:
+        parser.error("restore requiere la versión")
+    restored = ModelService.restore_version(args.product, args.version, args.models_dir, args.arch)
+    if not restored:
+        print(f"error: no hay versión {args.version} archivada para {args.product}", file=sys.stderr)
+        return 1
+    print(json.dumps({"product": args.product, "version": args.version, "restored": restored}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
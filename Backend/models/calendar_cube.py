@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from datetime import date, datetime, timedelta
+
+
+class CalendarCube:
+    """
+    Medidas diarias de ventas (un arreglo por medida, un valor por día del calendario)
+    con sumas prefijas precalculadas: el total de cualquier rango de fechas es O(1)
+    (prefix[fin + 1] - prefix[inicio]) sin volver a consultar la base.
+    - origin: fecha del primer día (posición 0)
+    - measures: {"total": ..., "quantity": ..., "lines": ..., "invoices": ...}
+      ("invoices" son las facturas únicas de cada día)
+    También guarda sumas prefijas de los días con valor distinto de 0, para contar en O(1)
+    los días con ventas de un rango (days_with).
+    """
+
+    def __init__(self, origin, measures):
+        self.origin = CalendarCube._as_date(origin)
+        self.measures = {name: np.asarray(values, dtype=np.float64) for name, values in measures.items()}
+        lengths = {len(v) for v in self.measures.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"todas las medidas deben tener el mismo largo; recibido {lengths}")
+        self.n_days = lengths.pop() if lengths else 0
+        self._prefix = {name: np.concatenate([[0.0], np.cumsum(v)]) for name, v in self.measures.items()}
+        self._nonzero = {name: np.concatenate([[0], np.cumsum(v != 0)]) for name, v in self.measures.items()}
+
+    @classmethod
+    def from_daily_rows(cls, rows, names):
+        """
+        Construye el cubo a partir de filas (sale_date, *valores) en el orden de 'names'.
+        Los días sin ventas quedan en 0.
+        """
+        if not rows:
+            return cls(date.today(), {name: np.zeros(0) for name in names})
+        days = [CalendarCube._as_date(r[0]) for r in rows]
+        origin = min(days)
+        n_days = (max(days) - origin).days + 1
+        idx = np.array([(d - origin).days for d in days], dtype=np.int64)
+        measures = {}
+        for j, name in enumerate(names, start=1):
+            values = np.zeros(n_days, dtype=np.float64)
+            np.add.at(values, idx, np.array([float(r[j] or 0) for r in rows], dtype=np.float64))
+            measures[name] = values
+        return cls(origin, measures)
+
+    @property
+    def end(self):
+        return self.origin + timedelta(days=self.n_days - 1) if self.n_days else None
+
+    def _clip(self, start, end):
+        """Posiciones [i, j) del rango [start, end] recortadas a la cobertura del cubo."""
+        i = (CalendarCube._as_date(start) - self.origin).days
+        j = (CalendarCube._as_date(end) - self.origin).days + 1
+        return min(max(i, 0), self.n_days), min(max(j, 0), self.n_days)
+
+    def total(self, name, start, end):
+        i, j = self._clip(start, end)
+        if j <= i:
+            return 0.0
+        prefix = self._prefix[name]
+        return float(prefix[j] - prefix[i])
+
+    def days_with(self, name, start, end):
+        """Días de [start, end] con la medida distinta de 0 (p. ej. días con ventas)."""
+        i, j = self._clip(start, end)
+        if j <= i:
+            return 0
+        prefix = self._nonzero[name]
+        return int(prefix[j] - prefix[i])
+
+    def daily(self, name, start, end):
+        """Valores diarios de [start, end] (con 0 fuera de la cobertura del cubo)."""
+        start, end = CalendarCube._as_date(start), CalendarCube._as_date(end)
+        n = (end - start).days + 1
+        out = np.zeros(max(n, 0), dtype=np.float64)
+        i, j = self._clip(start, end)
+        if j > i:
+            offset = (self.origin - start).days + i
+            out[offset:offset + (j - i)] = self.measures[name][i:j]
+        return out
+
+    @staticmethod
+    def _as_date(d):
+        if isinstance(d, datetime):
+            return d.date()
+        if isinstance(d, pd.Timestamp):
+            return d.date()
+        if isinstance(d, str):
+            return date.fromisoformat(d)
+        return d
+
+    def __repr__(self):
+        return f"CalendarCube(days={self.n_days}, origin={self.origin}, measures={list(self.measures)})"
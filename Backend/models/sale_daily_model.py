@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Numeric, LargeBinary
+from models.sale_model import Base
+
+class SaleDaily(Base):
+    """Rollup diario de ventas por (fecha, producto)."""
+    __tablename__ = "ventas_daily"
+
+    sale_date = Column(Date, primary_key=True)
+    product_code = Column(String, primary_key=True)
+    quantity = Column(BigInteger, nullable=False)
+    total = Column(Numeric(16, 2), nullable=False)
+    lines = Column(Integer, nullable=False)       # filas de 'ventas' agregadas
+    invoices = Column(Integer, nullable=False)    # facturas únicas del producto en el día
+
+class SaleDailyInvoice(Base):
+    """
+    Facturas únicas por día (una fila por fecha y factura): permite contar facturas
+    distintas por día o por rango sin recorrer las líneas de 'ventas'.
+    Las ventas sin número de factura se guardan con invoice_number = "".
+    """
+    __tablename__ = "ventas_daily_invoices"
+
+    sale_date = Column(Date, primary_key=True)
+    invoice_number = Column(String, primary_key=True)
+    lines = Column(Integer, nullable=False)
+
+class SaleDailySketch(Base):
+    """Sketch HyperLogLog diario de los números de factura (utils.hll), combinable entre días."""
+    __tablename__ = "ventas_daily_sketches"
+
+    sale_date = Column(Date, primary_key=True)
+    hll_precision = Column(Integer, nullable=False)
+    registers = Column(LargeBinary, nullable=False)
+
+class RollupState(Base):
+    """Marca de agua (último Sale.id incorporado) de cada rollup."""
+    __tablename__ = "ventas_rollup_state"
+
+    name = Column(String, primary_key=True)
+    high_water_mark = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
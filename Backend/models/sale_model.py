@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric, Text
+from sqlalchemy import Column, Integer, String, Date, Numeric, Text, Index
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 class Sale(Base):
     __tablename__ = "ventas"
+    __table_args__ = (
+        # agregados del dashboard por fecha y facturas únicas (index-only scan)
+        Index("ix_ventas_sale_date_invoice_number", "sale_date", "invoice_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String, index=True, nullable=True)
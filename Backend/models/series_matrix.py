@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+
+class SeriesMatrix:
+    """
+    Serie diaria densa de todos los productos en una matriz contigua float32:
+    - values: (productos, días), con 0 en los días sin ventas
+    - products: códigos de producto (orden de las filas)
+    - origin: fecha del primer día (columna 0)
+    """
+
+    def __init__(self, values, products, origin):
+        self.values = np.ascontiguousarray(values, dtype=np.float32)
+        self.products = list(products)
+        self.origin = pd.Timestamp(origin).normalize()
+        self._index = {p: i for i, p in enumerate(self.products)}
+        if self.values.ndim != 2 or self.values.shape[0] != len(self.products):
+            raise ValueError(f"values debe ser (productos, días); recibido {self.values.shape}")
+
+    @classmethod
+    def from_daily_rows(cls, rows, date_min, date_max, products=None):
+        """
+        Construye la matriz a partir de filas agregadas (sale_date, product_code, quantity).
+        Si no se indican productos se usan los presentes en las filas (ordenados).
+        """
+        return cls.from_daily_chunks([rows] if rows else [], date_min, date_max, products)
+
+    @classmethod
+    def from_daily_chunks(cls, chunks, date_min, date_max, products=None):
+        """
+        Igual que from_daily_rows, consumiendo bloques de filas (p. ej. un cursor en streaming):
+        cada bloque se suma a la matriz y se descarta, así la memoria queda acotada por la matriz
+        (productos × días) y un bloque, no por la cantidad de filas.
+        """
+        origin = pd.Timestamp(date_min).normalize()
+        n_days = max((pd.Timestamp(date_max).normalize() - origin).days + 1, 0)
+
+        fixed = products is not None
+        products = list(products) if fixed else []
+        index = {p: i for i, p in enumerate(products)}
+        values = np.zeros((len(products), n_days), dtype=np.float32)
+
+        for rows in chunks:
+            if not rows:
+                continue
+            dates, codes, qty = zip(*rows)
+            if not fixed:
+                new = [c for c in dict.fromkeys(codes) if c not in index]
+                if new:
+                    index.update({c: len(products) + i for i, c in enumerate(new)})
+                    products.extend(new)
+                    if len(products) > values.shape[0]:  # crecimiento geométrico de las filas
+                        grown = np.zeros((max(len(products), 2 * values.shape[0]), n_days), dtype=np.float32)
+                        grown[:values.shape[0]] = values
+                        values = grown
+            day = (pd.to_datetime(pd.Series(dates)).dt.normalize() - origin).dt.days.to_numpy()
+            row = np.array([index.get(c, -1) for c in codes])
+            q = pd.to_numeric(pd.Series(qty), errors="coerce").fillna(0.0).to_numpy(dtype=np.float32)
+            keep = (row >= 0) & (day >= 0) & (day < n_days)
+            np.add.at(values, (row[keep], day[keep]), q[keep])
+
+        if not fixed:
+            order = sorted(range(len(products)), key=products.__getitem__)
+            values = values[order]
+            products = [products[i] for i in order]
+        return cls(values[:len(products)], products, origin)
+
+    @property
+    def n_days(self):
+        return self.values.shape[1]
+
+    @property
+    def end(self):
+        return self.origin + pd.Timedelta(days=self.n_days - 1)
+
+    @property
+    def dates(self):
+        return pd.date_range(self.origin, periods=self.n_days, freq="D")
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self, product):
+        return product in self._index
+
+    def row(self, product):
+        """Vista (sin copia) de la serie diaria de un producto."""
+        return self.values[self._index[product]]
+
+    def series(self, product):
+        """Serie diaria del producto como pd.Series indexada por fecha."""
+        return pd.Series(self.row(product), index=self.dates, name="quantity")
+
+    def subset(self, products):
+        """Nueva matriz sólo con los productos indicados (en ese orden)."""
+        products = [p for p in products if p in self._index]
+        rows = [self._index[p] for p in products]
+        return SeriesMatrix(self.values[rows], products, self.origin)
+
+    def __repr__(self):
+        return (f"SeriesMatrix(products={len(self.products)}, days={self.n_days}, "
+                f"origin={self.origin.date()}, nbytes={self.values.nbytes})")
@@ -1,15 +1,204 @@
+import io
+import os
+import csv
+
+from sqlalchemy import func, case, distinct, or_
 from sqlalchemy.orm import Session
 from models.sale_model import Sale
 from datetime import date
 
+# Filas por bloque en las lecturas en streaming (cursor del lado del servidor)
+STREAM_CHUNK_SIZE = int(os.getenv("SALES_STREAM_CHUNK_SIZE", "10000"))
+
 class SaleRepository:
 
     @staticmethod
     def get_all(db: Session):
-        """Obtiene todos las ventas"""
+        """Obtiene todos las ventas (materializa toda la tabla; para tablas grandes usar iter_by_range)"""
         return db.query(Sale).all()
     
     @staticmethod
     def get_all_by_range(db: Session, startdate: date, enddate: date):
-        """Obtiene todas las ventas usando rango de fechas"""
+        """Obtiene todas las ventas usando rango de fechas (en memoria; ver iter_by_range)"""
         return db.query(Sale).filter(Sale.sale_date >= startdate, Sale.sale_date <= enddate).all()
+
+    @staticmethod
+    def iter_by_range(db: Session, startdate: date = None, enddate: date = None, columns=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Ventas en streaming: itera bloques (listas de filas) de hasta chunk_size filas leídas con
+        un cursor del lado del servidor (yield_per), con sólo las columnas pedidas
+        (nombres de Sale, por defecto todas) en lugar de objetos Sale completos.
+        La memoria queda acotada por el tamaño del bloque, no por el de la tabla.
+        """
+        cols = [getattr(Sale, c) for c in columns] if columns else list(Sale.__table__.columns)
+        q = db.query(*cols)
+        if startdate is not None:
+            q = q.filter(Sale.sale_date >= startdate)
+        if enddate is not None:
+            q = q.filter(Sale.sale_date <= enddate)
+        return SaleRepository.stream(q.order_by(Sale.id), chunk_size)
+
+    @staticmethod
+    def stream(query, chunk_size=STREAM_CHUNK_SIZE):
+        """Ejecuta la consulta con yield_per y la entrega en bloques de filas."""
+        result = query.yield_per(chunk_size)
+        chunk = []
+        for row in result:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    @staticmethod
+    def get_watermark(db: Session, exact_count: bool = True):
+        """
+        Marca de agua de la tabla ventas: id máximo, última fecha de venta y cantidad de filas.
+        exact_count=False omite el COUNT (recorre toda la tabla) y usa sólo los máximos, que se
+        resuelven por índice: detecta ventas nuevas pero no borrados.
+        """
+        if not exact_count:
+            max_id, max_date = db.query(func.max(Sale.id), func.max(Sale.sale_date)).one()
+            return {"max_id": max_id, "max_sale_date": max_date.isoformat() if max_date is not None else None}
+        max_id, max_date, rows = db.query(func.max(Sale.id), func.max(Sale.sale_date), func.count(Sale.id)).one()
+        return {
+            "max_id": max_id,
+            "max_sale_date": max_date.isoformat() if max_date is not None else None,
+            "rows": int(rows or 0),
+        }
+
+    @staticmethod
+    def distinct_invoices():
+        # COUNT(DISTINCT) ignora NULL; un set de Python lo cuenta como una factura más
+        return func.count(distinct(Sale.invoice_number)) + func.max(case((Sale.invoice_number.is_(None), 1), else_=0))
+
+    @staticmethod
+    def get_range_totals(db: Session, ranges):
+        """
+        Totales de varios rangos de fechas (disjuntos) en una sola consulta agregada.
+        ranges: {etiqueta: (inicio, fin)} inclusivos.
+        Retorna {etiqueta: (registros, facturas únicas, monto total)}; 0 para rangos sin ventas.
+        """
+        bucket = case(*[(Sale.sale_date.between(start, end), label) for label, (start, end) in ranges.items()]).label("bucket")
+        rows = (db.query(bucket, func.count(Sale.id), SaleRepository.distinct_invoices(), func.coalesce(func.sum(Sale.total), 0))
+                .filter(Sale.sale_date >= min(s for s, _ in ranges.values()),
+                        Sale.sale_date <= max(e for _, e in ranges.values()))
+                .group_by("bucket")
+                .all())
+        totals = {label: (0, 0, 0) for label in ranges}
+        for label, n, invoices, amount in rows:
+            if label is not None:
+                totals[label] = (int(n), int(invoices), amount)
+        return totals
+
+    @staticmethod
+    def get_daily_totals(db: Session):
+        """Totales por día de toda la tabla: filas (sale_date, quantity, total, líneas, facturas únicas del día)."""
+        return (db.query(Sale.sale_date, func.sum(Sale.quantity), func.coalesce(func.sum(Sale.total), 0),
+                         func.count(Sale.id), SaleRepository.distinct_invoices())
+                .group_by(Sale.sale_date).order_by(Sale.sale_date).all())
+
+    @staticmethod
+    def get_range_invoices(db: Session, ranges):
+        """Facturas únicas de varios rangos disjuntos {etiqueta: (inicio, fin)} en una sola consulta."""
+        bucket = case(*[(Sale.sale_date.between(start, end), label) for label, (start, end) in ranges.items()]).label("bucket")
+        rows = (db.query(bucket, SaleRepository.distinct_invoices())
+                .filter(Sale.sale_date >= min(s for s, _ in ranges.values()),
+                        Sale.sale_date <= max(e for _, e in ranges.values()))
+                .group_by("bucket").all())
+        invoices = {label: 0 for label in ranges}
+        invoices.update({label: int(n) for label, n in rows if label is not None})
+        return invoices
+
+    @staticmethod
+    def get_daily_invoice_counts(db: Session, ranges):
+        """
+        Facturas únicas por día (COUNT(DISTINCT invoice_number) agrupado por fecha) para
+        los días dentro de alguno de los rangos [(inicio, fin), ...]. Retorna {fecha: facturas}.
+        """
+        rows = (db.query(Sale.sale_date, SaleRepository.distinct_invoices())
+                .filter(or_(*[Sale.sale_date.between(start, end) for start, end in ranges]))
+                .group_by(Sale.sale_date)
+                .all())
+        return {d: int(n) for d, n in rows}
+
+    @staticmethod
+    def ensure_indexes(bind):
+        """Crea los índices declarados en el modelo que aún no existan en la base."""
+        for index in Sale.__table__.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    @staticmethod
+    def get_daily_quantities(db: Session, products=None, startdate: date = None, enddate: date = None):
+        """
+        Agregado diario por producto calculado en la base de datos:
+        filas (sale_date, product_code, SUM(quantity)), opcionalmente filtradas por productos y fechas
+        """
+        return SaleRepository._daily_quantities_query(db, products, startdate, enddate).all()
+
+    @staticmethod
+    def iter_daily_quantities(db: Session, products=None, startdate: date = None, enddate: date = None,
+                              chunk_size=STREAM_CHUNK_SIZE):
+        """Igual que get_daily_quantities, en bloques de filas leídos en streaming."""
+        return SaleRepository.stream(SaleRepository._daily_quantities_query(db, products, startdate, enddate), chunk_size)
+
+    @staticmethod
+    def _daily_quantities_query(db: Session, products=None, startdate: date = None, enddate: date = None):
+        q = db.query(Sale.sale_date, Sale.product_code, func.sum(Sale.quantity).label("quantity"))
+        if products is not None:
+            q = q.filter(Sale.product_code.in_(list(products)))
+        if startdate is not None:
+            q = q.filter(Sale.sale_date >= startdate)
+        if enddate is not None:
+            q = q.filter(Sale.sale_date <= enddate)
+        return q.group_by(Sale.sale_date, Sale.product_code).order_by(Sale.sale_date, Sale.product_code)
+
+    @staticmethod
+    def get_date_bounds(db: Session):
+        """Primera y última fecha de venta de la tabla"""
+        return db.query(func.min(Sale.sale_date), func.max(Sale.sale_date)).one()
+
+    # columnas que identifican una línea de factura repetida (misma factura, producto, fecha, cantidad y precio)
+    LINE_KEY = ("invoice_number", "product_code", "sale_date", "quantity", "price")
+
+    @staticmethod
+    def line_key(invoice_number, product_code, sale_date, quantity, price):
+        """Clave normalizada de una línea de factura (tipos de la base o de pandas)."""
+        return (str(invoice_number), str(product_code), sale_date.isoformat()[:10], int(quantity), f"{float(price):.2f}")
+
+    @staticmethod
+    def get_existing_line_keys(db: Session, invoice_numbers, batch_size=500):
+        """Claves (LINE_KEY) de las líneas ya cargadas para esas facturas, consultando por lotes."""
+        invoice_numbers = sorted({str(n) for n in invoice_numbers})
+        keys = set()
+        for i in range(0, len(invoice_numbers), batch_size):
+            rows = (db.query(Sale.invoice_number, Sale.product_code, Sale.sale_date, Sale.quantity, Sale.price)
+                    .filter(Sale.invoice_number.in_(invoice_numbers[i:i + batch_size])).all())
+            keys.update(SaleRepository.line_key(*r) for r in rows)
+        return keys
+
+    @staticmethod
+    def bulk_insert(db: Session, records, columns):
+        """
+        Inserta muchas filas en 'ventas' dentro de la transacción de la sesión (sin commit).
+        - PostgreSQL: COPY ... FROM STDIN (CSV) por la conexión de psycopg2.
+        - Otros motores: INSERT con executemany por lotes.
+        records: lista de dicts con las claves de 'columns'. Retorna la cantidad insertada.
+        """
+        if not records:
+            return 0
+        if db.get_bind().dialect.name == "postgresql":
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            for r in records:
+                writer.writerow(["" if r[c] is None else r[c] for c in columns])
+            buf.seek(0)
+            cursor = db.connection().connection.cursor()
+            try:
+                cursor.copy_expert(f"COPY {Sale.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+            finally:
+                cursor.close()
+        else:
+            db.execute(Sale.__table__.insert(), records)
+        return len(records)
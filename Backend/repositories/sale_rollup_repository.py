@@ -0,0 +1,356 @@
+import os
+import zlib
+import threading
+
+from datetime import datetime
+from sqlalchemy import func, select, insert, delete, literal_column, distinct, or_, case, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models.sale_model import Sale
+from models.sale_daily_model import SaleDaily, SaleDailyInvoice, SaleDailySketch, RollupState
+from repositories.sale_repository import SaleRepository, STREAM_CHUNK_SIZE
+from utils.hll import HyperLogLog
+
+class SaleRollupRepository:
+    """
+    Rollup diario de 'ventas' (ventas_daily + ventas_daily_invoices), mantenido de forma
+    incremental con una marca de agua sobre Sale.id: catch_up() toma las filas nuevas,
+    identifica los días afectados y recalcula sólo esos días desde la tabla cruda
+    (así los conteos de facturas únicas siguen siendo exactos).
+    catch_up no corre en las lecturas: lo llaman la carga de ventas, el job periódico
+    (RollupJob) y el CLI, serializados con un lock de base de datos entre procesos.
+    Las lecturas usan el rollup sólo si está al día (source) y si no la tabla cruda.
+    Las lecturas quedan en proporción a días × productos en lugar de líneas de factura.
+    Cada día guarda además un sketch HyperLogLog de sus facturas (ventas_daily_sketches)
+    para estimar facturas únicas de rangos largos en memoria constante.
+    """
+
+    NAME = "ventas_daily"
+    DATES_PER_BATCH = 500
+    _tables_ready = set()
+    _sketches_ready = set()
+    _lock = threading.Lock()   # dentro del proceso; entre procesos: _lock_rollup
+    LOCK_KEY = zlib.crc32(NAME.encode("utf-8"))
+
+    @staticmethod
+    def enabled():
+        """SALES_ROLLUP=0 vuelve a leer directamente de la tabla cruda."""
+        return os.getenv("SALES_ROLLUP", "1").lower() not in ("0", "false", "no")
+
+    @staticmethod
+    def ensure_tables(bind):
+        key = str(bind.engine.url) if hasattr(bind, "engine") else str(bind.url)
+        if key in SaleRollupRepository._tables_ready:
+            return
+        tables = [SaleDaily.__table__, SaleDailyInvoice.__table__, SaleDailySketch.__table__, RollupState.__table__]
+        SaleDaily.metadata.create_all(bind=bind, tables=tables, checkfirst=True)
+        SaleRollupRepository._tables_ready.add(key)
+
+    @staticmethod
+    def sketch_precision():
+        """Precisión de los sketches según el error relativo configurado (HLL_ERROR, por defecto 2%)."""
+        return HyperLogLog.precision_for_error(float(os.getenv("HLL_ERROR", "0.02")))
+
+    @staticmethod
+    def rescan_ids():
+        """
+        Margen de ids bajo la marca de agua que se vuelve a revisar (SALES_ROLLUP_RESCAN_IDS):
+        una transacción que confirma tarde puede dejar filas con id menor que la marca.
+        """
+        return max(int(os.getenv("SALES_ROLLUP_RESCAN_IDS", "10000")), 0)
+
+    @staticmethod
+    def get_high_water_mark(db: Session):
+        state = db.get(RollupState, SaleRollupRepository.NAME, populate_existing=True)
+        return int(state.high_water_mark) if state is not None else 0
+
+    @staticmethod
+    def _lock_rollup(db: Session):
+        """
+        Lock entre procesos (workers de uvicorn, job, CLI) hasta el commit/rollback de la
+        transacción: pg_advisory_xact_lock en PostgreSQL; en otros motores SELECT ... FOR UPDATE
+        sobre la fila de ventas_rollup_state (SQLite no lo soporta pero ya serializa las escrituras).
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SaleRollupRepository.LOCK_KEY})
+            return
+        if db.get(RollupState, SaleRollupRepository.NAME) is None:
+            try:
+                db.add(RollupState(name=SaleRollupRepository.NAME, high_water_mark=0, updated_at=datetime.now()))
+                db.commit()
+            except IntegrityError:   # otro proceso la creó primero
+                db.rollback()
+        db.query(RollupState).filter(RollupState.name == SaleRollupRepository.NAME).with_for_update().one()
+
+    @staticmethod
+    def _set_high_water_mark(db: Session, hwm):
+        state = db.get(RollupState, SaleRollupRepository.NAME)
+        if state is None:
+            state = RollupState(name=SaleRollupRepository.NAME)
+            db.add(state)
+        state.high_water_mark = int(hwm)
+        state.updated_at = datetime.now()
+
+    @staticmethod
+    def catch_up(db: Session):
+        """
+        Incorpora al rollup las ventas con id > marca de agua y vuelve a revisar los últimos
+        rescan_ids() ids por debajo de la marca: los días de ese margen cuyo número de líneas
+        no coincide con la tabla cruda (filas confirmadas tarde) también se recalculan.
+        Retorna {"rows": filas nuevas, "days": días recalculados, "late_days": días del margen
+        recalculados, "high_water_mark": ...}.
+        """
+        SaleRollupRepository.ensure_tables(db.get_bind())
+        with SaleRollupRepository._lock:
+            try:
+                SaleRollupRepository._lock_rollup(db)
+                SaleRollupRepository._backfill_sketches(db)
+                hwm = SaleRollupRepository.get_high_water_mark(db)
+                max_id = max(db.query(func.max(Sale.id)).scalar() or 0, hwm)
+
+                new_rows = db.query(func.count(Sale.id)).filter(Sale.id > hwm, Sale.id <= max_id).scalar()
+                new_days = {d for (d,) in db.query(Sale.sale_date).filter(Sale.id > hwm, Sale.id <= max_id).distinct()}
+                late_days = SaleRollupRepository._late_days(db, hwm, max_id) - new_days
+                days = sorted(new_days | late_days)
+                for start in range(0, len(days), SaleRollupRepository.DATES_PER_BATCH):
+                    SaleRollupRepository._refresh_days(db, days[start:start + SaleRollupRepository.DATES_PER_BATCH])
+                if max_id > hwm:
+                    SaleRollupRepository._set_high_water_mark(db, max_id)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            return {"rows": int(new_rows), "days": len(days), "late_days": len(late_days), "high_water_mark": int(max_id)}
+
+    @staticmethod
+    def _late_days(db: Session, hwm, max_id):
+        """Días con ventas en el margen bajo la marca de agua cuyo total de líneas difiere del rollup."""
+        rescan_from = max(hwm - SaleRollupRepository.rescan_ids(), 0)
+        days = [d for (d,) in db.query(Sale.sale_date).filter(Sale.id > rescan_from, Sale.id <= hwm).distinct()]
+        if not days:
+            return set()
+        raw = dict(db.query(Sale.sale_date, func.count(Sale.id))
+                   .filter(Sale.sale_date.in_(days), Sale.id <= max_id).group_by(Sale.sale_date).all())
+        rolled = dict(db.query(SaleDaily.sale_date, func.sum(SaleDaily.lines))
+                      .filter(SaleDaily.sale_date.in_(days)).group_by(SaleDaily.sale_date).all())
+        return {d for d in days if int(raw.get(d) or 0) != int(rolled.get(d) or 0)}
+
+    @staticmethod
+    def is_current(db: Session):
+        """True si el rollup existe y su marca de agua alcanza el id máximo de 'ventas' (dos lecturas por índice)."""
+        state = db.get(RollupState, SaleRollupRepository.NAME, populate_existing=True)
+        if state is None:
+            return False
+        max_id = db.query(func.max(Sale.id)).scalar()
+        return max_id is None or max_id <= int(state.high_water_mark)
+
+    @staticmethod
+    def rebuild(db: Session):
+        """Reconstruye el rollup completo desde 'ventas'."""
+        SaleRollupRepository.ensure_tables(db.get_bind())
+        with SaleRollupRepository._lock:
+            try:
+                SaleRollupRepository._lock_rollup(db)
+                max_id = db.query(func.max(Sale.id)).scalar() or 0
+                db.execute(delete(SaleDaily))
+                db.execute(delete(SaleDailyInvoice))
+                db.execute(delete(SaleDailySketch))
+                SaleRollupRepository._refresh_days(db, None)
+                SaleRollupRepository._set_high_water_mark(db, max_id)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        return {"days": db.query(func.count(distinct(SaleDaily.sale_date))).scalar(),
+                "rows": db.query(func.count()).select_from(SaleDaily).scalar(),
+                "high_water_mark": int(max_id)}
+
+    @staticmethod
+    def _refresh_days(db: Session, days):
+        """Borra y recalcula (INSERT ... SELECT agregado) los días indicados; None = todos."""
+        invoice = func.coalesce(Sale.invoice_number, literal_column("''"))
+        daily = (select(Sale.sale_date, Sale.product_code, func.sum(Sale.quantity),
+                        func.coalesce(func.sum(Sale.total), 0), func.count(Sale.id),
+                        SaleRepository.distinct_invoices())
+                 .group_by(Sale.sale_date, Sale.product_code))
+        invoices = select(Sale.sale_date, invoice, func.count(Sale.id)).group_by(Sale.sale_date, invoice)
+
+        if days is not None:
+            db.execute(delete(SaleDaily).where(SaleDaily.sale_date.in_(days)))
+            db.execute(delete(SaleDailyInvoice).where(SaleDailyInvoice.sale_date.in_(days)))
+            daily = daily.where(Sale.sale_date.in_(days))
+            invoices = invoices.where(Sale.sale_date.in_(days))
+
+        db.execute(insert(SaleDaily).from_select(
+            ["sale_date", "product_code", "quantity", "total", "lines", "invoices"], daily))
+        db.execute(insert(SaleDailyInvoice).from_select(["sale_date", "invoice_number", "lines"], invoices))
+        SaleRollupRepository._refresh_sketches(db, days)
+
+    @staticmethod
+    def _backfill_sketches(db: Session):
+        """
+        Rollups creados antes de los sketches: calcularlos una vez para toda la historia
+        (dentro de la transacción de catch_up, que hace el commit).
+        """
+        key = str(db.get_bind().url)
+        if key in SaleRollupRepository._sketches_ready:
+            return
+        has_invoices = db.query(SaleDailyInvoice.sale_date).first() is not None
+        if has_invoices and db.query(SaleDailySketch.sale_date).first() is None:
+            SaleRollupRepository._refresh_sketches(db, None)
+        SaleRollupRepository._sketches_ready.add(key)
+
+    @staticmethod
+    def _refresh_sketches(db: Session, days):
+        """Recalcula los sketches de facturas de los días indicados (None = todos) desde ventas_daily_invoices."""
+        p = SaleRollupRepository.sketch_precision()
+        q = db.query(SaleDailyInvoice.sale_date, SaleDailyInvoice.invoice_number)
+        if days is not None:
+            db.execute(delete(SaleDailySketch).where(SaleDailySketch.sale_date.in_(days)))
+            q = q.filter(SaleDailyInvoice.sale_date.in_(days))
+
+        batch, current, sketch = [], None, None
+        for d, invoice in q.order_by(SaleDailyInvoice.sale_date).yield_per(10000):
+            if d != current:
+                if sketch is not None:
+                    batch.append({"sale_date": current, "hll_precision": p, "registers": sketch.to_bytes()})
+                current, sketch = d, HyperLogLog(p)
+            sketch.add(invoice)
+            if len(batch) >= 1000:
+                db.execute(insert(SaleDailySketch), batch)
+                batch = []
+        if sketch is not None:
+            batch.append({"sale_date": current, "hll_precision": p, "registers": sketch.to_bytes()})
+        if batch:
+            db.execute(insert(SaleDailySketch), batch)
+
+    @staticmethod
+    def verify(db: Session, limit=20):
+        """
+        Compara el rollup con un agregado directo de 'ventas' hasta la marca de agua.
+        Retorna {"ok", "checked", "mismatches": [...]} (máximo 'limit' diferencias).
+        """
+        SaleRollupRepository.ensure_tables(db.get_bind())
+        hwm = SaleRollupRepository.get_high_water_mark(db)
+        raw = (db.query(Sale.sale_date, Sale.product_code, func.sum(Sale.quantity),
+                        func.coalesce(func.sum(Sale.total), 0), func.count(Sale.id), SaleRepository.distinct_invoices())
+               .filter(Sale.id <= hwm)
+               .group_by(Sale.sale_date, Sale.product_code).all())
+        expected = {(d, p): (int(q), float(t), int(n), int(i)) for d, p, q, t, n, i in raw}
+        actual = {(r.sale_date, r.product_code): (int(r.quantity), float(r.total), int(r.lines), int(r.invoices))
+                  for r in db.query(SaleDaily).all()}
+
+        raw_inv = (db.query(Sale.sale_date, SaleRepository.distinct_invoices())
+                   .filter(Sale.id <= hwm).group_by(Sale.sale_date).all())
+        expected_inv = {d: int(n) for d, n in raw_inv}
+        actual_inv = dict(db.query(SaleDailyInvoice.sale_date, func.count()).group_by(SaleDailyInvoice.sale_date).all())
+
+        mismatches = []
+        for key in sorted(set(expected) | set(actual)):
+            e, a = expected.get(key), actual.get(key)
+            if e is None or a is None or e[0] != a[0] or abs(e[1] - a[1]) > 0.005 or e[2:] != a[2:]:
+                mismatches.append({"sale_date": str(key[0]), "product_code": key[1], "raw": e, "rollup": a})
+        for d in sorted(set(expected_inv) | set(actual_inv)):
+            if expected_inv.get(d) != actual_inv.get(d):
+                mismatches.append({"sale_date": str(d), "invoices_raw": expected_inv.get(d), "invoices_rollup": actual_inv.get(d)})
+        return {"ok": not mismatches, "checked": len(expected), "high_water_mark": hwm,
+                "mismatches": mismatches[:limit], "n_mismatches": len(mismatches)}
+
+    @staticmethod
+    def get_daily_quantities(db: Session, products=None, startdate=None, enddate=None):
+        """Mismo contrato que SaleRepository.get_daily_quantities, leyendo del rollup."""
+        return SaleRollupRepository._daily_quantities_query(db, products, startdate, enddate).all()
+
+    @staticmethod
+    def iter_daily_quantities(db: Session, products=None, startdate=None, enddate=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Mismo contrato que SaleRepository.iter_daily_quantities (bloques en streaming), leyendo del rollup."""
+        return SaleRepository.stream(SaleRollupRepository._daily_quantities_query(db, products, startdate, enddate), chunk_size)
+
+    @staticmethod
+    def _daily_quantities_query(db: Session, products=None, startdate=None, enddate=None):
+        q = db.query(SaleDaily.sale_date, SaleDaily.product_code, SaleDaily.quantity)
+        if products is not None:
+            q = q.filter(SaleDaily.product_code.in_(list(products)))
+        if startdate is not None:
+            q = q.filter(SaleDaily.sale_date >= startdate)
+        if enddate is not None:
+            q = q.filter(SaleDaily.sale_date <= enddate)
+        return q.order_by(SaleDaily.sale_date, SaleDaily.product_code)
+
+    @staticmethod
+    def get_range_totals(db: Session, ranges):
+        """Mismo contrato que SaleRepository.get_range_totals, leyendo del rollup."""
+        bucket = case(*[(SaleDaily.sale_date.between(start, end), label) for label, (start, end) in ranges.items()]).label("bucket")
+        rows = (db.query(bucket, func.sum(SaleDaily.lines), func.coalesce(func.sum(SaleDaily.total), 0))
+                .filter(SaleDaily.sale_date >= min(s for s, _ in ranges.values()),
+                        SaleDaily.sale_date <= max(e for _, e in ranges.values()))
+                .group_by("bucket").all())
+        invoices = SaleRollupRepository.get_range_invoices(db, ranges)
+        totals = {label: (0, invoices[label], 0) for label in ranges}
+        for label, n, amount in rows:
+            if label is not None:
+                totals[label] = (int(n), invoices[label], amount)
+        return totals
+
+    @staticmethod
+    def get_daily_totals(db: Session):
+        """Mismo contrato que SaleRepository.get_daily_totals, leyendo del rollup."""
+        per_day = (db.query(SaleDaily.sale_date, func.sum(SaleDaily.quantity), func.sum(SaleDaily.total), func.sum(SaleDaily.lines))
+                   .group_by(SaleDaily.sale_date).order_by(SaleDaily.sale_date).all())
+        invoices = dict(db.query(SaleDailyInvoice.sale_date, func.count()).group_by(SaleDailyInvoice.sale_date).all())
+        return [(d, q, t, n, invoices.get(d, 0)) for d, q, t, n in per_day]
+
+    @staticmethod
+    def get_range_invoices(db: Session, ranges):
+        """Mismo contrato que SaleRepository.get_range_invoices, leyendo del rollup."""
+        bucket = case(*[(SaleDailyInvoice.sale_date.between(start, end), label) for label, (start, end) in ranges.items()]).label("bucket")
+        rows = (db.query(bucket, func.count(distinct(SaleDailyInvoice.invoice_number)))
+                .filter(SaleDailyInvoice.sale_date >= min(s for s, _ in ranges.values()),
+                        SaleDailyInvoice.sale_date <= max(e for _, e in ranges.values()))
+                .group_by("bucket").all())
+        invoices = {label: 0 for label in ranges}
+        invoices.update({label: int(n) for label, n in rows if label is not None})
+        return invoices
+
+    @staticmethod
+    def estimate_range_invoices(db: Session, ranges):
+        """
+        Facturas únicas aproximadas por rango {etiqueta: (inicio, fin)}: unión de los sketches
+        diarios de cada rango, recorridos en una sola consulta. La memoria es un sketch por rango.
+        Retorna ({etiqueta: estimación}, error estándar relativo).
+        """
+        merged = {label: HyperLogLog(SaleRollupRepository.sketch_precision()) for label in ranges}
+        bounds = sorted((start, end, label) for label, (start, end) in ranges.items())
+        q = (db.query(SaleDailySketch.sale_date, SaleDailySketch.hll_precision, SaleDailySketch.registers)
+             .filter(or_(*[SaleDailySketch.sale_date.between(start, end) for start, end, _ in bounds]))
+             .order_by(SaleDailySketch.sale_date))
+        for d, precision, registers in q.yield_per(1000):
+            day = HyperLogLog(precision, registers)
+            for start, end, label in bounds:
+                if start <= d <= end:
+                    if day.p < merged[label].p:  # sketches guardados con menor precisión (HLL_ERROR cambió)
+                        merged[label] = merged[label].fold(day.p)
+                    merged[label].merge(day)
+        p = min(sketch.p for sketch in merged.values()) if merged else SaleRollupRepository.sketch_precision()
+        return {label: sketch.count() for label, sketch in merged.items()}, HyperLogLog.relative_error(p)
+
+    @staticmethod
+    def get_daily_invoice_counts(db: Session, ranges):
+        """Mismo contrato que SaleRepository.get_daily_invoice_counts, leyendo del rollup."""
+        rows = (db.query(SaleDailyInvoice.sale_date, func.count())
+                .filter(or_(*[SaleDailyInvoice.sale_date.between(start, end) for start, end in ranges]))
+                .group_by(SaleDailyInvoice.sale_date)
+                .all())
+        return {d: int(n) for d, n in rows}
+
+    @staticmethod
+    def source(db: Session):
+        """
+        Repositorio para lecturas diarias: el rollup si está al día o, si no (ventas que
+        el job todavía no incorporó, rollup sin construir) o SALES_ROLLUP=0, la tabla cruda.
+        Sólo lee: catch_up corre en la carga de ventas, en RollupJob y en el CLI.
+        """
+        if not SaleRollupRepository.enabled():
+            return SaleRepository
+        SaleRollupRepository.ensure_tables(db.get_bind())
+        return SaleRollupRepository if SaleRollupRepository.is_current(db) else SaleRepository
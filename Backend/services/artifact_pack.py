@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import struct
+import hashlib
+
+import numpy as np
+
+from services.model_registry import model_registry
+
+
+class ArtifactPack:
+    """
+    Índice empaquetado de scalers y calibraciones (data/models/scalers/artifacts.pack) que
+    reemplaza los cientos de <producto>.json y <producto>.<ARCH>.calib.json sueltos.
+    Formato (se abre con mmap, sólo lectura):
+    - MAGIC + n (uint32) + ancho de clave (uint32),
+    - claves ordenadas de ancho fijo ("scaler:P001", "calib:P001:MLP", ...) → búsqueda binaria,
+    - n + 1 offsets uint64 a la zona de datos,
+    - documentos JSON (utf-8) concatenados.
+    Una búsqueda sólo toca las páginas de su clave y su documento; los workers de uvicorn
+    comparten las páginas del page cache en lugar de leer y parsear cada uno sus archivos.
+    Al entrenar se siguen escribiendo archivos sueltos (cada proceso de entrenamiento escribe
+    los suyos sin coordinarse); tienen prioridad sobre el pack y compact() (python -m cli.pack,
+    paso explícito de despliegue) los incorpora.
+    """
+
+    MAGIC = b"ARTPACK1"
+    FILENAME = "artifacts.pack"
+    LOOSE = re.compile(r"^(?P<product>[^.]+)(?:\.(?P<arch>[^.]+)\.calib)?\.json$")
+
+    def __init__(self, path):
+        self.path = path
+        self._mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        magic = bytes(self._mapped[:8])
+        if magic != ArtifactPack.MAGIC:
+            raise ValueError(f"{path}: no es un pack de artefactos")
+        n, width = struct.unpack("<II", bytes(self._mapped[8:16]))
+        keys_end = 16 + n * width
+        offsets_at = ArtifactPack._align8(keys_end)
+        self._keys = np.ndarray((n,), dtype=f"S{max(width, 1)}", buffer=self._mapped, offset=16)
+        self._offsets = np.ndarray((n + 1,), dtype="<u8", buffer=self._mapped, offset=offsets_at)
+        self._data_at = offsets_at + 8 * (n + 1)
+
+    @staticmethod
+    def path_for(SCALER_DIR):
+        return os.path.join(SCALER_DIR, ArtifactPack.FILENAME)
+
+    @staticmethod
+    def scaler_key(product):
+        return f"scaler:{product}"
+
+    @staticmethod
+    def calib_key(product, arch):
+        return f"calib:{product}:{arch}"
+
+    @staticmethod
+    def _align8(n):
+        return -(-n // 8) * 8
+
+    # ------------------------------------------------------------------ lectura
+
+    @staticmethod
+    def load(SCALER_DIR):
+        """Pack del directorio desde el registro (se re-mapea si cambia el archivo); None si no hay."""
+        path = ArtifactPack.path_for(SCALER_DIR)
+        return model_registry.get(("pack", os.path.abspath(SCALER_DIR)), path, ArtifactPack)
+
+    @staticmethod
+    def lookup(SCALER_DIR, key):
+        pack = ArtifactPack.load(SCALER_DIR)
+        return pack.get(key) if pack is not None else None
+
+    @staticmethod
+    def entry_digest(SCALER_DIR, key):
+        """Hash del documento de la clave (versión de una entrada, independiente del resto del pack) o None."""
+        pack = ArtifactPack.load(SCALER_DIR)
+        raw = pack.raw(key) if pack is not None else None
+        return hashlib.sha1(raw).hexdigest() if raw is not None else None
+
+    def raw(self, key):
+        """Bytes (JSON utf-8) del documento de la clave o None."""
+        k = key.encode("utf-8")
+        i = int(np.searchsorted(self._keys, k))
+        if i >= len(self._keys) or self._keys[i] != k:
+            return None
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._mapped[self._data_at + start:self._data_at + end])
+
+    def get(self, key):
+        """Documento de la clave (dict) o None."""
+        raw = self.raw(key)
+        return json.loads(raw.decode("utf-8")) if raw is not None else None
+
+    def keys(self):
+        return [k.decode("utf-8") for k in self._keys]
+
+    def __len__(self):
+        return len(self._keys)
+
+    # ------------------------------------------------------------------ escritura
+
+    @staticmethod
+    def write(path, entries):
+        """Escribe (de forma atómica) el pack con entries {clave: documento JSON}."""
+        keys = sorted(entries)
+        encoded = [k.encode("utf-8") for k in keys]
+        width = max((len(k) for k in encoded), default=0)
+        docs = [json.dumps(entries[k], separators=(",", ":")).encode("utf-8") for k in keys]
+        offsets = np.zeros(len(docs) + 1, dtype="<u8")
+        np.cumsum([len(d) for d in docs], out=offsets[1:])
+
+        keys_end = 16 + len(keys) * width
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(ArtifactPack.MAGIC)
+            f.write(struct.pack("<II", len(keys), width))
+            f.write(np.array(encoded, dtype=f"S{max(width, 1)}").tobytes() if keys else b"")
+            f.write(b"\0" * (ArtifactPack._align8(keys_end) - keys_end))
+            f.write(offsets.tobytes())
+            for d in docs:
+                f.write(d)
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def compact(SCALER_DIR, remove=False, keep=()):
+        """
+        Incorpora al pack los scalers y calibraciones sueltos del directorio. remove=True borra
+        además los archivos incorporados (sólo si no cambiaron mientras tanto), salvo los de
+        'keep' (p. ej. los versionados en git). Retorna un resumen.
+        """
+        path = ArtifactPack.path_for(SCALER_DIR)
+        entries = {}
+        if os.path.exists(path):
+            pack = ArtifactPack(path)
+            entries = {k: pack.get(k) for k in pack.keys()}
+
+        absorbed = {}
+        for fname in sorted(os.listdir(SCALER_DIR)):
+            match = ArtifactPack.LOOSE.match(fname)
+            if match is None:
+                continue
+            fpath = os.path.join(SCALER_DIR, fname)
+            st = os.stat(fpath)
+            try:
+                with open(fpath, "r") as f:
+                    doc = json.load(f)
+            except (OSError, ValueError):
+                continue
+            key = (ArtifactPack.calib_key(match["product"], match["arch"]) if match["arch"]
+                   else ArtifactPack.scaler_key(match["product"]))
+            entries[key] = doc
+            absorbed[fpath] = (st.st_mtime_ns, st.st_size)
+
+        ArtifactPack.write(path, entries)
+        removed = 0
+        keep = {os.path.abspath(k) for k in keep}
+        for fpath, version in (absorbed.items() if remove else ()):
+            if os.path.abspath(fpath) in keep:
+                continue
+            try:
+                st = os.stat(fpath)
+                if (st.st_mtime_ns, st.st_size) == version:
+                    os.remove(fpath)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return {"path": path, "entries": len(entries), "absorbed": len(absorbed), "removed": removed,
+                "bytes": os.path.getsize(path)}
@@ -0,0 +1,165 @@
+import numpy as np
+
+from numpy.lib.stride_tricks import sliding_window_view
+from services.inference_engine import inference_engine
+
+
+class BacktestService:
+
+    @staticmethod
+    def backtest(model, arch, arr_z, scaler, sigma, LOOKBACK, VAL_DAYS, horizon=1, folds=None):
+        """
+        Backtest rolling-origin sobre los últimos VAL_DAYS días de la serie (en z).
+        Construye todas las ventanas de validación de una vez y las evalúa en un
+        único forward pass por lotes. Con horizon=1 y folds=None reproduce el
+        bucle one-step día a día (la ventana avanza con el valor real).
+        """
+        origins, X, Y = BacktestService.rolling_origin_windows(arr_z, LOOKBACK, VAL_DAYS, horizon, folds)
+        preds_z = BacktestService.batched_forecast(model, arch, X, horizon)
+        return BacktestService.metric_block(Y, preds_z, sigma, scaler)
+
+    @staticmethod
+    def backtest_many(arch, models, arr_zs, scalers, sigmas, LOOKBACK, VAL_DAYS, horizon=1, folds=None):
+        """
+        Backtest de varios productos con la misma arquitectura: las ventanas de
+        validación de todos se evalúan juntas con el motor de inferencia por lotes.
+        Retorna una lista de bloques de métricas (mismo orden que models).
+        """
+        windows = [BacktestService.rolling_origin_windows(a, LOOKBACK, VAL_DAYS, horizon, folds) for a in arr_zs]
+        outs = inference_engine.predict_many(arch, models, [X for _, X, _ in windows])
+
+        results = []
+        for model, (_, X, Y), yhat, scaler, sigma in zip(models, windows, outs, scalers, sigmas):
+            if yhat.shape[1] >= horizon:
+                preds_z = yhat[:, :horizon]
+            else:
+                preds_z = BacktestService.batched_forecast(model, arch, X, horizon)
+            results.append(BacktestService.metric_block(Y, preds_z, sigma, scaler))
+        return results
+
+    @staticmethod
+    def rolling_origin_windows(arr_z, lookback, val_days, horizon=1, folds=None):
+        """
+        Genera los orígenes de validación y sus ventanas:
+        - origins: (F,) índice t del primer día pronosticado en cada fold
+        - X: (F, lookback) con arr_z[t-lookback:t]
+        - Y: (F, horizon) con arr_z[t:t+horizon]
+        Si folds < orígenes disponibles, se reparten uniformemente en la validación.
+        """
+        arr_z = np.asarray(arr_z, dtype=np.float32)
+        n = len(arr_z)
+        start_val = n - val_days
+        if start_val < lookback:
+            raise ValueError(f"Serie demasiado corta: len={n}; se requiere >= {lookback + val_days}")
+        if horizon < 1 or horizon > val_days:
+            raise ValueError(f"horizon inválido: {horizon} (VAL_DAYS={val_days})")
+
+        origins = np.arange(start_val, n - horizon + 1)
+        if folds is not None and 0 < folds < len(origins):
+            pick = np.linspace(0, len(origins) - 1, folds).round().astype(int)
+            origins = origins[pick]
+
+        # vistas sin copia; el fancy-indexing final copia solo F×lookback valores
+        X = sliding_window_view(arr_z, lookback)[origins - lookback]
+        Y = sliding_window_view(arr_z, horizon)[origins]
+        return origins, X, Y
+
+    @staticmethod
+    def batched_forecast(model, arch, X, horizon=1):
+        """
+        Pronóstico para un lote de ventanas X (F, lookback) en z.
+        - Modelos multi-salida: una sola llamada, se toman las primeras 'horizon' salidas.
+        - Modelos de una salida: avance iterativo en paralelo (lock-step) para todas las ventanas.
+        Retorna (F, horizon).
+        """
+        x = np.asarray(X, dtype=np.float32)
+        yhat = BacktestService._predict_batch(model, arch, x)
+        if yhat.shape[1] >= horizon:
+            return yhat[:, :horizon]
+
+        preds = [yhat[:, 0]]
+        for _ in range(horizon - 1):
+            x = np.concatenate([x[:, 1:], preds[-1][:, None]], axis=1)
+            preds.append(BacktestService._predict_batch(model, arch, x)[:, 0])
+        return np.stack(preds, axis=1)
+
+    @staticmethod
+    def _predict_batch(model, arch, x):
+        x_in = x[..., None] if arch != "MLP" else x   # CNN/LSTM esperan (F, lookback, 1)
+        yhat = model.predict(x_in, batch_size=max(len(x_in), 1), verbose=0)
+        return np.asarray(yhat, dtype=np.float32).reshape(len(x_in), -1)
+
+    @staticmethod
+    def step_sigma(sigma, y_pred_z):
+        """
+        Alinea sigma con las predicciones aplanadas: un escalar se usa tal cual; uno por paso
+        del horizonte (H,) aporta sus primeros h pasos a cada fila de y_pred_z (F, h), o el
+        del primer paso si y_pred_z es 1-D (pronósticos one-step).
+        """
+        sigma = np.asarray(sigma, dtype=np.float32)
+        if sigma.ndim == 0:
+            return sigma
+        y_pred_z = np.asarray(y_pred_z)
+        h = y_pred_z.shape[-1] if y_pred_z.ndim > 1 else 1
+        return np.broadcast_to(sigma[:h], (y_pred_z.size // h, h)).reshape(-1)
+
+    @staticmethod
+    def metric_block(y_true_z, y_pred_z, sigma, scaler):
+        """
+        Bloque de métricas de validación en escala original
+        (MAE, RMSE, MAPE, sMAPE, bias, cobertura del intervalo 95%).
+        sigma: escalar o por paso del horizonte (ver step_sigma).
+        """
+        sigma = BacktestService.step_sigma(sigma, y_pred_z)
+        y_true_z = np.asarray(y_true_z, dtype=np.float32).reshape(-1)
+        y_pred_z = np.asarray(y_pred_z, dtype=np.float32).reshape(-1)
+
+        # a escala original
+        y_true_val = scaler.inverse_transform(y_true_z)
+        y_pred_val = scaler.inverse_transform(y_pred_z)
+
+        err = y_pred_val - y_true_val
+        mae = float(np.mean(np.abs(err)))
+        mse = float(np.mean(err**2))
+        rmse = float(np.sqrt(mse))
+        mape = BacktestService._safe_mape(y_true_val, y_pred_val)
+        smape = BacktestService._smape(y_true_val, y_pred_val)
+        bias = float(np.mean(err))  # >0 sobre-pronóstico; <0 sub-pronóstico
+        mae_pct_of_mean = float(mae / (np.mean(np.abs(y_true_val)) + 1e-8) * 100.0)
+
+        # cobertura 95% en validación con el sigma de cada paso (PI en z → original)
+        lower_val = scaler.inverse_transform(y_pred_z - 1.96 * sigma)
+        upper_val = scaler.inverse_transform(y_pred_z + 1.96 * sigma)
+        covered = np.logical_and(y_true_val >= lower_val, y_true_val <= upper_val)
+        coverage_95 = float(np.mean(covered) * 100.0)
+
+        # rating simple según MAPE (ajusta si quieres)
+        if mape <= 10:
+            eval_label = "bueno"
+        elif mape <= 20:
+            eval_label = "medio"
+        else:
+            eval_label = "malo"
+
+        return {
+            "mae": mae,
+            "mse": mse,
+            "rmse": rmse,
+            "mape_pct": mape,
+            "smape_pct": smape,
+            "bias": bias,
+            "mae_pct_of_mean": mae_pct_of_mean,
+            "coverage_95_pct": coverage_95,
+            "eval": eval_label,
+            "n_val": int(y_true_z.size),
+        }
+
+    @staticmethod
+    def _safe_mape(y_true, y_pred, eps=1e-8):
+        denom = np.maximum(np.abs(y_true), eps)
+        return float(np.mean(np.abs((y_true - y_pred) / denom)) * 100.0)
+
+    @staticmethod
+    def _smape(y_true, y_pred, eps=1e-8):
+        denom = np.maximum((np.abs(y_true) + np.abs(y_pred)) / 2.0, eps)
+        return float(np.mean(np.abs(y_true - y_pred) / denom) * 100.0)
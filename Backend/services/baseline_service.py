@@ -0,0 +1,249 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from datetime import timedelta
+from sqlalchemy.orm import Session
+
+from models.Scaler import Scaler
+from repositories.sale_repository import SaleRepository
+from services.backtest_service import BacktestService
+from services.champion_service import ChampionService
+from services.forecast_cache import forecast_cache
+from services.model_service import ModelService
+
+
+class BaselineService:
+    """
+    Tier estadístico barato para la cola del catálogo (baja rotación o demanda intermitente).
+    Ajusta todos los productos a la vez sobre la matriz productos × días (recurrencias
+    vectorizadas entre productos, un paso de tiempo por iteración):
+    - SNAIVE: naive estacional semanal (mismo día de la semana anterior),
+    - MA: media móvil de los últimos MA_WINDOW días,
+    - SES: suavizado exponencial simple; alpha por producto entre ALPHAS (SSE one-step antes de validación),
+    - CROSTON_SBA: Croston con el sesgo corregido de Syntetos-Boylan (demanda intermitente).
+    Cada método produce el pronóstico one-step de los últimos VAL_DAYS días (backtest con el
+    mismo bloque de métricas que las redes) y el pronóstico a HORIZON días. Trabaja en la
+    escala original (scaler identidad): sigma es el desvío de los residuales de validación.
+    """
+
+    METHODS = ("SNAIVE", "MA", "SES", "CROSTON_SBA")
+    SEASON = 7
+    MA_WINDOW = 28
+    ALPHAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+    CROSTON_ALPHA = 0.1
+    IDENTITY = Scaler(0.0, 1.0)
+
+    # ------------------------------------------------------------------ enrutamiento
+
+    @staticmethod
+    def thresholds():
+        """Cortes del enrutamiento (BASELINE_ADI, BASELINE_MIN_DAILY, BASELINE_RECENT_DAYS >= 1)."""
+        recent_days = int(os.getenv("BASELINE_RECENT_DAYS", "365"))
+        if recent_days < 1:
+            raise ValueError(f"BASELINE_RECENT_DAYS inválido: {recent_days}; debe ser >= 1")
+        return {
+            "adi": float(os.getenv("BASELINE_ADI", "1.32")),
+            "min_daily": float(os.getenv("BASELINE_MIN_DAILY", "1.0")),
+            "recent_days": recent_days,
+        }
+
+    @staticmethod
+    def route(dataset, LOOKBACK=60, VAL_DAYS=90):
+        """
+        Tier de cada producto de la matriz: "baseline" si en los últimos recent_days
+        - el intervalo medio entre ventas (ADI = días / días con venta) es >= adi
+          (1.32: corte de Syntetos-Boylan entre demanda regular e intermitente),
+        - o la venta media diaria es < min_daily,
+        - o la serie no alcanza para las redes (LOOKBACK + VAL_DAYS + 5 días);
+        "neural" en otro caso (cabeza del catálogo). Retorna {producto: {tier, adi, mean_daily, zero_pct}}.
+        """
+        t = BaselineService.thresholds()
+        values = dataset.values
+        recent = values[:, max(values.shape[1] - t["recent_days"], 0):]
+        days = recent.shape[1]
+        nonzero = np.count_nonzero(recent > 0, axis=1)
+        adi = np.where(nonzero > 0, days / np.maximum(nonzero, 1), np.inf)
+        mean_daily = recent.mean(axis=1) if days else np.zeros(len(dataset.products))
+        short = dataset.n_days < LOOKBACK + VAL_DAYS + 5
+        baseline = (adi >= t["adi"]) | (mean_daily < t["min_daily"]) | short
+        return {
+            p: {"tier": "baseline" if baseline[i] else "neural",
+                "adi": float(adi[i]) if np.isfinite(adi[i]) else None,
+                "mean_daily": float(mean_daily[i]),
+                "zero_pct": float(100.0 * (1 - nonzero[i] / days)) if days else 100.0}
+            for i, p in enumerate(dataset.products)
+        }
+
+    # ------------------------------------------------------------------ métodos
+
+    @staticmethod
+    def fit_forecast(values, VAL_DAYS, HORIZON):
+        """
+        values: (P, T). Retorna {método: (val_pred (P, VAL_DAYS), forecast (P, HORIZON))};
+        val_pred[:, j] es el pronóstico one-step del día T - VAL_DAYS + j con datos hasta el día anterior.
+        """
+        y = np.asarray(values, dtype=np.float64)
+        return {
+            "SNAIVE": BaselineService.seasonal_naive(y, VAL_DAYS, HORIZON),
+            "MA": BaselineService.moving_average(y, VAL_DAYS, HORIZON),
+            "SES": BaselineService.ses(y, VAL_DAYS, HORIZON),
+            "CROSTON_SBA": BaselineService.croston_sba(y, VAL_DAYS, HORIZON),
+        }
+
+    @staticmethod
+    def seasonal_naive(y, VAL_DAYS, HORIZON, season=None):
+        season = season or BaselineService.SEASON
+        n = y.shape[1]
+        origins = np.arange(n - VAL_DAYS, n)
+        val = y[:, np.maximum(origins - season, 0)]
+        fcst = y[:, n - season + np.arange(HORIZON) % season]
+        return val, fcst
+
+    @staticmethod
+    def moving_average(y, VAL_DAYS, HORIZON, window=None):
+        window = window or BaselineService.MA_WINDOW
+        n = y.shape[1]
+        csum = np.concatenate([np.zeros((len(y), 1)), np.cumsum(y, axis=1)], axis=1)
+        origins = np.arange(n - VAL_DAYS, n + 1)             # el último origen es el pronóstico
+        lo = np.maximum(origins - window, 0)
+        means = (csum[:, origins] - csum[:, lo]) / np.maximum(origins - lo, 1)
+        return means[:, :-1], np.repeat(means[:, -1:], HORIZON, axis=1)
+
+    @staticmethod
+    def ses(y, VAL_DAYS, HORIZON, alphas=None):
+        alphas = np.asarray(alphas or BaselineService.ALPHAS, dtype=np.float64)[:, None]   # (A, 1)
+        n_products, n = y.shape
+        split = n - VAL_DAYS
+        level = np.repeat(y[None, :, 0], len(alphas), axis=0)                              # (A, P)
+        sse = np.zeros_like(level)
+        for t in range(1, split):
+            err = y[:, t] - level
+            sse += err ** 2
+            level += alphas * err
+        # alpha por producto con menor SSE one-step en el tramo de entrenamiento
+        best = np.argmin(sse, axis=0)
+        cols = np.arange(n_products)
+        alpha, level = alphas[best, 0], level[best, cols]
+        val = np.empty((n_products, VAL_DAYS))
+        for j, t in enumerate(range(split, n)):
+            val[:, j] = level
+            level = level + alpha * (y[:, t] - level)
+        return val, np.repeat(level[:, None], HORIZON, axis=1)
+
+    @staticmethod
+    def croston_sba(y, VAL_DAYS, HORIZON, alpha=None):
+        alpha = alpha or BaselineService.CROSTON_ALPHA
+        n_products, n = y.shape
+        split = n - VAL_DAYS
+        size = np.zeros(n_products)            # tamaño de demanda suavizado
+        interval = np.ones(n_products)         # intervalo entre demandas suavizado
+        since = np.zeros(n_products)           # días desde la última demanda
+        started = np.zeros(n_products, dtype=bool)
+        val = np.empty((n_products, VAL_DAYS))
+
+        def forecast():
+            return np.where(started, (1.0 - alpha / 2.0) * size / interval, 0.0)
+
+        for t in range(n):
+            if t >= split:
+                val[:, t - split] = forecast()
+            since += 1
+            demand = y[:, t] > 0
+            first = demand & ~started
+            update = demand & started
+            size = np.where(first, y[:, t], np.where(update, size + alpha * (y[:, t] - size), size))
+            interval = np.where(first, since, np.where(update, interval + alpha * (since - interval), interval))
+            since = np.where(demand, 0.0, since)
+            started |= demand
+        return val, np.repeat(forecast()[:, None], HORIZON, axis=1)
+
+    # ------------------------------------------------------------------ predict
+
+    @staticmethod
+    def predict_page(db: Session, products=None, offset=0, limit=None, route=False, compare=False):
+        """
+        Página de productos con ventas (orden alfabético). route=True: los de tier "neural" con
+        modelos entrenados se pronostican con las redes y el resto con el tier estadístico.
+        Sin compare cada producto trae sólo su mejor método (campeón de las redes o, en el tier
+        estadístico, el de menor métrica de validación).
+        """
+        dataset = ModelService.load_data(db, products=products)
+        page = ModelService.paginate(dataset.products, None, offset, limit)
+        if not route:
+            return BaselineService.predict(db, page, dataset, compare=compare)
+
+        tiers = BaselineService.route(dataset.subset(page))
+        trained = set(ModelService.trained_products())
+        neural = [p for p in page if tiers[p]["tier"] == "neural" and p in trained]
+        rows = {r["product_code"]: r for r in ModelService.predict(db, products=neural, compare=compare)} if neural else {}
+        # los que las redes no cubren (p. ej. serie corta) caen al tier estadístico
+        rest = [p for p in page if p not in rows]
+        rows.update({r["product_code"]: r for r in BaselineService.predict(db, rest, dataset, compare=compare)})
+        return [rows[p] for p in page if p in rows]
+
+    @staticmethod
+    def tiers(db: Session, products=None):
+        """Enrutamiento de cada producto con ventas, los cortes vigentes y si tiene redes entrenadas."""
+        dataset = ModelService.load_data(db, products=products)
+        trained = set(ModelService.trained_products())
+        routes = BaselineService.route(dataset)
+        for product, entry in routes.items():
+            entry["trained"] = product in trained
+        counts = {tier: sum(1 for e in routes.values() if e["tier"] == tier) for tier in ("neural", "baseline")}
+        return {"thresholds": BaselineService.thresholds(), "counts": counts, "products": routes}
+
+    @staticmethod
+    def predict(db: Session, products=None, dataset=None, compare=True):
+        """
+        Forecast del tier estadístico con la misma forma de respuesta que ModelService.predict
+        (una fila por producto, un bloque por método con histórico, PI 95%, resumen y métricas).
+        dataset: matriz ya cargada (p. ej. por el enrutamiento) para no volver a leerla.
+        compare=False: sólo el método con menor métrica de validación (CHAMPION_METRIC) por producto.
+        """
+        VAL_DAYS = 90
+        HORIZON = 90
+        HISTORY_PLOT_DAYS = 365
+
+        watermark = SaleRepository.get_watermark(db)
+        forecast_cache.observe_watermark(watermark)
+        metric = None if compare else ChampionService.metric()
+        cache_key = forecast_cache.make_key("baseline", watermark, products, VAL_DAYS=VAL_DAYS, HORIZON=HORIZON,
+                                            HISTORY_PLOT_DAYS=HISTORY_PLOT_DAYS, METHODS=BaselineService.METHODS,
+                                            metric=metric)
+        cached = forecast_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if dataset is None:
+            dataset = ModelService.load_data(db, products=products)
+        if products is not None:
+            dataset = dataset.subset(products)
+        wanted = dataset.products
+        if not wanted or dataset.n_days < VAL_DAYS + BaselineService.SEASON:
+            return []
+        values = dataset.values
+
+        y_val = values[:, -VAL_DAYS:]
+        fitted = BaselineService.fit_forecast(values, VAL_DAYS, HORIZON)
+        fcst_idx = pd.date_range(dataset.end + timedelta(days=1), periods=HORIZON, freq="D")
+        output = [{"product_code": p, "models": {}} for p in wanted]
+        histories = [ModelService._history(values[i], dataset.end, HISTORY_PLOT_DAYS) for i in range(len(wanted))]
+
+        sigmas = {m: np.std(y_val - fitted[m][0], axis=1, ddof=1) for m in BaselineService.METHODS}
+        metrics = {m: [BacktestService.metric_block(y_val[i], fitted[m][0][i], float(sigmas[m][i]), BaselineService.IDENTITY)
+                       for i in range(len(wanted))] for m in BaselineService.METHODS}
+        for i in range(len(wanted)):
+            methods = BaselineService.METHODS
+            best = ChampionService.select({m: metrics[m][i][metric] for m in methods}) if metric is not None else None
+            if best is not None:
+                methods = [best]
+            hist_dates, hist_values = histories[i]
+            for method in methods:
+                output[i]["models"][method] = ModelService._model_payload(
+                    hist_dates, hist_values, fcst_idx, fitted[method][1][i], float(sigmas[method][i]),
+                    BaselineService.IDENTITY, metrics[method][i])
+
+        forecast_cache.set(cache_key, output)
+        return output
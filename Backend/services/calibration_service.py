@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from services.artifact_pack import ArtifactPack
+from services.backtest_service import BacktestService
+from utils.utils import atomic_write_json
+
+
+class CalibrationService:
+    """
+    Calibración por producto y arquitectura calculada al entrenar y guardada junto
+    al scaler (data/models/scalers/<producto>.<ARCH>.calib.json, luego empaquetada en artifacts.pack):
+    - sigma de residuales de validación (global y por paso del horizonte),
+    - bloque de métricas del backtest de validación.
+    Se escribe sólo al entrenar (build_models, finetune_product, calibrate_missing); predict
+    sólo la lee: sin sigma vigente (depende sólo del modelo) sirve sin bandas, y con métricas
+    obsoletas (dependen además de los datos de la serie) repite el backtest sin guardarlo.
+    """
+
+    @staticmethod
+    def path(product, arch, SCALER_DIR):
+        return os.path.join(SCALER_DIR, f"{product}.{arch}.calib.json")
+
+    @staticmethod
+    def data_hash(arr_z):
+        return hashlib.sha1(np.ascontiguousarray(arr_z, dtype=np.float32).tobytes()).hexdigest()
+
+    @staticmethod
+    def model_version(model_path):
+        try:
+            st = os.stat(model_path)
+        except FileNotFoundError:
+            return None
+        return [st.st_mtime_ns, st.st_size]
+
+    @staticmethod
+    def residual_sigmas(model, arch, X_va, y_va):
+        """Sigma de residuales en validación (z): escalar y por paso del horizonte."""
+        x_in = X_va if arch == "MLP" else X_va[..., None]
+        yhat = np.asarray(model.predict(x_in, batch_size=max(len(x_in), 1), verbose=0), dtype=np.float32)
+        # (N, H) - (N, H) o, para modelos de una salida, (N, H) - (N, 1) por broadcasting
+        resid = np.asarray(y_va, dtype=np.float32) - yhat.reshape(len(x_in), -1)
+        if resid.size < 2:
+            return 0.0, [0.0] * resid.shape[-1]
+        sigma = float(np.std(resid.reshape(-1), ddof=1))
+        per_step = np.std(resid, axis=0, ddof=1) if len(resid) > 1 else np.zeros(resid.shape[-1])
+        return sigma, [float(v) for v in per_step]
+
+    @staticmethod
+    def calibrate(model, arch, product, arr_z, X_va, y_va, scaler, LOOKBACK, VAL_DAYS, model_path, SCALER_DIR):
+        """Calcula y guarda la calibración del modelo recién entrenado."""
+        sigma, sigma_per_step = CalibrationService.residual_sigmas(model, arch, X_va, y_va)
+        # backtest one-step: la cobertura usa el sigma del primer paso
+        metrics = BacktestService.backtest(model, arch, arr_z, scaler, sigma_per_step or sigma, LOOKBACK, VAL_DAYS)
+        calib = {
+            "product": product,
+            "arch": arch,
+            "sigma": sigma,
+            "sigma_per_step": sigma_per_step,
+            "metrics": metrics,
+            "scaler": scaler.to_json(),
+            "model_version": CalibrationService.model_version(model_path),
+            "data_hash": CalibrationService.data_hash(arr_z),
+            "LOOKBACK": LOOKBACK,
+            "VAL_DAYS": VAL_DAYS,
+        }
+        atomic_write_json(CalibrationService.path(product, arch, SCALER_DIR), calib)
+        return calib
+
+    @staticmethod
+    def interval_sigma(calib, horizon):
+        """
+        Sigma (z) del PI 95% para cada paso del horizonte: sigma_per_step (el error crece con
+        la distancia al origen), completado con el sigma global si es más corto que el
+        horizonte; el sigma global si la calibración no lo trae.
+        """
+        per_step = calib.get("sigma_per_step") or []
+        if not per_step:
+            return calib["sigma"]
+        sigma = np.full(horizon, calib["sigma"], dtype=np.float32)
+        n = min(len(per_step), horizon)
+        sigma[:n] = per_step[:n]
+        return sigma
+
+    @staticmethod
+    def read(product, arch, SCALER_DIR):
+        """Documento guardado (archivo suelto o, si no hay, entrada del pack) sin validar; None si no existe."""
+        path = CalibrationService.path(product, arch, SCALER_DIR)
+        if not os.path.exists(path):
+            return ArtifactPack.lookup(SCALER_DIR, ArtifactPack.calib_key(product, arch))
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def load(product, arch, SCALER_DIR, model_path, scaler, LOOKBACK, VAL_DAYS, arr_z=None):
+        """
+        Lee la calibración y marca qué partes siguen vigentes:
+        - "sigma_ok": mismo modelo (mtime/tamaño), scaler y configuración
+        - "metrics_ok": además la misma serie escalada (arr_z)
+        Se lee el archivo suelto si existe (recién entrenado) y si no el pack (ArtifactPack).
+        Retorna None si no existe.
+        """
+        calib = CalibrationService.read(product, arch, SCALER_DIR)
+        if calib is None:
+            return None
+
+        sigma_ok = (
+            calib.get("model_version") == CalibrationService.model_version(model_path)
+            and calib.get("scaler") == scaler.to_json()
+            and calib.get("LOOKBACK") == LOOKBACK
+            and calib.get("VAL_DAYS") == VAL_DAYS
+        )
+        metrics_ok = sigma_ok and arr_z is not None and calib.get("data_hash") == CalibrationService.data_hash(arr_z)
+        return {**calib, "sigma_ok": sigma_ok, "metrics_ok": metrics_ok}
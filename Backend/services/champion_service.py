@@ -0,0 +1,155 @@
+import os
+import json
+import math
+import threading
+
+from datetime import datetime
+
+from services.calibration_service import CalibrationService
+from services.model_registry import model_registry
+from utils.utils import atomic_write_json
+
+_lock = threading.Lock()
+
+
+class ChampionService:
+    """
+    Registro campeón/retador por producto (data/models/champions.json): la arquitectura
+    con mejor métrica de validación (CHAMPION_METRIC, por defecto sMAPE; menor es mejor).
+    - Se actualiza al terminar el entrenamiento (métricas de la calibración guardada) y en
+      los backtests programados (refresh: predict en modo comparación).
+    - Un retador reemplaza al campeón vigente sólo si lo mejora en más de CHAMPION_MARGIN
+      (relativo) para que el campeón no oscile por ruido de validación.
+    predict sirve por defecto sólo el campeón (una red por producto en lugar de cuatro);
+    compare=True vuelve a la comparación completa.
+    {"products": {producto: {"champion", "metric", "scores": {arch: valor}, "source", "updated_at"}}}
+    """
+
+    METRICS = ("smape_pct", "mape_pct", "mae", "rmse", "mse", "mae_pct_of_mean")
+
+    @staticmethod
+    def path(OUT_DIR="./data/models"):
+        return os.path.join(OUT_DIR, "champions.json")
+
+    @staticmethod
+    def metric():
+        metric = os.getenv("CHAMPION_METRIC", "smape_pct")
+        if metric not in ChampionService.METRICS:
+            raise ValueError(f"CHAMPION_METRIC inválida: {metric}; usar una de {ChampionService.METRICS}")
+        return metric
+
+    @staticmethod
+    def margin():
+        return float(os.getenv("CHAMPION_MARGIN", "0.02"))
+
+    # ------------------------------------------------------------------ lectura
+
+    @staticmethod
+    def load(OUT_DIR="./data/models"):
+        """Registro completo (desde el registro en memoria; se relee si cambia el archivo)."""
+        return model_registry.get(("champions",), ChampionService.path(OUT_DIR), ChampionService._read) or {"products": {}}
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def champions(OUT_DIR="./data/models"):
+        """{producto: arquitectura campeona}."""
+        return {p: e["champion"] for p, e in ChampionService.load(OUT_DIR)["products"].items() if e.get("champion")}
+
+    @staticmethod
+    def ranking(product, OUT_DIR="./data/models"):
+        """Arquitecturas del producto ordenadas por su puntaje registrado (mejor primero); [] si no tiene."""
+        scores = ChampionService.load(OUT_DIR)["products"].get(product, {}).get("scores", {})
+        valid = {a: v for a, v in scores.items() if v is not None and not math.isnan(v)}
+        return sorted(valid, key=valid.get)
+
+    # ------------------------------------------------------------------ selección
+
+    @staticmethod
+    def select(scores, current=None, margin=0.0):
+        """
+        Arquitectura con menor puntaje (se ignoran None/NaN). Si 'current' tiene puntaje,
+        el mejor retador sólo lo reemplaza si es menor que current · (1 - margin).
+        """
+        valid = {a: v for a, v in scores.items() if v is not None and not math.isnan(v)}
+        if not valid:
+            return current
+        best = min(valid, key=valid.get)
+        if current in valid and best != current and not valid[best] < valid[current] * (1.0 - margin):
+            return current
+        return best
+
+    @staticmethod
+    def record(results, source, OUT_DIR="./data/models"):
+        """
+        results: {producto: {arch: bloque de métricas}}. Actualiza el campeón de cada producto
+        y guarda el registro (escritura atómica). Retorna {producto: campeón}.
+        """
+        metric = ChampionService.metric()
+        margin = ChampionService.margin()
+        path = ChampionService.path(OUT_DIR)
+        with _lock:
+            registry = ChampionService._read(path) if os.path.exists(path) else {"products": {}}
+            chosen = {}
+            for product, by_arch in results.items():
+                scores = {a: (m or {}).get(metric) for a, m in by_arch.items()}
+                previous = registry["products"].get(product, {})
+                # con otra métrica el puntaje del campeón anterior no es comparable: se elige de cero
+                current = previous.get("champion") if previous.get("metric") == metric else None
+                champion = ChampionService.select(scores, current, margin)
+                if champion is None:
+                    continue
+                registry["products"][product] = {
+                    "champion": champion,
+                    "metric": metric,
+                    "scores": scores,
+                    "source": source,
+                    "previous": previous.get("champion"),
+                    "updated_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                chosen[product] = champion
+            atomic_write_json(path, registry)
+        return chosen
+
+    @staticmethod
+    def record_from_calibration(products, dataset, archs, LOOKBACK, VAL_DAYS, OUT_DIR="./data/models"):
+        """
+        Campeones a partir de las métricas de validación que el entrenamiento dejó en la
+        calibración de cada arquitectura (sin volver a evaluar las redes).
+        """
+        from services.model_service import ModelService
+
+        SCALER_DIR = os.path.join(OUT_DIR, "scalers")
+        results = {}
+        for product in products:
+            scaler = ModelService.load_scaler(product, SCALER_DIR)
+            if scaler is None or product not in dataset:
+                continue
+            arr_z = scaler.transform(dataset.row(product))
+            by_arch = {}
+            for arch in archs:
+                model_path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+                calib = CalibrationService.load(product, arch, SCALER_DIR, model_path, scaler, LOOKBACK, VAL_DAYS, arr_z)
+                if calib is not None and calib["metrics_ok"]:
+                    by_arch[arch] = calib["metrics"]
+            if by_arch:
+                results[product] = by_arch
+        return ChampionService.record(results, "training", OUT_DIR) if results else {}
+
+    @staticmethod
+    def refresh(db, products=None, OUT_DIR="./data/models"):
+        """
+        Backtest programado: evalúa las cuatro arquitecturas de cada producto (predict en modo
+        comparación, por bloques) y actualiza los campeones con sus métricas de validación.
+        """
+        from services.model_service import ModelService
+
+        results = {}
+        for event in ModelService.iter_predict(db, products, compare=True):
+            if event["type"] == "forecast":
+                results.setdefault(event["product_code"], {})[event["arch"]] = event["model"]["metrics"]
+        chosen = ChampionService.record(results, "backtest", OUT_DIR) if results else {}
+        return {"metric": ChampionService.metric(), "products": len(results), "champions": chosen}
@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+import threading
+
+from collections import OrderedDict
+from utils.utils import atomic_write_json
+
+
+class ForecastCache:
+    """
+    Cache de payloads de forecast terminados (por producto y arquitectura).
+    - La clave combina la marca de agua de 'ventas', la versión del artefacto
+      del modelo y la configuración (HORIZON/LOOKBACK/...).
+    - Nivel en memoria (LRU) + nivel opcional en disco (un JSON por clave).
+    - Cuando cambia la marca de agua (nuevas ventas) todo el contenido previo
+      queda obsoleto y se descarta; build_models también lo invalida.
+    """
+
+    def __init__(self, max_items=1024, disk_dir=None):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self._mem = OrderedDict()
+        self._watermark = None
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_items=int(os.getenv("FORECAST_CACHE_MAX_ITEMS", "1024")),
+            disk_dir=os.getenv("FORECAST_CACHE_DIR") or None,
+        )
+
+    @staticmethod
+    def make_key(*parts, **config):
+        raw = json.dumps([parts, config], sort_keys=True, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def observe_watermark(self, watermark):
+        """Registra la marca de agua actual; si cambió, invalida todo el cache."""
+        watermark = json.loads(json.dumps(watermark, default=str))
+        with self._lock:
+            if self._watermark is not None and self._watermark != watermark:
+                self.clear()
+            self._watermark = watermark
+
+    def get(self, key):
+        with self._lock:
+            if key in self._mem:
+                self._mem.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._mem[key]
+
+            path = self._disk_path(key)
+            if path and os.path.exists(path):
+                try:
+                    with open(path, "r") as f:
+                        value = json.load(f)
+                except (OSError, ValueError):
+                    value = None
+                if value is not None:
+                    self._put_mem(key, value)
+                    self._stats["disk_hits"] += 1
+                    return value
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._put_mem(key, value)
+            path = self._disk_path(key)
+            if path:
+                atomic_write_json(path, value)
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._stats["invalidations"] += 1
+            if self.disk_dir and os.path.isdir(self.disk_dir):
+                for fname in os.listdir(self.disk_dir):
+                    if fname.endswith(".json"):
+                        try:
+                            os.remove(os.path.join(self.disk_dir, fname))
+                        except OSError:
+                            pass
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "items": len(self._mem), "disk": bool(self.disk_dir)}
+
+    def _put_mem(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
+
+    def _disk_path(self, key):
+        if not self.disk_dir:
+            return None
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+
+forecast_cache = ForecastCache.from_env()
@@ -0,0 +1,171 @@
+import json
+import gzip
+import base64
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # codificador JSON rápido opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class ForecastEncoding:
+    """
+    Codificación de la respuesta de /models/predict.
+    - "json": misma forma de siempre (lista de filas por producto), serializada con orjson.
+    - "compact": el histórico va una vez por producto, las fechas como origen + cantidad
+      de días y los arreglos de floats como bloques float32 little-endian en base64.
+    - "msgpack": la forma compacta en MessagePack, con los bloques float32 como bytes crudos.
+    La compresión (br/gzip) se elige según Accept-Encoding.
+    """
+
+    MSGPACK = "application/x-msgpack"
+    FORMATS = ("json", "compact", "msgpack")
+    OPTIONAL = ("fallback", "interval")   # avisos por arquitectura que viajan tal cual (campeón sin artefacto, sin bandas)
+    MIN_COMPRESS_BYTES = 1024
+
+    @staticmethod
+    def negotiate(accept="", fmt=None):
+        """Formato pedido: parámetro explícito o, si no, el header Accept."""
+        if fmt:
+            if fmt not in ForecastEncoding.FORMATS:
+                raise ValueError(f"format debe ser uno de {ForecastEncoding.FORMATS}")
+            return fmt
+        if ForecastEncoding.MSGPACK in (accept or ""):
+            return "msgpack"
+        return "json"
+
+    @staticmethod
+    def floats(values, binary=False):
+        """Arreglo de floats → bloque float32 little-endian (bytes o base64)."""
+        raw = np.asarray(values, dtype="<f4").tobytes()
+        return raw if binary else base64.b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def decode_floats(block):
+        raw = block if isinstance(block, (bytes, bytearray)) else base64.b64decode(block)
+        return np.frombuffer(raw, dtype="<f4")
+
+    @staticmethod
+    def compact(rows, binary=False):
+        """Convierte las filas de predict a la forma compacta (columnar, sin histórico repetido)."""
+        out = []
+        for row in rows:
+            models = row["models"]
+            first = next(iter(models.values()), None)
+            entry = {"product_code": row["product_code"], "history": None, "forecast": None, "models": {}}
+            if first is not None:
+                hist, fcst = first["history"], first["forecast"]
+                entry["history"] = {
+                    "origin": hist["dates"][0] if hist["dates"] else None,
+                    "count": len(hist["dates"]),
+                    "values": ForecastEncoding.floats(hist["values"], binary),
+                }
+                entry["forecast"] = {
+                    "origin": fcst["dates"][0] if fcst["dates"] else None,
+                    "count": len(fcst["dates"]),
+                }
+            for arch, payload in models.items():
+                fcst = payload["forecast"]
+                entry["models"][arch] = {
+                    "pred": ForecastEncoding.floats(fcst["pred"], binary),
+                    "lower": ForecastEncoding.floats(fcst["lower"], binary),
+                    "upper": ForecastEncoding.floats(fcst["upper"], binary),
+                    "summary": payload["summary"],
+                    "metrics": payload["metrics"],
+                }
+                entry["models"][arch].update({k: payload[k] for k in ForecastEncoding.OPTIONAL if k in payload})
+            out.append(entry)
+        return {
+            "format": "compact-v1",
+            "encoding": {
+                "floats": "bytes:float32-le" if binary else "base64:float32-le",
+                "dates": "origin+count (diario)",
+            },
+            "rows": out,
+        }
+
+    @staticmethod
+    def expand(compact):
+        """Inversa de compact(): reconstruye las filas con la forma original (floats en float32)."""
+        def dates(block):
+            if not block or not block["origin"]:
+                return []
+            return pd.date_range(block["origin"], periods=block["count"], freq="D").strftime("%Y-%m-%d").tolist()
+
+        rows = []
+        for entry in compact["rows"]:
+            history = {"dates": dates(entry["history"]), "values": []}
+            if entry["history"]:
+                history["values"] = ForecastEncoding.decode_floats(entry["history"]["values"]).tolist()
+            fcst_dates = dates(entry["forecast"])
+            models = {}
+            for arch, m in entry["models"].items():
+                models[arch] = {
+                    "history": history,
+                    "forecast": {
+                        "dates": fcst_dates,
+                        "pred": ForecastEncoding.decode_floats(m["pred"]).tolist(),
+                        "lower": ForecastEncoding.decode_floats(m["lower"]).tolist(),
+                        "upper": ForecastEncoding.decode_floats(m["upper"]).tolist(),
+                    },
+                    "summary": m["summary"],
+                    "metrics": m["metrics"],
+                }
+                models[arch].update({k: m[k] for k in ForecastEncoding.OPTIONAL if k in m})
+            rows.append({"product_code": entry["product_code"], "models": models})
+        return rows
+
+    @staticmethod
+    def dumps_json(obj):
+        if orjson is not None:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def compress(body, accept_encoding=""):
+        """Comprime con brotli o gzip si el cliente lo acepta. Retorna (body, content_encoding)."""
+        if len(body) < ForecastEncoding.MIN_COMPRESS_BYTES:
+            return body, None
+        accepted = set()
+        for item in (accept_encoding or "").split(","):
+            name, _, params = item.strip().partition(";")
+            if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+                accepted.add(name.lower())
+        if "br" in accepted and brotli is not None:
+            return brotli.compress(body, quality=4), "br"
+        if "gzip" in accepted:
+            return gzip.compress(body, compresslevel=5), "gzip"
+        return body, None
+
+    @staticmethod
+    def encode(rows, fmt="json", accept_encoding=""):
+        """
+        Serializa las filas en el formato indicado.
+        Retorna (body, media_type, content_encoding).
+        """
+        if fmt == "msgpack":
+            if msgpack is None:
+                raise ValueError("MessagePack no está disponible en el servidor (pip install msgpack)")
+            body = msgpack.packb(ForecastEncoding.compact(rows, binary=True), use_bin_type=True)
+            media_type = ForecastEncoding.MSGPACK
+        elif fmt == "compact":
+            body = ForecastEncoding.dumps_json(ForecastEncoding.compact(rows))
+            media_type = "application/json"
+        else:
+            body = ForecastEncoding.dumps_json(rows)
+            media_type = "application/json"
+        body, content_encoding = ForecastEncoding.compress(body, accept_encoding)
+        return body, media_type, content_encoding
@@ -0,0 +1,424 @@
+import os
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from repositories.sale_repository import SaleRepository
+from services.backtest_service import BacktestService
+from services.calibration_service import CalibrationService
+from services.model_registry import model_registry
+from services.forecast_cache import forecast_cache
+from services.model_service import ModelService, layers, models, callbacks, optimizers, load_model
+from services.training_cache import TrainingCache
+from models.Scaler import Scaler
+from utils.utils import atomic_write_json
+
+
+class GlobalModelService:
+    """
+    Modo global multi-SKU: un solo modelo por arquitectura entrenado con las ventanas
+    de todos los productos (cada serie con su propio scaler) más un embedding del producto.
+    Artefactos en data/models/global/:
+    - <ARCH>.keras: la red compartida,
+    - index.json: productos → id del embedding, scalers, hashes de las series y
+      calibración (sigma + métricas de validación) por producto y arquitectura.
+    El número de archivos no crece con el catálogo (4 modelos + 1 índice).
+    """
+
+    EMBED_DIM = 8
+
+    @staticmethod
+    def global_dir(OUT_DIR):
+        return os.path.join(OUT_DIR, "global")
+
+    @staticmethod
+    def model_path(arch, OUT_DIR):
+        return os.path.join(OUT_DIR, "global", f"{arch}.keras")
+
+    @staticmethod
+    def index_path(OUT_DIR):
+        return os.path.join(OUT_DIR, "global", "index.json")
+
+    @staticmethod
+    def build_global_model(name, input_len, n_products, LEARNING_RATE, horizon=90, embed_dim=8):
+        """
+        Misma arquitectura que el modelo por producto; la capa de salida recibe además
+        el embedding del producto (entrada "product_id").
+        """
+        base = ModelService.build_arch(name, input_len, LEARNING_RATE, horizon)
+        features = base.layers[-2].output  # representación previa a la capa Dense de salida
+        pid = layers.Input(shape=(1,), dtype="int32", name="product_id")
+        emb = layers.Flatten()(layers.Embedding(n_products, embed_dim, name="product_embedding")(pid))
+        x = layers.Concatenate()([features, emb])
+        out = layers.Dense(horizon)(x)
+        m = models.Model([base.input, pid], out, name=f"{name}_global")
+        m.compile(optimizer=optimizers.Adam(LEARNING_RATE), loss="mse", metrics=["mae"])
+        return m
+
+    @staticmethod
+    def build(db: Session, products=None, progress=None, force=False):
+        """
+        Entrena los modelos globales con los productos indicados (por defecto todos).
+        Retorna métricas de pérdida por arquitectura y el conteo de artefactos.
+        """
+        from services.window_dataset import WindowDataset
+        from services.training_callbacks import EpochProgress
+
+        LOOKBACK = 60
+        VAL_DAYS = 90
+        HORIZON = 90
+        BATCH_SIZE = 256
+        EPOCHS = 25
+        LEARNING_RATE = 1e-3
+
+        OUT_DIR = "./data/models"
+        os.makedirs(GlobalModelService.global_dir(OUT_DIR), exist_ok=True)
+
+        dataset = ModelService.load_data(db, products=products)
+
+        config = {"LOOKBACK": LOOKBACK, "VAL_DAYS": VAL_DAYS, "EPOCHS": EPOCHS, "BATCH_SIZE": BATCH_SIZE,
+                  "LEARNING_RATE": LEARNING_RATE, "EMBED_DIM": GlobalModelService.EMBED_DIM}
+        # el código de la cabeza global (embedding + salida) también define los modelos
+        builders = {**ModelService.builders(), "GLOBAL": GlobalModelService.build_global_model}
+        config_hash = TrainingCache.config_hash(config, builders)
+        series_hashes = {p: TrainingCache.series_hash(dataset.row(p), dataset.origin) for p in dataset.products}
+
+        # Sin cambios en series ni configuración: se reutilizan los modelos globales
+        index = GlobalModelService.load_index(OUT_DIR)
+        if (not force and index is not None and index.get("config_hash") == config_hash
+                and index.get("series_hashes") == series_hashes
+                and all(os.path.exists(GlobalModelService.model_path(a, OUT_DIR)) for a in ModelService.ARCHS)):
+            print("[CACHE] modelos globales sin cambios; se reutilizan")
+            return GlobalModelService._build_result(index, OUT_DIR, reused=True, seconds=0.0)
+
+        started = time.perf_counter()
+
+        # Scaler por serie (ajustado sólo con train) y ventanas de todos los productos
+        prepared = {}
+        for product in dataset.products:
+            series = dataset.row(product)
+            if len(series) < LOOKBACK + VAL_DAYS:
+                print(f"[SKIP] {product}, insuficiente longitud")
+                continue
+            res = ModelService.prepare_product(series, product, LOOKBACK, VAL_DAYS)
+            if res is not None:
+                prepared[product] = res
+        if not prepared:
+            raise ValueError("No hay productos con historia suficiente para el modelo global")
+
+        product_ids = {p: i for i, p in enumerate(prepared)}
+        series_z = [prepared[p][1] for p in prepared]
+        ids = [product_ids[p] for p in prepared]
+
+        index = {
+            "products": list(prepared),
+            "product_ids": product_ids,
+            "scalers": {p: prepared[p][0].to_json() for p in prepared},
+            "series_hashes": series_hashes,
+            "config_hash": config_hash,
+            "LOOKBACK": LOOKBACK,
+            "VAL_DAYS": VAL_DAYS,
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "archs": {},
+        }
+
+        for name in ModelService.ARCHS:
+            # ventanas de todas las series armadas lote a lote (WindowDataset), sin materializarlas
+            train_ds, val_ds, n_train = WindowDataset.split_many(series_z, ids, LOOKBACK, HORIZON, VAL_DAYS, BATCH_SIZE,
+                                                                 channel=name != "MLP")
+            model = GlobalModelService.build_global_model(name, LOOKBACK, len(product_ids), LEARNING_RATE, HORIZON,
+                                                          embed_dim=GlobalModelService.EMBED_DIM)
+
+            print(f"--- Entrenando {name} global ({len(product_ids)} productos, {n_train} ventanas) ---")
+            fit_callbacks = [callbacks.EarlyStopping(patience=5, restore_best_weights=True)]
+            if progress:
+                fit_callbacks.append(EpochProgress(progress, "global", name, EPOCHS))
+            history = model.fit(train_ds, validation_data=val_ds, epochs=EPOCHS, verbose=0, callbacks=fit_callbacks)
+
+            path = GlobalModelService.model_path(name, OUT_DIR)
+            ModelService.save_model_atomic(model, path)
+            print(f"Guardado {name} -> {path}")
+
+            index["archs"][name] = {
+                "loss": [float(v) for v in history.history.get("loss", [])],
+                "val_loss": [float(v) for v in history.history.get("val_loss", [])],
+                "calibration": GlobalModelService.calibrate(model, name, prepared, product_ids, LOOKBACK, VAL_DAYS),
+            }
+
+        # los forecasts globales cacheados quedan obsoletos solos (la clave incluye artifact_version);
+        # los de los modelos por producto no cambian
+        atomic_write_json(GlobalModelService.index_path(OUT_DIR), index)
+        return GlobalModelService._build_result(index, OUT_DIR, reused=False, seconds=time.perf_counter() - started)
+
+    @staticmethod
+    def calibrate(model, arch, prepared, product_ids, LOOKBACK, VAL_DAYS):
+        """
+        Sigma de residuales de validación y bloque de métricas (backtest one-step)
+        por producto, evaluando las ventanas de todos los productos en una sola llamada.
+        """
+        products = list(prepared)
+        X_va = np.concatenate([prepared[p][2][1] for p in products])
+        ids = np.concatenate([np.full((len(prepared[p][2][1]), 1), product_ids[p], dtype=np.int32) for p in products])
+        yhat = GlobalModelService._predict(model, arch, X_va, ids)
+
+        arr_zs = {p: prepared[p][1] for p in products}
+        calib = {}
+        offset = 0
+        sigmas = {}
+        for p in products:
+            y_va = prepared[p][2][3]
+            resid = y_va - yhat[offset:offset + len(y_va)]
+            offset += len(y_va)
+            sigmas[p] = float(np.std(resid.reshape(-1), ddof=1)) if resid.size > 1 else 0.0
+
+        scalers = {p: prepared[p][0] for p in products}
+        metrics = GlobalModelService.backtest(model, arch, arr_zs, scalers, sigmas, product_ids, LOOKBACK, VAL_DAYS)
+        for p in products:
+            calib[p] = {"sigma": sigmas[p], "metrics": metrics[p], "data_hash": CalibrationService.data_hash(arr_zs[p])}
+        return calib
+
+    @staticmethod
+    def backtest(model, arch, arr_zs, scalers, sigmas, product_ids, LOOKBACK, VAL_DAYS):
+        """Backtest rolling-origin one-step (igual que BacktestService) para varios productos en un lote."""
+        windows = {p: BacktestService.rolling_origin_windows(arr_z, LOOKBACK, VAL_DAYS) for p, arr_z in arr_zs.items()}
+        X = np.concatenate([w[1] for w in windows.values()])
+        ids = np.concatenate([np.full((len(w[1]), 1), product_ids[p], dtype=np.int32) for p, w in windows.items()])
+        yhat = GlobalModelService._predict(model, arch, X, ids)
+
+        metrics = {}
+        offset = 0
+        for p, (_, Xp, Y) in windows.items():
+            preds_z = yhat[offset:offset + len(Xp), :1]
+            offset += len(Xp)
+            metrics[p] = BacktestService.metric_block(Y, preds_z, sigmas[p], scalers[p])
+        return metrics
+
+    @staticmethod
+    def _predict(model, arch, X, ids):
+        x_in = X if arch == "MLP" else X[..., None]
+        yhat = model.predict([x_in, ids], batch_size=1024, verbose=0)
+        return np.asarray(yhat, dtype=np.float32).reshape(len(X), -1)
+
+    @staticmethod
+    def load_index(OUT_DIR="./data/models"):
+        path = GlobalModelService.index_path(OUT_DIR)
+        return model_registry.get(("global", "index"), path, GlobalModelService._read_index)
+
+    @staticmethod
+    def _read_index(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def trained_products(OUT_DIR="./data/models"):
+        index = GlobalModelService.load_index(OUT_DIR)
+        return sorted(index["products"]) if index is not None else []
+
+    @staticmethod
+    def load_global_model(arch, OUT_DIR="./data/models"):
+        path = GlobalModelService.model_path(arch, OUT_DIR)
+        return ModelService.load_network(("global", arch), path)
+
+    @staticmethod
+    def artifact_version(OUT_DIR):
+        version = []
+        for path in [GlobalModelService.index_path(OUT_DIR)] + [GlobalModelService.model_path(a, OUT_DIR) for a in ModelService.ARCHS]:
+            try:
+                st = os.stat(path)
+                version.append([st.st_mtime_ns, st.st_size])
+            except FileNotFoundError:
+                version.append(None)
+        return version
+
+    @staticmethod
+    def predict(db: Session, products=None):
+        """
+        Forecast con los modelos globales, con la misma forma de respuesta que
+        ModelService.predict (una fila por producto con un bloque por arquitectura).
+        Cada arquitectura se evalúa con una sola llamada para todos los productos.
+        """
+        LOOKBACK = 60
+        VAL_DAYS = 90
+        HORIZON = 90
+        HISTORY_PLOT_DAYS = 365
+        MODELS = list(ModelService.ARCHS)
+
+        OUT_DIR = "./data/models"
+        index = GlobalModelService.load_index(OUT_DIR)
+        if index is None:
+            return []
+
+        watermark = SaleRepository.get_watermark(db)
+        forecast_cache.observe_watermark(watermark)
+        cache_key = forecast_cache.make_key("global", watermark, GlobalModelService.artifact_version(OUT_DIR), products,
+                                            LOOKBACK=LOOKBACK, VAL_DAYS=VAL_DAYS, HORIZON=HORIZON,
+                                            HISTORY_PLOT_DAYS=HISTORY_PLOT_DAYS)
+        cached = forecast_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        wanted = [p for p in index["products"] if products is None or p in products]
+        if not wanted:
+            return []
+        dataset = ModelService.load_data(db, products=wanted)
+        product_ids = index["product_ids"]
+
+        items = []
+        for product in wanted:
+            if product not in dataset.products:
+                continue
+            series = dataset.row(product)
+            if len(series) < LOOKBACK + VAL_DAYS + 5:
+                continue
+            scaler = Scaler(index["scalers"][product]["mean"], index["scalers"][product]["std"])
+            arr_z = scaler.transform(series)
+            items.append({
+                "product": product,
+                "scaler": scaler,
+                "arr_z": arr_z,
+                "last_window": arr_z[-LOOKBACK:].astype(np.float32),
+                "history": ModelService._history(series, dataset.end, HISTORY_PLOT_DAYS),
+            })
+        if not items:
+            return []
+
+        fcst_idx = pd.date_range(dataset.end + timedelta(days=1), periods=HORIZON, freq="D")
+        windows = np.stack([it["last_window"] for it in items])
+        ids = np.array([[product_ids[it["product"]]] for it in items], dtype=np.int32)
+        output = [{"product_code": it["product"], "models": {}} for it in items]
+
+        for arch in MODELS:
+            model = GlobalModelService.load_global_model(arch, OUT_DIR)
+            entry = index["archs"].get(arch)
+            if model is None or entry is None:
+                continue
+            calib = entry["calibration"]
+            preds_all = GlobalModelService._predict(model, arch, windows, ids)[:, :HORIZON]
+
+            # métricas guardadas al entrenar; se recalculan (en lote) para series que cambiaron
+            stale = [it for it in items if calib[it["product"]]["data_hash"] != CalibrationService.data_hash(it["arr_z"])]
+            fresh = {}
+            if stale:
+                fresh = GlobalModelService.backtest(
+                    model, arch, {it["product"]: it["arr_z"] for it in stale}, {it["product"]: it["scaler"] for it in stale},
+                    {it["product"]: calib[it["product"]]["sigma"] for it in stale}, product_ids, LOOKBACK, VAL_DAYS)
+
+            for row, it, preds_z in zip(output, items, preds_all):
+                c = calib[it["product"]]
+                hist_dates, hist_values = it["history"]
+                row["models"][arch] = ModelService._model_payload(
+                    hist_dates, hist_values, fcst_idx, preds_z, c["sigma"], it["scaler"],
+                    fresh.get(it["product"], c["metrics"]))
+
+        forecast_cache.set(cache_key, output)
+        return output
+
+    @staticmethod
+    def benchmark(db: Session, products=None):
+        """
+        Compara el modelo global con los modelos por producto usando el mismo bloque
+        de métricas de validación (backtest one-step), más conteo/tamaño de artefactos
+        y tiempo de carga de cada modo. La comparación principal usa la métrica de los
+        campeones (CHAMPION_METRIC, por defecto sMAPE) y MAE, promediadas sobre los productos
+        con ambos modos; MAPE es secundaria (explota con series con muchos ceros).
+        """
+        from services.champion_service import ChampionService
+
+        LOOKBACK = 60
+        VAL_DAYS = 90
+        OUT_DIR = "./data/models"
+        SCALERS_DIR = os.path.join(OUT_DIR, "scalers")
+
+        index = GlobalModelService.load_index(OUT_DIR)
+        if index is None:
+            return None
+        wanted = [p for p in index["products"] if products is None or p in products]
+        dataset = ModelService.load_data(db, products=wanted)
+
+        per_product_files = [os.path.join(OUT_DIR, a, f"{p}.keras") for a in ModelService.ARCHS for p in wanted]
+        per_product_files = [f for f in per_product_files if os.path.exists(f)]
+        global_files = [GlobalModelService.model_path(a, OUT_DIR) for a in ModelService.ARCHS] + [GlobalModelService.index_path(OUT_DIR)]
+        global_files = [f for f in global_files if os.path.exists(f)]
+
+        metric = ChampionService.metric()
+        compared = list(dict.fromkeys([metric, "mae", "mape_pct"]))
+        rows = {}
+        totals = {arch: {"per_product": [], "global": []} for arch in ModelService.ARCHS}
+        for arch in ModelService.ARCHS:
+            gmodel = GlobalModelService.load_global_model(arch, OUT_DIR)
+            calib = index["archs"].get(arch, {}).get("calibration", {})
+            items = {}
+            for product in wanted:
+                if product not in dataset.products or product not in calib:
+                    continue
+                scaler = Scaler(index["scalers"][product]["mean"], index["scalers"][product]["std"])
+                items[product] = (scaler, scaler.transform(dataset.row(product)))
+            if gmodel is None or not items:
+                continue
+            gmetrics = GlobalModelService.backtest(
+                gmodel, arch, {p: v[1] for p, v in items.items()}, {p: v[0] for p, v in items.items()},
+                {p: calib[p]["sigma"] for p in items}, index["product_ids"], LOOKBACK, VAL_DAYS)
+
+            for product, (scaler, arr_z) in items.items():
+                entry = {"global": gmetrics[product], "per_product": None}
+                model = ModelService.load_arch_model(arch, product, OUT_DIR)
+                pscaler = ModelService.load_scaler(product, SCALERS_DIR)
+                if model is not None and pscaler is not None:
+                    parr_z = pscaler.transform(dataset.row(product))
+                    model_path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+                    pcal = CalibrationService.load(product, arch, SCALERS_DIR, model_path, pscaler, LOOKBACK, VAL_DAYS, parr_z)
+                    if pcal is not None and pcal["metrics_ok"]:
+                        entry["per_product"] = pcal["metrics"]
+                    else:
+                        sigma = pcal["sigma"] if pcal is not None and pcal["sigma_ok"] else \
+                            ModelService.residual_std_for_arch(model, arch, parr_z, LOOKBACK, VAL_DAYS)
+                        entry["per_product"] = BacktestService.backtest(model, arch, parr_z, pscaler, sigma, LOOKBACK, VAL_DAYS)
+                    # sólo productos con ambos modos, para promediar sobre el mismo conjunto
+                    totals[arch]["per_product"].append(entry["per_product"])
+                    totals[arch]["global"].append(entry["global"])
+                    entry["delta"] = {m: entry["global"][m] - entry["per_product"][m] for m in compared}
+                rows.setdefault(product, {})[arch] = entry
+
+        return {
+            "products": rows,
+            "metric": metric,
+            "mean": {
+                arch: {mode: ({m: float(np.mean([b[m] for b in blocks])) for m in compared} if blocks else None)
+                       for mode, blocks in t.items()}
+                for arch, t in totals.items()
+            },
+            "artifacts": {
+                "per_product": GlobalModelService._artifact_stats(per_product_files),
+                "global": GlobalModelService._artifact_stats(global_files),
+            },
+        }
+
+    @staticmethod
+    def _artifact_stats(files):
+        """Número de archivos, bytes en disco y segundos en cargarlos (sin pasar por el registro)."""
+        started = time.perf_counter()
+        for f in files:
+            if f.endswith(".keras"):
+                load_model(f, compile=False)
+        return {
+            "files": len(files),
+            "bytes": int(sum(os.path.getsize(f) for f in files)),
+            "load_seconds": round(time.perf_counter() - started, 3),
+        }
+
+    @staticmethod
+    def _build_result(index, OUT_DIR, reused, seconds):
+        metricas = {"global": {arch: {"loss": e["loss"], "val_loss": e["val_loss"]} for arch, e in index["archs"].items()}}
+        files = [GlobalModelService.model_path(a, OUT_DIR) for a in index["archs"]] + [GlobalModelService.index_path(OUT_DIR)]
+        return {
+            "metricas": [metricas],
+            "summary": ModelService.load_summary_metrics([metricas]),
+            "products": index["products"],
+            "reused": reused,
+            "seconds": round(seconds, 3),
+            "artifacts": {"files": len(files), "bytes": int(sum(os.path.getsize(f) for f in files if os.path.exists(f)))},
+        }
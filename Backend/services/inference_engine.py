@@ -0,0 +1,128 @@
+import os
+import threading
+
+import numpy as np
+
+from collections import OrderedDict
+from services.numpy_runtime import NumpyNetwork
+
+
+class InferenceEngine:
+    """
+    Inferencia por lotes entre productos para modelos de la misma arquitectura.
+    Los modelos por producto se "apilan" en un único grafo multi-entrada
+    (una entrada y una salida por producto), de modo que una sola llamada
+    evalúa todas las series. El modo iterativo avanza todas las series a la vez
+    (lock-step): cada llamada produce un paso del horizonte para todas.
+    Las redes del runtime NumPy (NumpyNetwork) no necesitan grafo: las de la misma firma se
+    evalúan en una sola pasada con los pesos apilados (NumpyNetwork.predict_stacked).
+    """
+
+    def __init__(self, stack_size=64, max_stacks=8):
+        self.stack_size = stack_size
+        self.max_stacks = max_stacks
+        self._stacks = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(stack_size=int(os.getenv("INFERENCE_STACK_SIZE", "64")))
+
+    def predict_many(self, arch, models, xs):
+        """
+        xs: lista de lotes (F_i, lookback), uno por modelo.
+        Retorna una lista de salidas (F_i, out_dim), en el mismo orden.
+        """
+        outs = [None] * len(models)
+        # las entradas de un grafo apilado deben compartir tamaño de lote
+        groups = {}
+        for i, x in enumerate(xs):
+            groups.setdefault(len(x), []).append(i)
+        for idx in groups.values():
+            for start in range(0, len(idx), self.stack_size):
+                chunk = idx[start:start + self.stack_size]
+                res = self._call(arch, [models[i] for i in chunk], [xs[i] for i in chunk])
+                for i, r in zip(chunk, res):
+                    outs[i] = r
+        return outs
+
+    def forecast(self, arch, models, windows, horizon):
+        """
+        Pronóstico de 'horizon' pasos para cada serie (windows: (P, lookback) en z).
+        Modelos multi-salida: una llamada. Modelos de una salida: lock-step iterativo.
+        Retorna (P, horizon).
+        """
+        x = np.asarray(windows, dtype=np.float32)
+        first = self.predict_many(arch, models, [w[None, :] for w in x])
+        out = np.zeros((len(models), horizon), dtype=np.float32)
+
+        iterative = []
+        for i, yhat in enumerate(first):
+            yhat = yhat.ravel()
+            if yhat.size == 1 and horizon > 1:
+                iterative.append(i)
+                out[i, 0] = yhat[0]
+            else:
+                n = min(horizon, yhat.size)
+                out[i, :n] = yhat[:n]
+
+        if iterative:
+            cur = x[iterative].copy()
+            sub = [models[i] for i in iterative]
+            for step in range(1, horizon):
+                cur = np.concatenate([cur[:, 1:], out[iterative, step - 1][:, None]], axis=1)
+                res = self.predict_many(arch, sub, [w[None, :] for w in cur])
+                out[iterative, step] = [r.ravel()[0] for r in res]
+        return out
+
+    def _call(self, arch, models, xs):
+        xs = [np.asarray(x, dtype=np.float32) for x in xs]
+        xs = [x[..., None] if arch != "MLP" and x.ndim == 2 else x for x in xs]
+        if isinstance(models[0], NumpyNetwork):
+            # runtime NumPy: las redes con la misma firma se evalúan juntas (pesos apilados, una pasada)
+            res = [None] * len(models)
+            groups = {}
+            for i, m in enumerate(models):
+                groups.setdefault(m.signature(), []).append(i)
+            for idx in groups.values():
+                out = NumpyNetwork.predict_stacked([models[i] for i in idx], [[xs[i]] for i in idx])[0]
+                for j, i in enumerate(idx):
+                    res[i] = out[j]
+        elif len(models) == 1:
+            res = [models[0].predict_on_batch(xs[0])]
+        else:
+            res = self._stack(models).predict_on_batch(xs)
+            if not isinstance(res, (list, tuple)):
+                res = [res]
+        return [np.asarray(r, dtype=np.float32).reshape(len(x), -1) for r, x in zip(res, xs)]
+
+    def _stack(self, models):
+        key = tuple(id(m) for m in models)
+        with self._lock:
+            stacked = self._stacks.get(key)
+            if stacked is not None:
+                self._stacks.move_to_end(key)
+                return stacked["model"]
+
+        from tensorflow import keras
+
+        inputs, outputs = [], []
+        for i, m in enumerate(models):
+            # los modelos de una misma arquitectura comparten nombre: se envuelven
+            # en un sub-modelo con nombre único (mismas capas y pesos, sin copia)
+            inner = keras.Input(shape=m.input_shape[1:])
+            member = keras.Model(inner, m(inner, training=False), name=f"member_{i}")
+            inp = keras.Input(shape=m.input_shape[1:], name=f"input_{i}")
+            inputs.append(inp)
+            outputs.append(member(inp))
+        stacked_model = keras.Model(inputs, outputs)
+
+        with self._lock:
+            # se guardan referencias a los modelos para que los id() sigan siendo válidos
+            self._stacks[key] = {"model": stacked_model, "members": list(models)}
+            while len(self._stacks) > self.max_stacks:
+                self._stacks.popitem(last=False)
+        return stacked_model
+
+
+inference_engine = InferenceEngine.from_env()
@@ -0,0 +1,241 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from sqlalchemy import Date, Integer, Numeric
+from sqlalchemy.orm import Session
+from models.sale_model import Sale
+from repositories.sale_repository import SaleRepository
+from repositories.sale_rollup_repository import SaleRollupRepository
+from services.forecast_cache import forecast_cache
+from services.sale_service import dashboard_cache
+from services.period_service import period_cache
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "50000"))
+INGEST_MAX_ERRORS = 100   # errores de validación que se devuelven en el reporte
+
+class IngestService:
+    """
+    Carga masiva de líneas de factura (CSV o Parquet) en 'ventas':
+    - lectura por bloques (no se carga el archivo completo en memoria),
+    - validación y conversión de tipos contra el esquema de Sale,
+    - detección de líneas repetidas (en el archivo y contra la base, ver SaleRepository.LINE_KEY),
+    - escritura con COPY (PostgreSQL) o executemany (SQLite) en una sola transacción,
+    - al terminar: rollup diario al día (sólo los días afectados) y caches invalidados.
+    """
+
+    FORMATS = ("csv", "parquet")
+    POLICIES = ("skip", "keep", "fail")
+
+    @staticmethod
+    def columns():
+        """Columnas de 'ventas' que se cargan (todas menos el id) y las obligatorias."""
+        columns = [c for c in Sale.__table__.columns if c.name != "id"]
+        return [c.name for c in columns], [c.name for c in columns if not c.nullable]
+
+    @staticmethod
+    def infer_format(filename, fmt=None):
+        if fmt:
+            if fmt not in IngestService.FORMATS:
+                raise ValueError(f"formato inválido: {fmt}; usar uno de {IngestService.FORMATS}")
+            return fmt
+        name = (filename or "").lower()
+        if name.endswith((".parquet", ".pq")):
+            return "parquet"
+        if name.endswith((".csv", ".csv.gz", ".txt")):
+            return "csv"
+        raise ValueError(f"no se pudo inferir el formato de '{filename}'; indicar format=csv|parquet")
+
+    @staticmethod
+    def read_chunks(source, fmt, chunk_size=INGEST_CHUNK_SIZE, filename=None):
+        """Itera DataFrames de hasta chunk_size filas (todo como texto; los tipos se validan después)."""
+        if fmt == "csv":
+            compression = "gzip" if (filename or str(source)).lower().endswith(".gz") else "infer"
+            yield from pd.read_csv(source, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                                   na_values=[""], compression=compression)
+            return
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("leer Parquet requiere pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+    @staticmethod
+    def validate(df, first_row=1):
+        """
+        Convierte un bloque a los tipos de Sale. Retorna (records válidos, errores, números de fila válidos);
+        cada error es {"row", "column", "reason"} con la fila contada desde 1 (sin el encabezado).
+        """
+        names, required = IngestService.columns()
+        missing = [c for c in required if c not in df.columns]
+        if missing:
+            raise ValueError(f"faltan columnas obligatorias: {missing}")
+
+        n = len(df)
+        invalid = np.zeros(n, dtype=bool)
+        errors = []
+        out = {}
+
+        def flag(mask, column, reason):
+            new = mask & ~invalid
+            for i in np.flatnonzero(new)[:INGEST_MAX_ERRORS]:
+                errors.append({"row": first_row + int(i), "column": column, "reason": reason})
+            invalid[:] = invalid | mask
+
+        for column in Sale.__table__.columns:
+            name = column.name
+            if name == "id":
+                continue
+            if name not in df.columns:
+                out[name] = pd.Series([None] * n, index=df.index, dtype=object)
+                continue
+            raw = df[name]
+            present = raw.notna().to_numpy() & (raw.astype(str).str.strip() != "").to_numpy()
+            if isinstance(column.type, Date):
+                values = pd.to_datetime(raw, errors="coerce")
+                flag(present & values.isna().to_numpy(), name, "fecha inválida")
+                values = values.dt.date
+            elif isinstance(column.type, Numeric):
+                values = pd.to_numeric(raw, errors="coerce")
+                flag(present & values.isna().to_numpy(), name, "número inválido")
+                if column.type.precision is not None:
+                    limit = 10.0 ** (column.type.precision - (column.type.scale or 0))
+                    flag((values.abs() >= limit).to_numpy(), name, f"fuera de rango (< {limit:g})")
+                values = values.round(column.type.scale or 0)
+            elif isinstance(column.type, Integer):
+                values = pd.to_numeric(raw, errors="coerce")
+                flag(present & values.isna().to_numpy(), name, "entero inválido")
+                flag((values.notna() & (values != values.round())).to_numpy(), name, "entero inválido")
+            else:
+                values = raw.astype(object).where(raw.notna(), None)
+                values = values.map(lambda v: None if v is None else (str(v).strip() or None))
+            if not column.nullable:
+                flag(~present, name, "obligatorio")
+            out[name] = values
+
+        valid = ~invalid
+        frame = {}
+        for name in names:
+            values = out[name][valid]
+            if isinstance(Sale.__table__.columns[name].type, Integer):
+                values = values.astype("Int64")
+            values = values.astype(object)
+            frame[name] = values.where(values.notna(), None)
+        records = [dict(zip(names, row)) for row in zip(*(frame[name].tolist() for name in names))]
+        errors.sort(key=lambda e: e["row"])
+        return records, errors, (first_row + np.flatnonzero(valid)).tolist()
+
+    @staticmethod
+    def ingest(db: Session, source, fmt=None, filename=None, chunk_size=INGEST_CHUNK_SIZE,
+               on_invalid="skip", on_duplicate="skip", dry_run=False):
+        """
+        Carga 'source' (ruta o archivo abierto) en 'ventas'.
+        - on_invalid: "skip" descarta las filas inválidas, "fail" aborta la carga si hay alguna.
+        - on_duplicate: "skip" descarta líneas repetidas, "keep" las inserta igual, "fail" aborta.
+        - dry_run: valida y cuenta sin escribir.
+        Todo o nada: si falla, no queda ninguna fila cargada. Retorna un reporte con filas/segundo.
+        """
+        if on_invalid not in ("skip", "fail"):
+            raise ValueError("on_invalid debe ser 'skip' o 'fail'")
+        if on_duplicate not in IngestService.POLICIES:
+            raise ValueError(f"on_duplicate debe ser uno de {IngestService.POLICIES}")
+        fmt = IngestService.infer_format(filename or (source if isinstance(source, str) else None), fmt)
+        names, _ = IngestService.columns()
+
+        started = time.perf_counter()
+        write_seconds = 0.0
+        report = {
+            "format": fmt, "dry_run": dry_run, "rows_read": 0, "inserted": 0, "rejected": 0,
+            "duplicates": {"in_file": 0, "existing": 0}, "errors": [], "ignored_columns": [],
+        }
+        seen = set()
+        products = set()
+        min_date = max_date = None
+        try:
+            for chunk in IngestService.read_chunks(source, fmt, chunk_size, filename):
+                if report["rows_read"] == 0:
+                    report["ignored_columns"] = [c for c in chunk.columns if c not in names]
+                records, errors, rows = IngestService.validate(chunk, first_row=report["rows_read"] + 1)
+                report["rows_read"] += len(chunk)
+                report["rejected"] += len(chunk) - len(records)
+                report["errors"].extend(errors[:INGEST_MAX_ERRORS - len(report["errors"])])
+                if errors and on_invalid == "fail":
+                    raise ValueError(f"fila {errors[0]['row']}, columna {errors[0]['column']}: {errors[0]['reason']}")
+
+                records = IngestService._drop_duplicates(db, records, rows, seen, on_duplicate, report)
+
+                for r in records:
+                    products.add(r["product_code"])
+                    d = r["sale_date"]
+                    min_date = d if min_date is None or d < min_date else min_date
+                    max_date = d if max_date is None or d > max_date else max_date
+
+                if records and not dry_run:
+                    t = time.perf_counter()
+                    report["inserted"] += SaleRepository.bulk_insert(db, records, names)
+                    write_seconds += time.perf_counter() - t
+            if not dry_run:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        seconds = time.perf_counter() - started
+        processed = report["rows_read"] if dry_run else report["inserted"]
+        report.update({
+            "dates": {"min": min_date.isoformat() if min_date else None, "max": max_date.isoformat() if max_date else None},
+            "products": sorted(products),
+            "seconds": round(seconds, 3),
+            "write_seconds": round(write_seconds, 3),
+            "rows_per_sec": round(processed / seconds, 1) if seconds > 0 else None,
+        })
+        if report["inserted"]:
+            report.update(IngestService.after_load(db))
+        return report
+
+    @staticmethod
+    def _drop_duplicates(db, records, rows, seen, on_duplicate, report):
+        """Líneas repetidas dentro del archivo o ya presentes en la base (sólo filas con número de factura)."""
+        if on_duplicate == "keep":
+            return records
+        existing = SaleRepository.get_existing_line_keys(
+            db, {r["invoice_number"] for r in records if r["invoice_number"] is not None})
+        kept = []
+        for r, row in zip(records, rows):
+            if r["invoice_number"] is None:
+                kept.append(r)
+                continue
+            key = SaleRepository.line_key(*(r[c] for c in SaleRepository.LINE_KEY))
+            where = "existing" if key in existing else "in_file" if key in seen else None
+            if where is None:
+                seen.add(key)
+                kept.append(r)
+                continue
+            if on_duplicate == "fail":
+                raise ValueError(f"fila {row}: línea de factura repetida ({where}): {key}")
+            report["duplicates"][where] += 1
+        return kept
+
+    @staticmethod
+    def after_load(db: Session):
+        """
+        Después de cargar: incorpora las filas nuevas al rollup diario (recalcula sólo los días
+        tocados) y registra la nueva marca de agua en los caches de forecast, dashboard y
+        periodos, que así descartan de inmediato los resultados calculados con los datos anteriores.
+        """
+        result = {}
+        if SaleRollupRepository.enabled():
+            result["rollup"] = SaleRollupRepository.catch_up(db)
+        # cada cache recibe la marca de agua en la misma forma con la que lo consultan sus
+        # lectores (forecast: exacta con "rows"; dashboard y periodos: sólo máximos), si no
+        # las marcas nunca coinciden y cada carga vacía el cache completo
+        watermark = SaleRepository.get_watermark(db)
+        forecast_cache.observe_watermark(watermark)
+        fast_watermark = SaleRepository.get_watermark(db, exact_count=False)
+        for cache in (dashboard_cache, period_cache):
+            cache.observe_watermark(fast_watermark)
+        result["watermark"] = watermark
+        return result
@@ -0,0 +1,122 @@
+import os
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+class ModelRegistry:
+    """
+    Registro en memoria de artefactos (redes .keras/.npw, scalers JSON, pack de artefactos).
+    - Carga cada artefacto una sola vez y lo reutiliza entre requests.
+    - Presupuesto por cantidad y/o bytes (tamaño en disco) con desalojo LRU.
+    - Recarga el artefacto si cambia el mtime/tamaño del archivo; con check_hash=True
+      se compara además el hash del contenido y sólo se recarga si cambió.
+    """
+
+    def __init__(self, max_items=None, max_bytes=None, check_hash=False):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.check_hash = check_hash
+        self._entries = OrderedDict()  # key -> {"value", "path", "mtime", "size", "digest"}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls):
+        max_items = os.getenv("MODEL_REGISTRY_MAX_ITEMS")
+        max_bytes = os.getenv("MODEL_REGISTRY_MAX_BYTES")
+        return cls(
+            max_items=int(max_items) if max_items else 256,
+            max_bytes=int(max_bytes) if max_bytes else None,
+            check_hash=os.getenv("MODEL_REGISTRY_CHECK_HASH", "0").lower() in ("1", "true", "yes"),
+        )
+
+    def get(self, key, path, loader):
+        """
+        Devuelve el artefacto de 'path' (cargado con 'loader(path)') desde memoria.
+        Retorna None si el archivo no existe.
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.discard(key)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["path"] == path:
+                if entry["mtime"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry["value"]
+                # mtime cambió: con check_hash evitamos recargar si el contenido es idéntico
+                if self.check_hash and entry["digest"] == self._digest(path):
+                    entry["mtime"] = st.st_mtime_ns
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry["value"]
+                self._stats["reloads"] += 1
+            else:
+                self._stats["misses"] += 1
+
+            value = loader(path)
+            self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "path": path,
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "digest": self._digest(path) if self.check_hash else None,
+            }
+            self._bytes += st.st_size
+            self._evict(keep=key)
+            return value
+
+    def discard(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "items": len(self._entries),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def _evict(self, keep):
+        # desaloja los menos usados hasta cumplir el presupuesto (nunca el recién cargado)
+        while len(self._entries) > 1 and (
+            (self.max_items is not None and len(self._entries) > self.max_items)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    @staticmethod
+    def _digest(path):
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+
+model_registry = ModelRegistry.from_env()
@@ -1,22 +1,54 @@
-import os, json
+import os, json, time, shutil
 import pandas as pd
 import numpy as np
-import tensorflow as tf
-import operator
 
 from sqlalchemy.orm import Session
 from repositories.sale_repository import SaleRepository
+from repositories.sale_rollup_repository import SaleRollupRepository
+from services.backtest_service import BacktestService
+from services.model_registry import model_registry
+from services.forecast_cache import forecast_cache
+from services.parallel_training import ParallelTrainer
+from services.training_cache import TrainingCache
+from services.calibration_service import CalibrationService
+from services.artifact_pack import ArtifactPack
+from services.champion_service import ChampionService
+from services.inference_engine import inference_engine
+from services.numpy_runtime import NumpyNetwork
 from models.Scaler import Scaler
+from models.series_matrix import SeriesMatrix
+from utils.utils import atomic_write_json, lazy_module
 
-from tensorflow.keras import layers, models, callbacks, optimizers
-from tensorflow.keras.models import load_model
 from datetime import timedelta
-from functools import reduce
+
+# TensorFlow/Keras se importan recién al entrenar (o si falta el .npw de un modelo):
+# la inferencia usa el runtime NumPy (services.numpy_runtime)
+layers = lazy_module("tensorflow.keras.layers")
+models = lazy_module("tensorflow.keras.models")
+callbacks = lazy_module("tensorflow.keras.callbacks")
+optimizers = lazy_module("tensorflow.keras.optimizers")
+
+def load_model(path, compile=False):
+    return models.load_model(path, compile=compile)
 
 class ModelService:
 
+    ARCHS = ("MLP", "CNN1D", "LSTM", "CNN_LSTM")
+    VERSION_FILES = (".keras", ".npw", ".calib.json")  # lo que se archiva por versión (finetune_product)
+
     @staticmethod
-    def build_models(db: Session):
+    def build_models(db: Session, products=None, progress=None, workers=None, force=False, incremental=False, tiered=False):
+        """
+        Entrena los modelos de los productos indicados (por defecto P001 y P002).
+        progress: callable opcional que recibe eventos de avance (inicio/fin de producto y
+        fin de cada época); si lanza una excepción el entrenamiento se interrumpe.
+        workers: procesos de entrenamiento en paralelo (por defecto TRAINING_WORKERS o 1 = secuencial).
+        force: reentrena aunque la serie y la configuración no hayan cambiado.
+        incremental: si hay días nuevos, ajusta (fine-tune) los checkpoints existentes en lugar
+        de entrenar desde cero; vuelve a entrenamiento completo si la validación empeora.
+        tiered: no entrena los productos que el enrutamiento manda al tier estadístico
+        (BaselineService.route: demanda intermitente o de bajo volumen).
+        """
         LOOKBACK = 60
         VAL_DAYS = 90
         BATCH_SIZE = 64
@@ -28,34 +60,179 @@ class ModelService:
         for d in [OUT_DIR, SCALER_DIR]:
             os.makedirs(d, exist_ok=True)
 
-        # Load data from PostgreSQL
-        dataset = ModelService.load_data(db)
-        print(dataset.info())
+        # Load data from PostgreSQL (filtrar solo P001 y P002 si no se indican productos)
+        if products is None:
+            products = ['P001', 'P002']
+        dataset = ModelService.load_data(db, products=products)
+        print(dataset)
 
-        # Filtrar solo P001 y P002
-        dataset = dataset[dataset['product_code'].isin(['P001', 'P002'])].copy()
-        products = sorted(dataset["product_code"].unique())
+        products = dataset.products
         print(f"Productos encontrados: {products}")
         
         result = {
             "metricas": [],
-            "summary": []
+            "summary": [],
+            "training_cache": {"trained": [], "reused": [], "finetuned": [], "fallback": []},
         }
 
+        # Cola del catálogo: se pronostica con el tier estadístico, sin redes
+        if tiered:
+            from services.baseline_service import BaselineService
+            tiers = BaselineService.route(dataset, LOOKBACK, VAL_DAYS)
+            result["baseline_tier"] = [p for p in products if tiers[p]["tier"] == "baseline"]
+            products = [p for p in products if tiers[p]["tier"] == "neural"]
+            for product in result["baseline_tier"]:
+                print(f"[BASELINE] {product}, demanda intermitente o de bajo volumen; no se entrenan redes")
+                if progress:
+                    progress({"event": "product_done", "product": product, "status": "baseline"})
+
+        config = {"LOOKBACK": LOOKBACK, "VAL_DAYS": VAL_DAYS, "EPOCHS": EPOCHS, "BATCH_SIZE": BATCH_SIZE,
+                  "OUT_DIR": OUT_DIR, "LEARNING_RATE": LEARNING_RATE}
+        config_hash = TrainingCache.config_hash({k: v for k, v in config.items() if k != "OUT_DIR"}, ModelService.builders())
+
+        # Saltar productos cuya serie y configuración no cambiaron desde el último entrenamiento
+        series_hashes = {}
+        to_train = []
         for product in products:
-            series = ModelService.build_daily_series(dataset, product)
-            if len(series) >= LOOKBACK+VAL_DAYS:
-                metrics = ModelService.train_product(series,product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE)
-                result["metricas"].append({product: metrics})
-            else:
-                print(f"[SKIP] {product}, insuficiente longitud")
+            series_hashes[product] = TrainingCache.series_hash(dataset.row(product), dataset.origin)
+            cached = None if force else TrainingCache.reusable(
+                product, series_hashes[product], config_hash, ModelService.ARCHS, OUT_DIR, SCALER_DIR)
+            if cached is None:
+                to_train.append(product)
+                continue
+            print(f"[CACHE] {product}, serie y configuración sin cambios; se reutiliza el modelo")
+            ModelService.calibrate_missing(dataset.row(product), product, LOOKBACK, VAL_DAYS, OUT_DIR, SCALER_DIR)
+            result["metricas"].append({product: cached})
+            result["training_cache"]["reused"].append(product)
+            if progress:
+                progress({"event": "product_done", "product": product, "status": "reused"})
+
+        def on_trained(product, metrics, mode="full"):
+            previous = TrainingCache.load_manifest(product, OUT_DIR) or {}
+            TrainingCache.save(product, series_hashes[product], config_hash, metrics, OUT_DIR,
+                               mode=mode, n_days=int(dataset.n_days), series_end=dataset.end.strftime("%Y-%m-%d"),
+                               version=int(previous.get("version", 0)) + 1)
+            result["metricas"].append({product: metrics})
+            result["training_cache"]["finetuned" if mode == "incremental" else "trained"].append(product)
+
+        if workers is None:
+            workers = ParallelTrainer.default_workers()
+        started = time.perf_counter()
+
+        # Modo incremental: fine-tune de los checkpoints con los días nuevos (segundos por producto)
+        if incremental and to_train:
+            pending = []
+            for product in to_train:
+                manifest = TrainingCache.load_manifest(product, OUT_DIR)
+                metrics = None
+                if manifest is not None and manifest.get("config_hash") == config_hash:
+                    metrics = ModelService.finetune_product(dataset.row(product), product, manifest, LOOKBACK, VAL_DAYS,
+                                                            BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE, progress=progress)
+                if metrics is None:
+                    if manifest is not None:
+                        result["training_cache"]["fallback"].append(product)
+                    pending.append(product)
+                    continue
+                on_trained(product, metrics, mode="incremental")
+                if progress:
+                    progress({"event": "product_done", "product": product, "status": "finetuned"})
+            to_train = pending
+
+        if workers > 1:
+            ModelService._build_parallel(dataset, to_train, config, SCALER_DIR, workers, on_trained, progress)
+        else:
+            for product in to_train:
+                series = dataset.row(product)
+                if progress:
+                    progress({"event": "product_start", "product": product, "epochs": EPOCHS})
+                status = "skipped"
+                if len(series) >= LOOKBACK+VAL_DAYS:
+                    metrics = ModelService.train_product(series,product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE, progress=progress)
+                    if metrics is not None:
+                        on_trained(product, metrics)
+                        status = "trained"
+                else:
+                    print(f"[SKIP] {product}, insuficiente longitud")
+                if progress:
+                    progress({"event": "product_done", "product": product, "status": status})
+
+        result["metricas"].sort(key=lambda m: next(iter(m)))
+        elapsed = time.perf_counter() - started
+        n_trained = len(result["training_cache"]["trained"]) + len(result["training_cache"]["finetuned"])
+        result["throughput"] = {
+            "mode": "parallel" if workers > 1 else "sequential",
+            "workers": int(workers),
+            "products": n_trained,
+            "seconds": round(elapsed, 3),
+            "products_per_min": round(n_trained / elapsed * 60.0, 3) if elapsed > 0 else None,
+        }
+        print(f"Throughput: {result['throughput']}")
 
         result["summary"] = ModelService.load_summary_metrics(result["metricas"])
 
+        # Campeón por producto con las métricas de validación de la calibración (reentrenados y
+        # reutilizados que todavía no tienen uno)
+        known = ChampionService.champions(OUT_DIR)
+        retrained = result["training_cache"]["trained"] + result["training_cache"]["finetuned"]
+        pending = retrained + [p for p in result["training_cache"]["reused"] if p not in known]
+        result["champions"] = ChampionService.record_from_calibration(pending, dataset, ModelService.ARCHS, LOOKBACK,
+                                                                      VAL_DAYS, OUT_DIR) if pending else {}
+
+        # Los forecasts cacheados de los productos reentrenados quedan obsoletos solos: su clave
+        # incluye la versión de los artefactos de cada producto (artifact_version).
+        # Los scalers/calibraciones quedan sueltos (tienen prioridad sobre el pack); empaquetarlos
+        # es un paso explícito (cli.pack)
+
         return result
      
     @staticmethod
-    def predict(db: Session):
+    def predict(db: Session, mode="product", products=None, offset=0, limit=None, compare=False):
+        """
+        Forecast a 90 días por producto: por defecto sólo la arquitectura campeona de cada
+        producto (ChampionService; las cuatro si todavía no tiene campeón; si falta el artefacto
+        del campeón, la siguiente disponible con el aviso en el bloque: "fallback").
+        Sin calibración vigente el bloque va sin bandas y con "interval": {"available": false, "reason"}.
+        compare=True: todas las arquitecturas (vista de comparación).
+        products: códigos a incluir (por defecto todos los que tienen modelos entrenados).
+        offset/limit: paginación sobre la lista ordenada de productos.
+        mode="global": usa los modelos globales multi-SKU (misma forma de respuesta).
+        mode="baseline": tier estadístico (SNAIVE, MA, SES, CROSTON_SBA) para todos los productos con ventas.
+        mode="auto": enruta cada producto: redes para la cabeza del catálogo, tier estadístico para la cola.
+        """
+        if mode == "global":
+            from services.global_model_service import GlobalModelService
+            page = ModelService.paginate(GlobalModelService.trained_products(), products, offset, limit)
+            return GlobalModelService.predict(db, products=page)
+        if mode in ("baseline", "auto"):
+            from services.baseline_service import BaselineService
+            return BaselineService.predict_page(db, products, offset, limit, route=mode == "auto", compare=compare)
+
+        output = {}
+        page = []
+        for event in ModelService.iter_predict(db, products, offset, limit, compare=compare):
+            if event["type"] == "meta":
+                page = event["products"]
+            elif event["type"] == "forecast":
+                output.setdefault(event["product_code"], {})[event["arch"]] = event["model"]
+
+        # mismo orden de productos y de arquitecturas que la lista paginada / MODELS
+        return [
+            {"product_code": product, "models": {arch: output[product][arch] for arch in ModelService.ARCHS if arch in output[product]}}
+            for product in page if product in output
+        ]
+
+    @staticmethod
+    def iter_predict(db: Session, products=None, offset=0, limit=None, chunk_size=None, compare=False):
+        """
+        Generador del forecast: produce eventos a medida que termina cada (producto, arquitectura).
+        - {"type": "meta", "products": [...], "total": N, "offset", "limit"}
+        - {"type": "forecast", "product_code", "arch", "model": {...}}  (mismo bloque que predict)
+        - {"type": "end", "count": n}
+        Los productos se procesan en bloques de chunk_size (PREDICT_CHUNK_SIZE): sólo se cargan
+        en memoria las series del bloque y la inferencia se agrupa por arquitectura dentro de él.
+        Cerrar el generador (p. ej. el cliente se desconectó) cancela los bloques pendientes.
+        Sin compare sólo se cargan y evalúan los campeones (ChampionService).
+        """
         LOOKBACK = 60
         VAL_DAYS = 90
         HORIZON = 90
@@ -64,231 +241,590 @@ class ModelService:
 
         OUT_DIR = "./data/models"
         SCALERS_DIR = os.path.join(OUT_DIR, "scalers")
+        if chunk_size is None:
+            chunk_size = max(1, int(os.getenv("PREDICT_CHUNK_SIZE", "32")))
+
+        # Marca de agua de ventas: si cambió (nuevas filas) el cache de forecasts se invalida
+        watermark = SaleRepository.get_watermark(db)
+        forecast_cache.observe_watermark(watermark)
+        cache_config = {"LOOKBACK": LOOKBACK, "VAL_DAYS": VAL_DAYS, "HORIZON": HORIZON, "HISTORY_PLOT_DAYS": HISTORY_PLOT_DAYS,
+                        "PI": "per_step"}
+
+        available = ModelService.trained_products(OUT_DIR)
+        champions = None if compare else ChampionService.champions(OUT_DIR)
+        page = ModelService.paginate(available, products, offset, limit)
+        total = len(ModelService.paginate(available, products))
+        yield {"type": "meta", "products": page, "total": total, "offset": offset, "limit": limit}
+
+        count = 0
+        for start in range(0, len(page), chunk_size):
+            for event in ModelService._predict_chunk(db, page[start:start + chunk_size], watermark, cache_config, MODELS,
+                                                     LOOKBACK, VAL_DAYS, HORIZON, HISTORY_PLOT_DAYS, OUT_DIR, SCALERS_DIR,
+                                                     champions):
+                count += 1
+                yield event
+        yield {"type": "end", "count": count}
 
-        # Load data
-        dataset = ModelService.load_data(db)
-        # Filtrar P001 y P002 (ajusta si quieres más)
-        dataset = dataset[dataset['product_code'].isin(['P001'])].copy()
-        products = sorted(dataset["product_code"].unique())
+    @staticmethod
+    def _predict_chunk(db, products, watermark, cache_config, MODELS, LOOKBACK, VAL_DAYS, HORIZON, HISTORY_PLOT_DAYS, OUT_DIR, SCALERS_DIR,
+                       champions=None):
+        """
+        Forecast de un bloque de productos; produce un evento "forecast" por (producto, arquitectura).
+        champions: {producto: arquitectura}; si el producto tiene campeón sólo se evalúa ése.
+        """
+        plans = {p: ModelService.serving_plan(p, MODELS, champions, OUT_DIR) for p in products}
+        archs = {p: plan[0] for p, plan in plans.items()}
+
+        def event(product, arch, payload):
+            fallback = plans[product][1]
+            if fallback is not None:
+                payload = {**payload, "fallback": fallback}   # el payload cacheado no lleva el aviso
+            return {"type": "forecast", "product_code": product, "arch": arch, "model": payload}
+
+        # payloads ya calculados para esta marca de agua / versión de modelo / config
+        cache_keys = {}
+        cached = {}
+        for product in products:
+            cache_keys[product] = {}
+            for arch in archs[product]:
+                version = ModelService.artifact_version(arch, product, OUT_DIR)
+                if version is not None:
+                    cache_keys[product][arch] = forecast_cache.make_key("forecast", product, arch, watermark, version, **cache_config)
+            cached[product] = {arch: forecast_cache.get(key) for arch, key in cache_keys[product].items()}
+
+        # productos con todo en cache: no hace falta cargar sus series
+        ineligible_key = forecast_cache.make_key("ineligible", watermark, **cache_config)
+        ineligible = set(forecast_cache.get(ineligible_key) or [])
+        todo = []
+        for product in products:
+            if product in ineligible:
+                continue
+            if all(v is not None for v in cached[product].values()):
+                for arch in archs[product]:
+                    if cached[product].get(arch) is not None:
+                        yield event(product, arch, cached[product][arch])
+            else:
+                todo.append(product)
+        if not todo:
+            return
 
-        output = []  # ← lista final: una “row” por producto
+        dataset = ModelService.load_data(db, products=todo)
+        pending = {arch: [] for arch in MODELS}  # trabajo de inferencia agrupado por arquitectura
 
-        for product in products:
-            series = ModelService.build_daily_series(dataset, product)
+        for product in todo:
+            if product not in dataset.products:
+                ineligible.add(product)
+                continue
+            series = dataset.row(product)  # vista float32 sin copia
             if len(series) < LOOKBACK + VAL_DAYS + 5:
+                ineligible.add(product)
                 continue
 
             # scaler
             scaler = ModelService.load_scaler(product, SCALERS_DIR)
             if scaler is None:
-                arr_tmp = series.values.astype(np.float32)
-                scaler = Scaler(np.mean(arr_tmp), np.std(arr_tmp))
+                scaler = Scaler(np.mean(series), np.std(series))
 
             # datos escalados
-            arr = series.values.astype(np.float32)
-            arr_z = scaler.transform(arr)
+            arr_z = scaler.transform(series)
 
             # ventana final
             last_window = arr_z[-LOOKBACK:].astype(np.float32)
-            last_date = series.index.max()
+            last_date = dataset.end
 
             # histórico a graficar
-            hist_start = max(series.index.min(), last_date - timedelta(days=HISTORY_PLOT_DAYS - 1))
-            hist_dates = pd.date_range(hist_start, last_date, freq="D")
-            hist_values = series.loc[hist_dates].values
+            hist_dates, hist_values = ModelService._history(series, last_date, HISTORY_PLOT_DAYS)
 
-            # contenedor por producto
-            product_row = {
-                "product_code": product,
-                "models": {}  # se llenará por arquitectura
-            }
+            for arch in archs[product]:
+                if cached[product].get(arch) is not None:
+                    yield event(product, arch, cached[product][arch])
+                    continue
 
-            for arch in MODELS:
                 model = ModelService.load_arch_model(arch, product, OUT_DIR)
                 if model is None:
                     continue
 
-                # decidir modo (iterativo vs directo) según dimensión de salida
-                out_shape = model.output_shape
-                out_dim = 1
-                if isinstance(out_shape, tuple):
-                    out_dim = 1 if len(out_shape) < 2 else int(reduce(operator.mul, out_shape[1:]))
-
-                if out_dim == 1:
-                    preds_z = ModelService.iterative_forecast(model, arch, last_window, HORIZON)
+                # calibración guardada al entrenar (sigma + métricas); predict sólo la lee: la escriben
+                # build_models / finetune_product. Sin sigma vigente se sirve sin bandas, con el aviso.
+                model_path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+                calib = CalibrationService.load(product, arch, SCALERS_DIR, model_path, scaler, LOOKBACK, VAL_DAYS, arr_z)
+                sigma, interval = None, None
+                if calib is not None and calib["sigma_ok"]:
+                    sigma = CalibrationService.interval_sigma(calib, HORIZON)
                 else:
-                    preds_z = ModelService.direct_forecast(model, arch, last_window, HORIZON)
+                    interval = {"available": False, "reason": "calibration_missing" if calib is None else "calibration_stale"}
+
+                pending[arch].append({
+                    "product": product,
+                    "model": model,
+                    "scaler": scaler,
+                    "arr_z": arr_z,
+                    "last_window": last_window,
+                    "sigma": sigma,
+                    "interval": interval,
+                    "metrics": calib["metrics"] if calib is not None and calib["metrics_ok"] else None,
+                    "history": (hist_dates, hist_values),
+                    "cache_key": cache_keys[product].get(arch),
+                })
+
+        if ineligible:
+            forecast_cache.set(ineligible_key, sorted(ineligible))
+
+        # Inferencia por lotes: por arquitectura, todas las series del bloque en una misma llamada
+        fcst_idx = pd.date_range(dataset.end + timedelta(days=1), periods=HORIZON, freq="D")
+        for arch, items in pending.items():
+            if not items:
+                continue
+            models_arch = [it["model"] for it in items]
+            preds_all = inference_engine.forecast(arch, models_arch, np.stack([it["last_window"] for it in items]), HORIZON)
+
+            # backtest rolling-origin one-step sobre validación (sólo los que no tienen métricas vigentes);
+            # sólo lectura: no se persiste. Sin sigma no hay cobertura que medir.
+            todo_bt = [it for it in items if it["metrics"] is None]
+            if todo_bt:
+                bt = BacktestService.backtest_many(arch, [it["model"] for it in todo_bt], [it["arr_z"] for it in todo_bt],
+                                                   [it["scaler"] for it in todo_bt],
+                                                   [0.0 if it["sigma"] is None else it["sigma"] for it in todo_bt], LOOKBACK, VAL_DAYS)
+                for it, metrics_val in zip(todo_bt, bt):
+                    it["metrics"] = metrics_val if it["sigma"] is not None else {**metrics_val, "coverage_95_pct": None}
+
+            for it, preds_z in zip(items, preds_all):
+                hist_dates, hist_values = it["history"]
+                payload = ModelService._model_payload(
+                    hist_dates, hist_values, fcst_idx, preds_z, it["sigma"], it["scaler"], it["metrics"])
+                if it["interval"] is not None:
+                    payload["interval"] = it["interval"]
+                if it["cache_key"] is not None:
+                    forecast_cache.set(it["cache_key"], payload)
+                yield event(it["product"], arch, payload)
+
+    @staticmethod
+    def serving_archs(product, archs, champions=None, MODELS_DIR="./data/models"):
+        """Arquitecturas a evaluar para el producto (ver serving_plan)."""
+        return ModelService.serving_plan(product, archs, champions, MODELS_DIR)[0]
+
+    @staticmethod
+    def serving_plan(product, archs, champions=None, MODELS_DIR="./data/models"):
+        """
+        (arquitecturas a evaluar, aviso): su campeón si lo tiene, si no todas.
+        Si falta el artefacto del campeón (borrado, export fallido) se sirve la mejor arquitectura
+        disponible según los puntajes del registro, se registra un aviso y el payload lo indica:
+        {"champion", "served", "reason": "champion_artifact_missing"}.
+        """
+        champion = (champions or {}).get(product)
+        if champion not in archs:
+            return list(archs), None
+        if ModelService.artifact_version(champion, product, MODELS_DIR) is not None:
+            return [champion], None
+        available = [a for a in archs if ModelService.artifact_version(a, product, MODELS_DIR) is not None]
+        ranked = [a for a in ChampionService.ranking(product, MODELS_DIR) if a in available]
+        served = (ranked or available or [None])[0]
+        print(f"[WARN] {product}: falta el modelo campeón {champion}; se sirve {served or 'ninguno'}")
+        return ([served] if served else []), {"champion": champion, "served": served, "reason": "champion_artifact_missing"}
+
+    @staticmethod
+    def trained_products(MODELS_DIR="./data/models", archs=("MLP", "CNN1D", "LSTM", "CNN_LSTM")):
+        """Códigos de producto con al menos un modelo entrenado (ordenados)."""
+        found = set()
+        for arch in archs:
+            arch_dir = os.path.join(MODELS_DIR, arch)
+            if not os.path.isdir(arch_dir):
+                continue
+            for fname in os.listdir(arch_dir):
+                if fname.endswith(".keras") and not fname.startswith("."):
+                    found.add(fname[:-len(".keras")])
+        return sorted(found)
+
+    @staticmethod
+    def paginate(available, products=None, offset=0, limit=None):
+        """Filtra por códigos de producto y aplica offset/limit sobre la lista ordenada."""
+        if products is not None:
+            wanted = set(products)
+            available = [p for p in available if p in wanted]
+        offset = max(int(offset or 0), 0)
+        return available[offset:] if limit is None else available[offset:offset + max(int(limit), 0)]
+
+    @staticmethod
+    def _history(series, last_date, HISTORY_PLOT_DAYS):
+        """Últimos HISTORY_PLOT_DAYS días de la serie (fechas, valores) para graficar."""
+        n_hist = min(len(series), HISTORY_PLOT_DAYS)
+        hist_dates = pd.date_range(last_date - timedelta(days=n_hist - 1), last_date, freq="D")
+        return hist_dates, series[-n_hist:]
 
-                # incertidumbre a partir de residuales de validación (en z)
-                sigma = ModelService.residual_std_for_arch(model, arch, arr_z, LOOKBACK, VAL_DAYS)
-                lower_z = preds_z - 1.96 * sigma
-                upper_z = preds_z + 1.96 * sigma
+    @staticmethod
+    def _model_payload(hist_dates, hist_values, fcst_idx, preds_z, sigma, scaler, metrics):
+        """
+        Bloque serializable de una arquitectura para un producto (histórico, forecast con PI 95%, resumen y métricas).
+        sigma: escalar o uno por paso del horizonte (mismo largo que preds_z); None = sin calibración,
+        sin bandas (lower/upper vacíos, total_low/total_up en None).
+        """
+        preds = scaler.inverse_transform(preds_z)
+        if sigma is None:
+            lower = upper = np.zeros(0)
+            total_low = total_up = None
+        else:
+            lower = scaler.inverse_transform(preds_z - 1.96 * sigma)
+            upper = scaler.inverse_transform(preds_z + 1.96 * sigma)
+            total_low = float(np.sum(lower))
+            total_up = float(np.sum(upper))
+
+        total_pred = float(np.sum(preds))
+        mean_daily = float(np.mean(preds))
+        p50        = float(np.median(preds))
+
+        # guardar todo serializable
+        return {
+            "history": {
+                "dates": [d.strftime("%Y-%m-%d") for d in hist_dates.to_pydatetime().tolist()],
+                "values": [float(x) for x in hist_values.tolist()],
+            },
+            "forecast": {
+                "dates": [d.strftime("%Y-%m-%d") for d in fcst_idx.to_pydatetime().tolist()],
+                "pred":  [float(x) for x in preds.tolist()],
+                "lower": [float(x) for x in lower.tolist()],
+                "upper": [float(x) for x in upper.tolist()],
+            },
+            "summary": {
+                "total_pred": total_pred,
+                "total_low": total_low,
+                "total_up": total_up,
+                "mean_daily": mean_daily,
+                "median": p50,
+            },
+            "metrics": metrics
+        }
 
-                # back-transform
-                preds = scaler.inverse_transform(preds_z)
-                lower = scaler.inverse_transform(lower_z)
-                upper = scaler.inverse_transform(upper_z)
+    @staticmethod
+    def artifact_version(arch, product, MODELS_DIR):
+        """
+        Versión de los artefactos del producto (sólo los suyos, así reentrenar un producto no
+        invalida los forecasts de los demás):
+        - modelo: mtime/tamaño del .keras y, con el runtime NumPy, del .npw que se sirve,
+        - scaler: mtime/tamaño del archivo suelto o, si está empaquetado, hash de su entrada del pack.
+        Retorna None si el modelo no existe.
+        """
+        keras_path = os.path.join(MODELS_DIR, arch, f"{product}.keras")
+        paths = [keras_path]
+        if ModelService.inference_runtime() == "numpy":
+            paths.append(NumpyNetwork.weights_path(keras_path))
+        version = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+                version.append([st.st_mtime_ns, st.st_size])
+            except FileNotFoundError:
+                version.append(None)
+        if not any(version):
+            return None
 
-                # fechas de forecast
-                fcst_idx = pd.date_range(last_date + timedelta(days=1), periods=HORIZON, freq="D")
+        SCALER_DIR = os.path.join(MODELS_DIR, "scalers")
+        scaler_path = os.path.join(SCALER_DIR, f"{product}.json")
+        try:
+            st = os.stat(scaler_path)
+            version.append([st.st_mtime_ns, st.st_size])
+        except FileNotFoundError:
+            version.append(ArtifactPack.entry_digest(SCALER_DIR, ArtifactPack.scaler_key(product)))
+        return version
 
-                start_val = len(arr_z) - VAL_DAYS
-                window = arr_z[start_val - LOOKBACK : start_val].astype(np.float32).copy()
+    @staticmethod
+    def load_data(db: Session, products=None, startdate=None, enddate=None):
+        # 1. Calendario completo (límites de toda la tabla, aunque se filtren productos)
+        date_min, date_max = SaleRepository.get_date_bounds(db)
+        if startdate is not None:
+            date_min = max(date_min, startdate)
+        if enddate is not None:
+            date_max = min(date_max, enddate)
 
-                y_true_val_z = []
-                y_pred_val_z = []
+        # 2. Agregado diario por producto (rollup ventas_daily si está al día o, si no o si está
+        #    deshabilitado, GROUP BY sobre ventas), leído en streaming por bloques
+        chunks = SaleRollupRepository.source(db).iter_daily_quantities(db, products, startdate, enddate)
 
+        # 3. Matriz densa productos × días (float32), con 0 en los días sin ventas, sumando bloque a bloque
+        dataset = SeriesMatrix.from_daily_chunks(chunks, date_min, date_max)
+        print(dataset)
 
-                for t in range(start_val, len(arr_z)):
-                    # x_in: ventana actual
-                    x_in = window.astype(np.float32)
-                    # predicción one-step en espacio z
-                    yhat_z = ModelService.one_step_predict(model, arch, x_in)
-                    # yhat_z debe ser escalar; si viene array, toma escalar
-                    if hasattr(yhat_z, "shape"):
-                        yhat_z = float(np.squeeze(yhat_z))
-                    else:
-                        yhat_z = float(yhat_z)
-
-                    y_pred_val_z.append(yhat_z)
-                    y_true_val_z.append(float(arr_z[t]))
-
-                    # actualizar ventana: drop first, append "verdadero" (simula despliegue real)
-                    window = np.concatenate([window[1:], np.array([arr_z[t]], dtype=np.float32)], axis=0)
-
-                # a escala original
-                y_true_val = scaler.inverse_transform(np.array(y_true_val_z, dtype=np.float32))
-                y_pred_val = scaler.inverse_transform(np.array(y_pred_val_z, dtype=np.float32))
-
-                err = y_pred_val - y_true_val
-                mae = float(np.mean(np.abs(err)))
-                mse = float(np.mean(err**2))
-                rmse = float(np.sqrt(mse))
-                mape = ModelService._safe_mape(y_true_val, y_pred_val)
-                smape = ModelService._smape(y_true_val, y_pred_val)
-                bias = float(np.mean(err))  # >0 sobre-pronóstico; <0 sub-pronóstico
-                mae_pct_of_mean = float(mae / (np.mean(np.abs(y_true_val)) + 1e-8) * 100.0)
-
-                # cobertura 95% en validación usando mismo sigma (PI en z → original)
-                lower_val = scaler.inverse_transform(np.array(y_pred_val_z) - 1.96 * sigma)
-                upper_val = scaler.inverse_transform(np.array(y_pred_val_z) + 1.96 * sigma)
-                covered = np.logical_and(y_true_val >= lower_val, y_true_val <= upper_val)
-                coverage_95 = float(np.mean(covered) * 100.0)
-
-                # rating simple según MAPE (ajusta si quieres)
-                if mape <= 10:
-                    eval_label = "bueno"
-                elif mape <= 20:
-                    eval_label = "medio"
-                else:
-                    eval_label = "malo"
-
-                metrics_val = {
-                    "mae": mae,
-                    "mse": mse,
-                    "rmse": rmse,
-                    "mape_pct": mape,
-                    "smape_pct": smape,
-                    "bias": bias,
-                    "mae_pct_of_mean": mae_pct_of_mean,
-                    "coverage_95_pct": coverage_95,
-                    "eval": eval_label,
-                    "n_val": int(VAL_DAYS),
-                }
-
-                total_pred = float(np.sum(preds))
-                total_low  = float(np.sum(lower))
-                total_up   = float(np.sum(upper))
-                mean_daily = float(np.mean(preds))
-                p50        = float(np.median(preds))
-
-                charts = []
-
-                
-
-                # guardar todo serializable
-                product_row["models"][arch] = {
-                    "history": {
-                        "dates": [d.strftime("%Y-%m-%d") for d in hist_dates.to_pydatetime().tolist()],
-                        "values": [float(x) for x in hist_values.tolist()],
-                    },
-                    "forecast": {
-                        "dates": [d.strftime("%Y-%m-%d") for d in fcst_idx.to_pydatetime().tolist()],
-                        "pred":  [float(x) for x in preds.tolist()],
-                        "lower": [float(x) for x in lower.tolist()],
-                        "upper": [float(x) for x in upper.tolist()],
-                    },
-                    "summary": {
-                        "total_pred": total_pred,
-                        "total_low": total_low,
-                        "total_up": total_up,
-                        "mean_daily": mean_daily,
-                        "median": p50,
-                    },
-                    "metrics": metrics_val
-                }
-
-            output.append(product_row)
-
-        return output
-
-    @staticmethod
-    def load_data(db: Session):
-        dataset = SaleRepository.get_all(db)
-
-        df = pd.DataFrame([{
-            "id": s.id,
-            "product_code": s.product_code,
-            "quantity": s.quantity,
-            "sale_date": s.sale_date
-        } for s in dataset])
-
-        # 1. Normalizar la columna de fechas (solo parte de fecha, sin hora)
-        df["sale_date"] = pd.to_datetime(df["sale_date"]).dt.normalize()
-        df["quantity"] = pd.to_numeric(df["quantity"], errors="coerce").fillna(0.0)
-
-        # 2. Agrupar por día y producto, sumando las ventas (cantidad)
-        gp = (df.groupby([df["sale_date"], df["product_code"]], as_index=False)["quantity"].sum())
-
-        # 3. Construir el calendario completo, lista de todas las fechas entre la mínima y máxima y lista de todos los productos únicos
-        date_min, date_max = gp["sale_date"].min(), gp["sale_date"].max()
-        all_dates = pd.date_range(date_min, date_max, freq="D")
-        all_products = gp["product_code"].drop_duplicates().sort_values()
-
-        full_idx = pd.MultiIndex.from_product(
-            [all_dates, all_products],
-            names=["sale_date", "product_code"]
-        )
-
-        # 4. Reindexar el dataframe original al calendario completo, rellena con 0 en los días sin ventas
-        train_dataset = (gp.set_index(["sale_date", "product_code"])
-            .reindex(full_idx)
-            .fillna({"quantity": 0})
-            .reset_index()
-            .sort_values(["sale_date", "product_code"], kind="stable"))
-        
-        # 5. Resultado final: dataset completo fecha × producto con ventas (incluye ceros)
-        train_dataset.rename(columns={"quantity": "quantity"}, inplace=True)
-        print(train_dataset.head(10))   # primeras 10 filas
-        print(train_dataset.tail(10))   # últimas 10 filas
+        return dataset
 
-        return train_dataset
-    
     @staticmethod
-    def build_daily_series(df, product):
-        sub = df[df["product_code"] == product].copy()
-        return sub.set_index("sale_date").sort_index()["quantity"].asfreq("D", fill_value=0.0)
-    
+    def _build_parallel(dataset, products, config, SCALER_DIR, workers, on_trained, progress=None):
+        """
+        Entrena las tareas (producto, arquitectura) en un pool de procesos.
+        El scaler de cada producto se guarda cuando terminan sus cuatro modelos.
+        """
+        LOOKBACK, VAL_DAYS, EPOCHS = config["LOOKBACK"], config["VAL_DAYS"], config["EPOCHS"]
+        pending = {}
+        tasks = []
+        for product in products:
+            series = dataset.row(product)
+            if progress:
+                progress({"event": "product_start", "product": product, "epochs": EPOCHS})
+            prepared = None
+            if len(series) >= LOOKBACK+VAL_DAYS:
+                prepared = ModelService.prepare_product(series, product, LOOKBACK, VAL_DAYS)
+            else:
+                print(f"[SKIP] {product}, insuficiente longitud")
+            if prepared is None:
+                if progress:
+                    progress({"event": "product_done", "product": product, "status": "skipped"})
+                continue
+
+            scaler, arr_z, _ = prepared
+            pending[product] = {"scaler": scaler, "metric": {}}
+            for arch in ModelService.ARCHS:
+                tasks.append({"product": product, "arch": arch, "arr_z": arr_z, "scaler": scaler.to_json(),
+                              "SCALER_DIR": SCALER_DIR, "config": config})
+
+        def on_result(res):
+            product = res["product"]
+            entry = pending[product]
+            entry["metric"][res["arch"]] = {"loss": res["loss"], "val_loss": res["val_loss"]}
+            print(f"Guardado {res['arch']} -> {res['path']} ({res['seconds']:.1f}s)")
+            if progress:
+                progress({
+                    "event": "epoch", "product": product, "arch": res["arch"],
+                    "epoch": len(res["loss"]), "epochs": EPOCHS,
+                    "loss": res["loss"][-1] if res["loss"] else None,
+                    "val_loss": res["val_loss"][-1] if res["val_loss"] else None,
+                })
+            if len(entry["metric"]) == len(ModelService.ARCHS):
+                ModelService.save_scaler(entry["scaler"], product, SCALER_DIR)
+                on_trained(product, {a: entry["metric"][a] for a in ModelService.ARCHS})
+                if progress:
+                    progress({"event": "product_done", "product": product, "status": "trained"})
+
+        ParallelTrainer.run(tasks, workers, on_result)
+
     @staticmethod
-    def train_product(series, product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE):
-        arr = series.values.astype(np.float32)
+    def train_product(series, product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE, progress=None):
+        prepared = ModelService.prepare_product(series, product, LOOKBACK, VAL_DAYS)
+        if prepared is None:
+            return
+        scaler, arr_z, windows = prepared
+
+        # Estructura de métricas
+        metric = {
+            "MLP": {"loss": [], "val_loss": []},
+            "CNN1D": {"loss": [], "val_loss": []},
+            "LSTM": {"loss": [], "val_loss": []},
+            "CNN_LSTM": {"loss": [], "val_loss": []}
+        }
+
+        for name in ModelService.ARCHS:
+            history = ModelService.train_arch(name, arr_z, product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, LEARNING_RATE, progress)
+
+            # Calibración (sigma de validación + métricas) junto al scaler
+            CalibrationService.calibrate(history.model, name, product, arr_z, windows[1], windows[3], scaler, LOOKBACK, VAL_DAYS,
+                                         os.path.join(OUT_DIR, name, f"{product}.keras"), SCALER_DIR)
+
+            # Guardar pérdidas en metric
+            ModelService.get_model_metrics(name, history, metric)
+
+        # Guardar scaler (entrenado SOLO con train)
+        ModelService.save_scaler(scaler, product, SCALER_DIR)
+
+        return metric
+
+    @staticmethod
+    def finetune_product(series, product, manifest, LOOKBACK, VAL_DAYS, BATCH_SIZE, OUT_DIR, SCALER_DIR, LEARNING_RATE, progress=None):
+        """
+        Reentrenamiento incremental (warm-start) desde los .keras existentes:
+        - mantiene el scaler del checkpoint,
+        - ajusta sólo con las ventanas de entrenamiento nuevas + una muestra de repaso de las antiguas,
+        - guarda el resultado como nueva versión (la anterior queda en <ARCH>/versions/ con su .npw
+          y su calibración; ver restore_version).
+        Pocas épocas y sin XLA: con unas pocas ventanas nuevas el costo lo fija la preparación de cada
+        arquitectura (cargar el .keras, trazar las funciones de train/evaluate, calibrar), ~3-4 s por
+        arquitectura, no el número de épocas. Se espera ~2.5x menos que un entrenamiento completo del
+        producto (P001: ~18 s frente a ~50 s), no segundos.
+        Retorna las métricas, o None si no aplica o si la pérdida de validación empeora
+        más de MAX_VAL_REGRESSION (el llamador hace entonces un entrenamiento completo).
+        """
+        from services.window_dataset import WindowDataset
+        from services.training_callbacks import EpochProgress
+
+        FINETUNE_EPOCHS = 3
+        FINETUNE_LR_FACTOR = 0.1
+        REPLAY_WINDOWS = 256
+        MAX_VAL_REGRESSION = 0.10
+        KEEP_VERSIONS = 3
+        HORIZON = 90
+
+        old_days = manifest.get("n_days")
+        scaler = ModelService.load_scaler(product, SCALER_DIR)
+        if scaler is None or not old_days or len(series) <= old_days:
+            return None
+
+        arr_z = scaler.transform(np.asarray(series, dtype=np.float32))
+        X, y = ModelService.make_windows(arr_z, LOOKBACK, HORIZON)
+        if len(y) <= VAL_DAYS:
+            return None
+        X_tr, X_va, y_tr, y_va = ModelService.time_split(X, y, VAL_DAYS)
+        _, va_pos = WindowDataset.split_positions(len(arr_z), LOOKBACK, HORIZON, VAL_DAYS)
+
+        # ventanas de train que no existían en el entrenamiento anterior + repaso de las antiguas
+        old_n_tr = max(old_days - LOOKBACK - HORIZON + 1 - VAL_DAYS, 0)
+        new_idx = np.arange(min(old_n_tr, len(X_tr)), len(X_tr))
+        if len(new_idx) == 0:
+            return None
+        rng = np.random.default_rng(len(series))
+        replay_idx = rng.choice(old_n_tr, size=min(REPLAY_WINDOWS, old_n_tr), replace=False) if old_n_tr else np.array([], dtype=int)
+        idx = np.sort(np.concatenate([replay_idx, new_idx]))
+
+        tuned = {}
+        metric = {name: {"loss": [], "val_loss": []} for name in ModelService.ARCHS}
+        for name in ModelService.ARCHS:
+            path = os.path.join(OUT_DIR, name, f"{product}.keras")
+            if not os.path.exists(path):
+                return None
+            model = load_model(path, compile=False)
+            model.compile(optimizer=optimizers.Adam(LEARNING_RATE * FINETUNE_LR_FACTOR), loss="mse", metrics=["mae"],
+                          jit_compile=False)
+
+            channel = name != "MLP"
+            train_ds = WindowDataset.make(arr_z, LOOKBACK, HORIZON, idx, BATCH_SIZE, channel, shuffle=True)
+            val_ds = WindowDataset.make(arr_z, LOOKBACK, HORIZON, va_pos, BATCH_SIZE, channel)
+            val_before = float(model.evaluate(val_ds, verbose=0)[0])
+
+            print(f"--- Fine-tune {name} para {product} ({len(new_idx)} ventanas nuevas, {len(replay_idx)} de repaso) ---")
+            fit_callbacks = [callbacks.EarlyStopping(patience=1, restore_best_weights=True)]
+            if progress:
+                fit_callbacks.append(EpochProgress(progress, product, name, FINETUNE_EPOCHS))
+            history = model.fit(train_ds, validation_data=val_ds,
+                    epochs=FINETUNE_EPOCHS, verbose=0, shuffle=False, callbacks=fit_callbacks)
+
+            val_after = float(model.evaluate(val_ds, verbose=0)[0])
+            if val_after > val_before * (1.0 + MAX_VAL_REGRESSION):
+                print(f"[FALLBACK] {product} {name}: val_loss {val_before:.4f} -> {val_after:.4f}, se reentrena completo")
+                return None
+            tuned[name] = model
+            ModelService.get_model_metrics(name, history, metric)
+
+        # Todas las arquitecturas mejoraron o se mantuvieron: guardar como nueva versión
+        version = int(manifest.get("version", 1))
+        for name, model in tuned.items():
+            path = os.path.join(OUT_DIR, name, f"{product}.keras")
+            ModelService.archive_version(name, product, version, OUT_DIR, SCALER_DIR, KEEP_VERSIONS)
+            ModelService.save_model_atomic(model, path)
+            print(f"Guardado {name} -> {path} (versión {version + 1})")
+            CalibrationService.calibrate(model, name, product, arr_z, X_va, y_va, scaler, LOOKBACK, VAL_DAYS, path, SCALER_DIR)
+
+        return metric
+
+    @staticmethod
+    def archive_version(arch, product, version, OUT_DIR, SCALER_DIR, keep=3):
+        """
+        Archiva en <ARCH>/versions/ la versión vigente de una arquitectura: .keras, .npw y su
+        calibración (archivo suelto o entrada del pack), que restore_version repone juntos.
+        copy2 conserva mtime/tamaño: el .npw y la calibración siguen correspondiendo al .keras.
+        """
+        path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+        versions_dir = os.path.join(OUT_DIR, arch, "versions"); os.makedirs(versions_dir, exist_ok=True)
+        base = os.path.join(versions_dir, f"{product}.v{version}")
+        shutil.copy2(path, base + ".keras")
+        npw = NumpyNetwork.weights_path(path)
+        if os.path.exists(npw):
+            shutil.copy2(npw, base + ".npw")
+        calib = CalibrationService.read(product, arch, SCALER_DIR)
+        if calib is not None:
+            atomic_write_json(base + ".calib.json", calib)
+        ModelService._prune_versions(versions_dir, product, keep)
+
+    @staticmethod
+    def archived_versions(product, OUT_DIR="./data/models", archs=None):
+        """{arquitectura: [versiones archivadas, de menor a mayor]}."""
+        found = {}
+        for arch in archs or ModelService.ARCHS:
+            versions_dir = os.path.join(OUT_DIR, arch, "versions")
+            if os.path.isdir(versions_dir):
+                found[arch] = sorted(ModelService._versions_in(versions_dir, product))
+        return found
+
+    @staticmethod
+    def restore_version(product, version, OUT_DIR="./data/models", archs=None):
+        """
+        Vuelve a una versión archivada por finetune_product: por arquitectura repone juntos el
+        .keras, el .npw y la calibración (como archivo suelto, con prioridad sobre el pack).
+        Si la versión no tiene .npw (archivos previos) el runtime NumPy lo reexporta del .keras.
+        Retorna las arquitecturas restauradas.
+        """
+        SCALER_DIR = os.path.join(OUT_DIR, "scalers")
+        restored = []
+        for arch in archs or ModelService.ARCHS:
+            base = os.path.join(OUT_DIR, arch, "versions", f"{product}.v{version}")
+            if not os.path.exists(base + ".keras"):
+                continue
+            path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+            targets = {".npw": NumpyNetwork.weights_path(path), ".calib.json": CalibrationService.path(product, arch, SCALER_DIR),
+                       ".keras": path}
+            for ext, dst in targets.items():
+                if os.path.exists(base + ext):
+                    tmp = f"{dst}.{os.getpid()}.tmp"
+                    shutil.copy2(base + ext, tmp)
+                    os.replace(tmp, dst)
+            restored.append(arch)
+        return restored
+
+    @staticmethod
+    def _versions_in(versions_dir, product):
+        """{versión: [archivos]} de un producto en un directorio versions/."""
+        prefix = f"{product}.v"
+        found = {}
+        for fname in os.listdir(versions_dir):
+            if not fname.startswith(prefix):
+                continue
+            number, _, rest = fname[len(prefix):].partition(".")
+            if number.isdigit() and f".{rest}" in ModelService.VERSION_FILES:
+                found.setdefault(int(number), []).append(fname)
+        return found
+
+    @staticmethod
+    def _prune_versions(versions_dir, product, keep):
+        found = ModelService._versions_in(versions_dir, product)
+        for number in sorted(found)[:-keep]:
+            for fname in found[number]:
+                os.remove(os.path.join(versions_dir, fname))
+
+    @staticmethod
+    def calibrate_missing(series, product, LOOKBACK, VAL_DAYS, OUT_DIR, SCALER_DIR):
+        """
+        Calibra las arquitecturas del producto sin calibración vigente (p. ej. modelos previos a
+        la calibración o reutilizados tras cambiar el scaler). Es el único lugar, junto con el
+        entrenamiento, que escribe calibraciones: predict sólo las lee. Retorna las calibradas.
+        """
+        scaler = ModelService.load_scaler(product, SCALER_DIR)
+        if scaler is None:
+            return []
+        arr_z = scaler.transform(np.asarray(series, dtype=np.float32))
+        X, y = ModelService.make_windows(arr_z, LOOKBACK)
+        if len(y) <= VAL_DAYS:
+            return []
+        _, X_va, _, y_va = ModelService.time_split(X, y, VAL_DAYS)
+        done = []
+        for arch in ModelService.ARCHS:
+            model_path = os.path.join(OUT_DIR, arch, f"{product}.keras")
+            calib = CalibrationService.load(product, arch, SCALER_DIR, model_path, scaler, LOOKBACK, VAL_DAYS, arr_z)
+            if (calib is not None and calib["sigma_ok"]) or not os.path.exists(model_path):
+                continue
+            CalibrationService.calibrate(load_model(model_path, compile=False), arch, product, arr_z, X_va, y_va, scaler,
+                                         LOOKBACK, VAL_DAYS, model_path, SCALER_DIR)
+            print(f"[CALIB] {product} {arch}, calibración faltante u obsoleta; recalculada")
+            done.append(arch)
+        return done
+
+    @staticmethod
+    def prepare_product(series, product, LOOKBACK, VAL_DAYS):
+        """
+        Ajusta el scaler (sólo con train) y genera las ventanas con split temporal.
+        Retorna (scaler, arr_z, (X_tr, X_va, y_tr, y_va)) o None si la serie no alcanza.
+        """
+        arr = np.asarray(series, dtype=np.float32)
 
          # Fit scaler SOLO con TRAIN para evitar fuga de datos ---
         split_idx = len(arr) - VAL_DAYS
         if split_idx <= 0:
             print(f"[SKIP] {product}, VAL_DAYS demasiado grande")
-            return
-        
+            return None
+
         train_slice = arr[:split_idx]
         scaler = Scaler(np.mean(train_slice), np.std(train_slice))
 
@@ -299,62 +835,84 @@ class ModelService:
         X, y = ModelService.make_windows(arr_z, LOOKBACK)
         if len(y) <= VAL_DAYS:
             print(f"[SKIP] {product}, muy pocas muestras ({len(y)}) vs VAL_DAYS={VAL_DAYS}")
-            return
+            return None
 
-        X_tr, X_va, y_tr, y_va = ModelService.time_split(X, y, VAL_DAYS)
-        X_tr_seq, X_va_seq = X_tr[..., None], X_va[..., None]
+        return scaler, arr_z, ModelService.time_split(X, y, VAL_DAYS)
 
-        models_to_train = {
-            "MLP": (ModelService.build_mlp(LOOKBACK, LEARNING_RATE), X_tr, X_va),
-            "CNN1D": (ModelService.build_cnn1d(LOOKBACK, LEARNING_RATE), X_tr_seq, X_va_seq),
-            "LSTM": (ModelService.build_lstm(LOOKBACK, LEARNING_RATE), X_tr_seq, X_va_seq),
-            "CNN_LSTM": (ModelService.build_cnn_lstm(LOOKBACK, LEARNING_RATE), X_tr_seq, X_va_seq)
-        }
+    @staticmethod
+    def train_arch(name, arr_z, product, LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, OUT_DIR, LEARNING_RATE, progress=None, HORIZON=90):
+        """
+        Entrena y guarda (de forma atómica) una arquitectura para un producto. Retorna el History.
+        Las ventanas salen de la serie escalada arr_z lote a lote (WindowDataset), sin materializarlas.
+        """
+        from services.window_dataset import WindowDataset
+        from services.training_callbacks import EpochProgress
+        train_ds, val_ds = WindowDataset.split(arr_z, LOOKBACK, HORIZON, VAL_DAYS, BATCH_SIZE, channel=name != "MLP")
+        model = ModelService.build_arch(name, LOOKBACK, LEARNING_RATE, HORIZON)
+
+        print(f"--- Entrenando {name} para {product} ---")
+        fit_callbacks = [callbacks.EarlyStopping(patience=5, restore_best_weights=True)]
+        if progress:
+            fit_callbacks.append(EpochProgress(progress, product, name, EPOCHS))
+        history = model.fit(train_ds, validation_data=val_ds,
+                epochs=EPOCHS, verbose=0, shuffle=False,  # el dataset ya baraja cada época
+                callbacks=fit_callbacks)
+
+         # Guardar modelo
+        out_arch = os.path.join(OUT_DIR, name); os.makedirs(out_arch, exist_ok=True)
+        ModelService.save_model_atomic(model, os.path.join(out_arch, f"{product}.keras"))
+        print(f"Guardado {name} -> {out_arch}/{product}.keras")
+        return history
 
-        # Estructura de métricas
-        metric = {
-            "MLP": {"loss": [], "val_loss": []},
-            "CNN1D": {"loss": [], "val_loss": []},
-            "LSTM": {"loss": [], "val_loss": []},
-            "CNN_LSTM": {"loss": [], "val_loss": []}
+    @staticmethod
+    def builders():
+        return {
+            "MLP": ModelService.build_mlp,
+            "CNN1D": ModelService.build_cnn1d,
+            "LSTM": ModelService.build_lstm,
+            "CNN_LSTM": ModelService.build_cnn_lstm,
         }
 
-        for name,(model,Xtr,Xva) in models_to_train.items():
-            print(f"--- Entrenando {name} para {product} ---")
-            history = model.fit(Xtr, y_tr, validation_data=(Xva,y_va),
-                    epochs=EPOCHS, batch_size=BATCH_SIZE, verbose=0,
-                    callbacks=[callbacks.EarlyStopping(patience=5, restore_best_weights=True)])
-            
-             # Guardar modelo
-            out_arch = os.path.join(OUT_DIR, name); os.makedirs(out_arch, exist_ok=True)
-            model.save(os.path.join(out_arch,f"{product}.keras"), include_optimizer=False)
-            print(f"Guardado {name} -> {out_arch}/{product}.keras")
+    @staticmethod
+    def build_arch(name, input_len, LEARNING_RATE, horizon=90):
+        return ModelService.builders()[name](input_len, LEARNING_RATE, horizon)
 
-            # Guardar pérdidas en metric
-            ModelService.get_model_metrics(name, history, metric)
+    @staticmethod
+    def save_model_atomic(model, path):
+        """
+        Guarda el .keras en un temporal del mismo directorio y lo reemplaza de forma atómica,
+        y exporta sus pesos a .npw para el runtime de inferencia sin TensorFlow.
+        """
+        folder, fname = os.path.split(path)
+        tmp = os.path.join(folder, f".{fname[:-len('.keras')]}.{os.getpid()}.tmp.keras")
+        try:
+            model.save(tmp, include_optimizer=False)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        NumpyNetwork.export(model, NumpyNetwork.weights_path(path), source=path)
 
-        # Guardar scaler (entrenado SOLO con train)
-        with open(os.path.join(SCALER_DIR,f"{product}.json"),"w") as f:
-            json.dump(scaler.to_json(), f)
+    @staticmethod
+    def save_scaler(scaler, product, SCALER_DIR):
+        atomic_write_json(os.path.join(SCALER_DIR, f"{product}.json"), scaler.to_json())
 
-        return metric
-    
     @staticmethod
     def make_windows(arr, lookback=30, horizon=90):
         """
-        Genera ventanas multi-step:
+        Genera ventanas multi-step como vistas con strides sobre 'arr' (sin copiar cada ventana):
         - X: (N, lookback) con los últimos 'lookback' valores
         - y: (N, horizon) con los siguientes 'horizon' valores
+        Las vistas son de sólo lectura y comparten memoria con la serie.
         """
-        arr = np.asarray(arr, dtype=np.float32)
+        arr = np.ascontiguousarray(arr, dtype=np.float32)
         max_i = len(arr) - lookback - horizon + 1
         if max_i <= 0:
             raise ValueError(
                 f"Serie demasiado corta: len(arr)={len(arr)}; se requiere >= {lookback + horizon}"
             )
-        X = [arr[i:i+lookback] for i in range(max_i)]
-        y = [arr[i+lookback:i+lookback+horizon] for i in range(max_i)]
-        return np.array(X, dtype=np.float32), np.array(y, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(arr, lookback + horizon)
+        return windows[:, :lookback], windows[:, lookback:]
 
     @staticmethod
     def time_split(X, y, val_len=90):
@@ -484,9 +1042,63 @@ class ModelService:
     @staticmethod
     def load_arch_model(arch, product, MODELS_DIR):
         path = os.path.join(MODELS_DIR, arch, f"{product}.keras")
-        if not os.path.exists(path):
-            return None
-        return load_model(path, compile=False)
+        return ModelService.load_network(("model", arch, product), path)
+
+    @staticmethod
+    def inference_runtime():
+        """"numpy" (por defecto, sin TensorFlow) o "keras" (INFERENCE_RUNTIME)."""
+        return os.getenv("INFERENCE_RUNTIME", "numpy").lower()
+
+    @staticmethod
+    def load_network(key, path):
+        """
+        Red para inferencia desde el registro: con el runtime NumPy se usa el .npw exportado si
+        corresponde al .keras actual; si falta o quedó obsoleto se carga el .keras (importando
+        TensorFlow) y se vuelve a exportar. Retorna None si no hay artefacto.
+        """
+        npw = NumpyNetwork.weights_path(path)
+        tracked = path if os.path.exists(path) or ModelService.inference_runtime() != "numpy" else npw
+        return model_registry.get(key, tracked, lambda _: ModelService._read_network(path))
+
+    @staticmethod
+    def _read_network(path):
+        npw = NumpyNetwork.weights_path(path)
+        numpy_runtime = ModelService.inference_runtime() == "numpy"
+        if numpy_runtime and NumpyNetwork.is_fresh(npw, path):
+            return NumpyNetwork.load(npw)
+        model = load_model(path, compile=False)
+        if numpy_runtime:
+            try:
+                NumpyNetwork.export(model, npw, source=path)
+                return NumpyNetwork.load(npw)
+            except (OSError, ValueError) as e:
+                print(f"[WARN] no se pudo exportar {path} a .npw ({e}); se usa Keras")
+        return model
+
+    @staticmethod
+    def warmup(MODELS_DIR="./data/models", archs=("MLP", "CNN1D", "LSTM", "CNN_LSTM"), compare=False):
+        """
+        Precarga en el registro los modelos y scalers disponibles
+        (se usa al iniciar la API para que el primer request no sea lento).
+        Sin compare sólo el campeón de los productos que lo tienen (lo que sirve predict).
+        """
+        scalers_dir = os.path.join(MODELS_DIR, "scalers")
+        champions = None if compare else ChampionService.champions(MODELS_DIR)
+        loaded = 0
+        for arch in archs:
+            arch_dir = os.path.join(MODELS_DIR, arch)
+            if not os.path.isdir(arch_dir):
+                continue
+            for fname in sorted(os.listdir(arch_dir)):
+                if not fname.endswith(".keras"):
+                    continue
+                product = fname[:-len(".keras")]
+                if arch not in ModelService.serving_archs(product, archs, champions, MODELS_DIR):
+                    continue
+                if ModelService.load_arch_model(arch, product, MODELS_DIR) is not None:
+                    loaded += 1
+                ModelService.load_scaler(product, scalers_dir)
+        return {"loaded_models": loaded, **model_registry.stats()}
     
     @staticmethod
     def one_step_predict(model, arch, x_window):
@@ -554,19 +1166,16 @@ class ModelService:
     
     @staticmethod
     def load_scaler(product, SCALERS_DIR):
+        """Scaler del producto: archivo suelto (recién entrenado) o, si no hay, el pack mapeado."""
         path = os.path.join(SCALERS_DIR, f"{product}.json")
-        if not os.path.exists(path):
-            return None
+        scaler = model_registry.get(("scaler", product), path, ModelService._read_scaler)
+        if scaler is None:
+            d = ArtifactPack.lookup(SCALERS_DIR, ArtifactPack.scaler_key(product))
+            scaler = Scaler(d["mean"], d["std"]) if d is not None else None
+        return scaler
+
+    @staticmethod
+    def _read_scaler(path):
         with open(path, "r") as f:
             d = json.load(f)
         return Scaler(d["mean"], d["std"])
-    
-    @staticmethod
-    def _safe_mape(y_true, y_pred, eps=1e-8):
-        denom = np.maximum(np.abs(y_true), eps)
-        return float(np.mean(np.abs((y_true - y_pred) / denom)) * 100.0)
-    
-    @staticmethod
-    def _smape(y_true, y_pred, eps=1e-8):
-        denom = np.maximum((np.abs(y_true) + np.abs(y_pred)) / 2.0, eps)
-        return float(np.mean(np.abs(y_true - y_pred) / denom) * 100.0)
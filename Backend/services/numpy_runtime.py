@@ -0,0 +1,333 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+
+class NumpyNetwork:
+    """
+    Runtime de inferencia sin TensorFlow: reproduce en NumPy el forward pass de las redes
+    exportadas (MLP, CNN1D, LSTM, CNN_LSTM y sus variantes globales con embedding).
+    Artefacto <ARCH>/<producto>.npw junto al .keras, pensado para abrirse con mmap:
+    - cabecera: MAGIC + largo (uint64) + JSON con el grafo (capas en orden topológico,
+      configuración mínima y capas de entrada de cada una), las entradas/salidas, el .keras
+      de origen (tamaño y mtime) y la ubicación de cada peso {"<capa>/<i>": [offset, forma]},
+    - pesos float32 contiguos, cada uno alineado a ALIGN bytes.
+    Los pesos se leen como vistas de sólo lectura sobre el archivo mapeado: los workers de
+    uvicorn que cargan el mismo modelo comparten las páginas del page cache del sistema en
+    lugar de tener cada uno su copia en el heap.
+    Expone predict/predict_on_batch como un modelo de Keras para que el resto del
+    código (InferenceEngine, backtest, calibración) no distinga entre ambos; predict_stacked
+    evalúa varias redes con la misma firma en una sola pasada (lotes entre productos).
+    """
+
+    MAGIC = b"NPWEIGHT"
+    ALIGN = 64
+
+    LAYERS = ("InputLayer", "Dense", "Dropout", "Flatten", "Embedding", "Concatenate",
+              "Conv1D", "MaxPooling1D", "GlobalAveragePooling1D", "LSTM")
+    CONFIG_KEYS = ("activation", "padding", "strides", "dilation_rate", "pool_size", "return_sequences",
+                   "recurrent_activation", "use_bias", "axis", "units", "data_format")
+
+    def __init__(self, spec, weights):
+        self.spec = spec
+        self.name = spec.get("name")
+        self.weights = weights
+        self.inputs = spec["inputs"]
+        self.outputs = spec["outputs"]
+        for layer in spec["layers"]:
+            if layer["class_name"] not in NumpyNetwork.LAYERS:
+                raise ValueError(f"capa no soportada por el runtime NumPy: {layer['class_name']}")
+        # pesos de cada capa en orden (por posición: las redes apiladas pueden nombrar distinto sus capas)
+        self._layer_weights = []
+        for layer in spec["layers"]:
+            ws, i = [], 0
+            while f"{layer['name']}/{i}" in weights:
+                ws.append(weights[f"{layer['name']}/{i}"])
+                i += 1
+            self._layer_weights.append(ws)
+        self._signature = None
+
+    # ------------------------------------------------------------------ exportación
+
+    @staticmethod
+    def weights_path(keras_path):
+        return keras_path[:-len(".keras")] + ".npw" if keras_path.endswith(".keras") else keras_path + ".npw"
+
+    @staticmethod
+    def export(model, path, source=None):
+        """
+        Escribe el .npw (de forma atómica) a partir de un modelo de Keras ya entrenado.
+        source: ruta del .keras del que proviene, para detectar luego si quedó obsoleto.
+        """
+        config = model.get_config()
+        layers = []
+        weights = {}
+        by_name = {l.name: l for l in model.layers}
+        for entry in config["layers"]:
+            name = entry["config"]["name"]
+            layer_config = {k: entry["config"][k] for k in NumpyNetwork.CONFIG_KEYS if k in entry["config"]}
+            inbound = []
+            for node in entry.get("inbound_nodes", []):
+                NumpyNetwork._history(node.get("args", []), inbound)
+            layers.append({"name": name, "class_name": entry["class_name"], "config": layer_config, "inbound": inbound})
+            for i, w in enumerate(by_name[name].get_weights()):
+                weights[f"{name}/{i}"] = np.ascontiguousarray(w, dtype=np.float32)
+            if entry["class_name"] not in NumpyNetwork.LAYERS:
+                raise ValueError(f"capa no soportada por el runtime NumPy: {entry['class_name']}")
+
+        # offsets relativos al inicio de la zona de pesos (la cabecera aún no tiene largo conocido)
+        offsets, cursor = {}, 0
+        for key, w in weights.items():
+            offsets[key] = [cursor, list(w.shape)]
+            cursor = NumpyNetwork._align(cursor + w.nbytes)
+
+        spec = {
+            "name": config.get("name"),
+            "layers": layers,
+            "inputs": NumpyNetwork._endpoints(config["input_layers"]),
+            "outputs": NumpyNetwork._endpoints(config["output_layers"]),
+            "source": NumpyNetwork._stat(source) if source else None,
+            "weights": offsets,
+        }
+        header = json.dumps(spec, default=list).encode("utf-8")
+        base = NumpyNetwork._align(len(NumpyNetwork.MAGIC) + 8 + len(header))
+
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(NumpyNetwork.MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for key, w in weights.items():
+                f.write(b"\0" * (base + offsets[key][0] - f.tell()))
+                f.write(w.tobytes())
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def _align(n):
+        return -(-n // NumpyNetwork.ALIGN) * NumpyNetwork.ALIGN
+
+    @staticmethod
+    def _history(args, out):
+        """Nombres de las capas de origen (keras_history) dentro de los argumentos de un nodo."""
+        if isinstance(args, dict):
+            history = args.get("config", {}).get("keras_history") if args.get("class_name") == "__keras_tensor__" else None
+            if history:
+                out.append(history[0])
+            return out
+        if isinstance(args, (list, tuple)):
+            for a in args:
+                NumpyNetwork._history(a, out)
+        return out
+
+    @staticmethod
+    def _endpoints(entries):
+        # una entrada: [nombre, nodo, tensor]; varias: [[nombre, nodo, tensor], ...]
+        if entries and isinstance(entries[0], str):
+            entries = [entries]
+        return [e[0] for e in entries]
+
+    @staticmethod
+    def _stat(path):
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    # ------------------------------------------------------------------ carga
+
+    @staticmethod
+    def read_spec(path):
+        """Cabecera del .npw: (spec, offset de la zona de pesos)."""
+        with open(path, "rb") as f:
+            if f.read(len(NumpyNetwork.MAGIC)) != NumpyNetwork.MAGIC:
+                raise ValueError(f"{path}: no es un archivo .npw")
+            (size,) = struct.unpack("<Q", f.read(8))
+            spec = json.loads(f.read(size).decode("utf-8"))
+        return spec, NumpyNetwork._align(len(NumpyNetwork.MAGIC) + 8 + size)
+
+    @staticmethod
+    def load(path):
+        """Mapea el archivo en memoria (sólo lectura); los pesos son vistas sin copia."""
+        spec, base = NumpyNetwork.read_spec(path)
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        weights = {key: np.ndarray(tuple(shape), dtype=np.float32, buffer=mapped, offset=base + offset)
+                   for key, (offset, shape) in spec.pop("weights").items()}
+        return NumpyNetwork(spec, weights)
+
+    @staticmethod
+    def is_fresh(weights_path, keras_path):
+        """
+        True si el .npw existe y corresponde al .keras actual (mismo tamaño y mtime al exportar).
+        Sin .keras (despliegue sólo con .npw) basta con que exista el .npw.
+        """
+        if not os.path.exists(weights_path):
+            return False
+        if not os.path.exists(keras_path):
+            return True
+        try:
+            source = NumpyNetwork.read_spec(weights_path)[0].get("source")
+        except (OSError, ValueError):
+            return False
+        return source == NumpyNetwork._stat(keras_path)
+
+    # ------------------------------------------------------------------ inferencia
+
+    def predict(self, x, verbose=0, batch_size=None):
+        xs = list(x) if isinstance(x, (list, tuple)) else [x]
+        out = [o[0] for o in NumpyNetwork.predict_stacked([self], [xs])]
+        return out[0] if len(out) == 1 else out
+
+    def predict_on_batch(self, x):
+        return self.predict(x)
+
+    __call__ = predict
+
+    def signature(self):
+        """
+        Grafo y formas de los pesos sin nombres de capa (Keras numera los nombres según el orden
+        de creación): las redes con la misma firma se pueden evaluar apiladas (predict_stacked).
+        """
+        if self._signature is None:
+            position = {layer["name"]: i for i, layer in enumerate(self.spec["layers"])}
+            self._signature = json.dumps([
+                [[layer["class_name"], layer["config"], [position[n] for n in layer["inbound"]],
+                  [w.shape for w in ws]] for layer, ws in zip(self.spec["layers"], self._layer_weights)],
+                [position[n] for n in self.inputs], [position[n] for n in self.outputs],
+            ], default=list, sort_keys=True)
+        return self._signature
+
+    @staticmethod
+    def predict_stacked(networks, inputs):
+        """
+        Forward pass de varias redes con la misma firma en una sola pasada: los pesos se apilan
+        en un eje de red (P, ...) y cada capa es una operación vectorizada sobre todas.
+        inputs: por red, la lista de sus entradas (todas las redes con el mismo tamaño de lote).
+        Retorna una salida (P, N, ...) por cada salida del grafo.
+        Con una sola red los pesos se usan como vistas (sin copia) del archivo mapeado.
+        """
+        first = networks[0]
+        for xs in inputs:
+            if len(xs) != len(first.inputs):
+                raise ValueError(f"se esperaban {len(first.inputs)} entradas; recibido {len(xs)}")
+        values = {name: NumpyNetwork._stack([np.asarray(xs[i]) for xs in inputs]) for i, name in enumerate(first.inputs)}
+        for li, layer in enumerate(first.spec["layers"]):
+            if layer["class_name"] == "InputLayer":
+                continue
+            weights = [NumpyNetwork._stack([net._layer_weights[li][i] for net in networks])
+                       for i in range(len(first._layer_weights[li]))]
+            args = [values[n] for n in layer["inbound"]]
+            values[layer["name"]] = getattr(NumpyNetwork, f"_{layer['class_name'].lower()}")(layer["config"], weights, args)
+        return [values[n] for n in first.outputs]
+
+    @staticmethod
+    def _stack(arrays):
+        return arrays[0][None] if len(arrays) == 1 else np.stack(arrays)
+
+    @staticmethod
+    def _expand(w, ndim):
+        """Peso apilado (P, ...) con ejes unitarios tras el de red hasta tener ndim ejes (broadcasting)."""
+        return w.reshape(w.shape[:1] + (1,) * (ndim - w.ndim) + w.shape[1:])
+
+    @staticmethod
+    def _activation(name, x):
+        if name in (None, "linear"):
+            return x
+        if name == "relu":
+            return np.maximum(x, 0.0)
+        if name == "tanh":
+            return np.tanh(x)
+        if name == "sigmoid":
+            return 1.0 / (1.0 + np.exp(-x))
+        raise ValueError(f"activación no soportada: {name}")
+
+    # capas: x con forma (P, N, ...) (eje de red + lote); pesos apilados (P, ...)
+
+    @staticmethod
+    def _dense(cfg, w, args):
+        x = args[0].astype(np.float32)
+        y = np.matmul(x, NumpyNetwork._expand(w[0], x.ndim))
+        if cfg.get("use_bias", True):
+            y = y + NumpyNetwork._expand(w[1], x.ndim)
+        return NumpyNetwork._activation(cfg.get("activation"), y)
+
+    @staticmethod
+    def _dropout(cfg, w, args):
+        return args[0]  # en inferencia no aplica
+
+    @staticmethod
+    def _flatten(cfg, w, args):
+        x = args[0]
+        return x.reshape(x.shape[0], x.shape[1], -1)
+
+    @staticmethod
+    def _embedding(cfg, w, args):
+        idx = np.asarray(args[0]).astype(np.int64)                           # (P, N, L)
+        nets = np.arange(len(w[0])).reshape((-1,) + (1,) * (idx.ndim - 1))
+        return w[0][nets, idx]                                               # (P, N, L, dim)
+
+    @staticmethod
+    def _concatenate(cfg, w, args):
+        axis = cfg.get("axis", -1)
+        return np.concatenate(args, axis=axis + 1 if axis >= 0 else axis)
+
+    @staticmethod
+    def _conv1d(cfg, w, args):
+        if tuple(cfg.get("strides", (1,))) != (1,) or tuple(cfg.get("dilation_rate", (1,))) != (1,):
+            raise ValueError("Conv1D: sólo strides=1 y dilation_rate=1")
+        kernel = w[0]                            # (P, k, entrada, filtros)
+        k = kernel.shape[1]
+        x = args[0].astype(np.float32)           # (P, N, T, C)
+        padding = cfg.get("padding", "valid")
+        if padding == "causal":
+            x = np.pad(x, ((0, 0), (0, 0), (k - 1, 0), (0, 0)))
+        elif padding == "same":
+            x = np.pad(x, ((0, 0), (0, 0), ((k - 1) // 2, k // 2), (0, 0)))
+        patches = np.lib.stride_tricks.sliding_window_view(x, k, axis=2)   # (P, N, T', C, k)
+        y = np.einsum("pntck,pkcf->pntf", patches, kernel, optimize=True)
+        if cfg.get("use_bias", True):
+            y = y + NumpyNetwork._expand(w[1], y.ndim)
+        return NumpyNetwork._activation(cfg.get("activation"), y)
+
+    @staticmethod
+    def _maxpooling1d(cfg, w, args):
+        pool = int(np.ravel(cfg.get("pool_size", 2))[0])
+        strides = cfg.get("strides")
+        stride = int(np.ravel(strides)[0]) if strides is not None else pool
+        if cfg.get("padding", "valid") != "valid":
+            raise ValueError("MaxPooling1D: sólo padding='valid'")
+        windows = np.lib.stride_tricks.sliding_window_view(args[0], pool, axis=2)[:, :, ::stride]   # (P, N, T', C, pool)
+        return windows.max(axis=-1)
+
+    @staticmethod
+    def _globalaveragepooling1d(cfg, w, args):
+        return args[0].mean(axis=2)
+
+    @staticmethod
+    def _lstm(cfg, w, args):
+        kernel, recurrent = w[0], w[1]                     # (P, C, 4u), (P, u, 4u)
+        units = recurrent.shape[1]
+        act, rec_act = cfg.get("activation", "tanh"), cfg.get("recurrent_activation", "sigmoid")
+
+        x = args[0].astype(np.float32)                     # (P, N, T, C)
+        p, n, steps = x.shape[:3]
+        xw = np.matmul(x, NumpyNetwork._expand(kernel, 4)) # (P, N, T, 4u): entradas de todos los pasos a la vez
+        if cfg.get("use_bias", True):
+            xw = xw + NumpyNetwork._expand(w[2], 4)
+        h = np.zeros((p, n, units), dtype=np.float32)
+        c = np.zeros((p, n, units), dtype=np.float32)
+        seq = np.empty((p, n, steps, units), dtype=np.float32) if cfg.get("return_sequences") else None
+        for t in range(steps):
+            z = xw[:, :, t] + np.matmul(h, recurrent)
+            i = NumpyNetwork._activation(rec_act, z[..., :units])              # orden de Keras: i, f, c, o
+            f = NumpyNetwork._activation(rec_act, z[..., units:2 * units])
+            g = NumpyNetwork._activation(act, z[..., 2 * units:3 * units])
+            o = NumpyNetwork._activation(rec_act, z[..., 3 * units:])
+            c = f * c + i * g
+            h = o * NumpyNetwork._activation(act, c)
+            if seq is not None:
+                seq[:, :, t] = h
+        return seq if seq is not None else h
+
+    def __repr__(self):
+        return f"NumpyNetwork(name={self.name}, layers={len(self.spec['layers'])}, inputs={self.inputs})"
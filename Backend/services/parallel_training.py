@@ -0,0 +1,87 @@
+import os
+import time
+import multiprocessing as mp
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+class ParallelTrainer:
+    """
+    Entrenamiento multi-proceso de tareas (producto, arquitectura).
+    Cada worker limita los hilos intra/inter-op de TensorFlow para que los
+    procesos no se pisen entre sí. Este módulo no importa TensorFlow: se carga
+    dentro de cada worker después de configurar los hilos.
+    """
+
+    @staticmethod
+    def default_workers():
+        return max(1, int(os.getenv("TRAINING_WORKERS", "1")))
+
+    @staticmethod
+    def thread_budget(workers):
+        intra = os.getenv("TRAINING_INTRA_OP_THREADS")
+        inter = os.getenv("TRAINING_INTER_OP_THREADS")
+        intra = int(intra) if intra else max(1, (os.cpu_count() or 1) // workers)
+        inter = int(inter) if inter else 1
+        return intra, inter
+
+    @staticmethod
+    def run(tasks, workers, on_result):
+        """
+        Ejecuta las tareas en un pool 'spawn' (TensorFlow no es fork-safe) y llama
+        on_result(res) en el proceso padre a medida que terminan. Si on_result lanza
+        una excepción (p. ej. cancelación) se cancelan las tareas pendientes.
+        """
+        if not tasks:
+            return
+        intra, inter = ParallelTrainer.thread_budget(workers)
+        pool = ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)),
+            mp_context=mp.get_context("spawn"),
+            initializer=ParallelTrainer._init_worker,
+            initargs=(intra, inter),
+        )
+        try:
+            futures = [pool.submit(ParallelTrainer._train_task, **task) for task in tasks]
+            for fut in as_completed(futures):
+                on_result(fut.result())
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+
+    @staticmethod
+    def _init_worker(intra, inter):
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra)
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter)
+        os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+    @staticmethod
+    def _train_task(product, arch, arr_z, scaler, SCALER_DIR, config):
+        from models.Scaler import Scaler
+        from services.model_service import ModelService
+        from services.calibration_service import CalibrationService
+
+        started = time.perf_counter()
+        X, y = ModelService.make_windows(arr_z, config["LOOKBACK"])
+        windows = ModelService.time_split(X, y, config["VAL_DAYS"])
+        history = ModelService.train_arch(
+            arch, arr_z, product, config["LOOKBACK"], config["VAL_DAYS"], config["EPOCHS"],
+            config["BATCH_SIZE"], config["OUT_DIR"], config["LEARNING_RATE"],
+        )
+        model_path = os.path.join(config["OUT_DIR"], arch, f"{product}.keras")
+        CalibrationService.calibrate(
+            history.model, arch, product, arr_z, windows[1], windows[3],
+            Scaler(scaler["mean"], scaler["std"]), config["LOOKBACK"], config["VAL_DAYS"], model_path, SCALER_DIR,
+        )
+        return {
+            "product": product,
+            "arch": arch,
+            "loss": [float(v) for v in history.history.get("loss", [])],
+            "val_loss": [float(v) for v in history.history.get("val_loss", [])],
+            "path": model_path,
+            "seconds": time.perf_counter() - started,
+        }
@@ -0,0 +1,165 @@
+import os
+
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
+from repositories.sale_repository import SaleRepository
+from repositories.sale_rollup_repository import SaleRollupRepository
+from services.forecast_cache import ForecastCache
+from models.calendar_cube import CalendarCube
+from utils.utils import period_range, calc_variacion, PERIOD_GRANULARITIES, PERIOD_MONTHS
+
+# Cubo de calendario y conteos de facturas por periodo, por marca de agua de ventas
+period_cache = ForecastCache(max_items=int(os.getenv("PERIOD_CACHE_MAX_ITEMS", "128")))
+
+class PeriodService:
+    """
+    Comparación de periodos (día/semana/mes/trimestre/cuatrimestre/semestre/año) sobre
+    un cubo de calendario con sumas prefijas: montos, cantidades y líneas de cualquier
+    periodo salen del cubo sin consultar la base; las facturas únicas de todos los
+    periodos pedidos se resuelven en una sola consulta agregada (exacta para rangos
+    cortos, con sketches HyperLogLog diarios para rangos largos).
+    """
+
+    MEASURES = ("quantity", "total", "lines", "invoices")
+
+    @staticmethod
+    def cube(db: Session):
+        """Cubo diario de toda la historia, reconstruido sólo cuando llegan ventas nuevas."""
+        watermark = SaleRepository.get_watermark(db, exact_count=False)
+        period_cache.observe_watermark(watermark)
+        key = period_cache.make_key("cube", watermark)
+        cube = period_cache.get(key)
+        if cube is None:
+            rows = SaleRollupRepository.source(db).get_daily_totals(db)
+            cube = CalendarCube.from_daily_rows(rows, PeriodService.MEASURES)
+            period_cache.set(key, cube)
+        return cube, watermark
+
+    @staticmethod
+    def compare(db: Session, granularity="quarter", reference_date=None, periods=3, daily_start=None, daily_end=None):
+        """
+        Los 'periods' periodos que terminan en el que contiene reference_date (por defecto
+        la última fecha con ventas), con variación % respecto al periodo anterior, y una serie
+        diaria año contra año (facturas únicas y monto) para [daily_start, daily_end]
+        (por defecto desde el inicio del periodo más antiguo hasta la fecha de referencia).
+        """
+        if granularity not in PERIOD_GRANULARITIES and granularity not in PERIOD_MONTHS:
+            raise ValueError(f"granularidad inválida: {granularity}; usar una de {PERIOD_GRANULARITIES}")
+        if periods < 1:
+            raise ValueError("periods debe ser >= 1")
+
+        cube, watermark = PeriodService.cube(db)
+        if cube.n_days == 0:
+            return {"granularity": granularity, "reference_date": None, "periods": [], "daily": None}
+        ref = PeriodService._as_date(reference_date) or cube.end
+
+        # periodo de referencia y anteriores (+1 para la variación del más antiguo)
+        windows = []
+        d = ref
+        for _ in range(periods + 1):
+            start, end, index = period_range(d, granularity)
+            windows.append((start, end, index))
+            d = start - timedelta(days=1)
+
+        invoices = PeriodService._range_invoices(db, cube, watermark, [(s, e) for s, e, _ in windows])
+
+        rows = []
+        for i in range(periods):
+            start, end, index = windows[i]
+            prev_start, prev_end, _ = windows[i + 1]
+            total = cube.total("total", start, end)
+            prev_total = cube.total("total", prev_start, prev_end)
+            rows.append({
+                "index": index,
+                "label": f"{granularity} {index}, {start.isoformat()} → {end.isoformat()}",
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "total_sales": round(total, 2),
+                "quantity": int(cube.total("quantity", start, end)),
+                "lines": int(cube.total("lines", start, end)),
+                "invoices": invoices[i][0],
+                "invoices_error": invoices[i][1],  # None = exacto; si no, error estándar relativo del sketch
+                "sales_rate": calc_variacion(round(total, 2), round(prev_total, 2)),
+                "invoice_rate": calc_variacion(invoices[i][0], invoices[i + 1][0]),
+            })
+
+        ds = PeriodService._as_date(daily_start) or windows[periods - 1][0]
+        de = PeriodService._as_date(daily_end) or ref
+        return {
+            "granularity": granularity,
+            "reference_date": ref.isoformat(),
+            "periods": rows,
+            "daily": PeriodService.year_over_year(cube, ds, de),
+        }
+
+    @staticmethod
+    def year_over_year(cube, start, end):
+        """
+        Serie diaria de [start, end] contra el mismo (mes, día) del año anterior, en columnas.
+        Se lee del cubo (sin consultas); los 29 de febrero sin par en el año anterior quedan en 0.
+        """
+        if end < start:
+            raise ValueError("daily_end debe ser >= daily_start")
+        dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        last_start, last_end = start - relativedelta(years=1), end - relativedelta(years=1)
+        last_dates = [last_start + timedelta(days=i) for i in range((last_end - last_start).days + 1)]
+
+        out = {"start": start.isoformat(), "end": end.isoformat(), "dates": [d.isoformat() for d in dates]}
+        for name, key in (("invoices", "invoices"), ("total", "sales")):
+            current = cube.daily(name, start, end)
+            last = dict(zip(((d.month, d.day) for d in last_dates), cube.daily(name, last_start, last_end)))
+            cast = int if name == "invoices" else (lambda v: round(float(v), 2))
+            out[f"{key}_current_year"] = [cast(v) for v in current]
+            out[f"{key}_last_year"] = [cast(last.get((d.month, d.day), 0)) for d in dates]
+        return out
+
+    @staticmethod
+    def exact_max_days():
+        """Rangos con hasta HLL_EXACT_MAX_DAYS días con ventas se cuentan de forma exacta; los demás con sketches."""
+        return int(os.getenv("HLL_EXACT_MAX_DAYS", "186"))
+
+    @staticmethod
+    def _range_invoices(db, cube, watermark, ranges):
+        """
+        Facturas únicas por rango, cacheadas por marca de agua:
+        - rangos cortos: conteo exacto (una consulta para todos),
+        - rangos largos (con rollup): unión de los sketches HyperLogLog diarios.
+        Corto/largo se decide por los días con ventas del rango (según el cubo), no por su
+        largo en el calendario: un periodo en curso o con huecos sigue siendo exacto.
+        Retorna una lista de (facturas, error estándar relativo o None si es exacto).
+        """
+        key = period_cache.make_key("invoices", watermark, ranges, PeriodService.exact_max_days(),
+                                    SaleRollupRepository.sketch_precision())
+        cached = period_cache.get(key)
+        if cached is not None:
+            return cached
+
+        source = SaleRollupRepository.source(db)
+        labels = dict(enumerate(ranges))
+        long_ranges = {}
+        if source is SaleRollupRepository:
+            long_ranges = {i: r for i, r in labels.items()
+                           if cube.days_with("lines", r[0], r[1]) > PeriodService.exact_max_days()}
+        short_ranges = {i: r for i, r in labels.items() if i not in long_ranges}
+
+        result = [None] * len(ranges)
+        if short_ranges:
+            for i, n in source.get_range_invoices(db, short_ranges).items():
+                result[i] = (n, None)
+        if long_ranges:
+            estimates, error = source.estimate_range_invoices(db, long_ranges)
+            for i, n in estimates.items():
+                result[i] = (n, error)
+        period_cache.set(key, result)
+        return result
+
+    @staticmethod
+    def _as_date(d):
+        if d is None:
+            return None
+        if isinstance(d, datetime):
+            return d.date()
+        if isinstance(d, str):
+            return date.fromisoformat(d)
+        return d
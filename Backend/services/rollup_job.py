@@ -0,0 +1,56 @@
+import os
+import threading
+import traceback
+
+from repositories.sale_rollup_repository import SaleRollupRepository
+
+
+class RollupJob:
+    """
+    Mantiene el rollup diario al día fuera de las lecturas: un hilo por proceso que corre
+    SaleRollupRepository.catch_up cada SALES_ROLLUP_INTERVAL segundos (0 lo desactiva; queda
+    la carga de ventas y `python -m cli.rollup catch-up`, p. ej. desde cron).
+    Con varios workers cada uno tiene su hilo; el lock de base de datos de catch_up los
+    serializa y el que llega después sólo revisa el margen de ids.
+    """
+
+    def __init__(self, session_factory, interval):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, session_factory):
+        return cls(session_factory, float(os.getenv("SALES_ROLLUP_INTERVAL", "60")))
+
+    def start(self):
+        if self.interval <= 0 or not SaleRollupRepository.enabled() or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name="sales-rollup", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_once(self):
+        db = self.session_factory()
+        try:
+            return SaleRollupRepository.catch_up(db)
+        finally:
+            db.close()
+
+    def _run(self):
+        # la primera pasada al arrancar deja el rollup al día antes de las primeras lecturas
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                print("[WARN] catch-up del rollup falló:")
+                traceback.print_exc()
+            if self._stop.wait(self.interval):
+                return
@@ -1,15 +1,32 @@
+import os
+
 from sqlalchemy.orm import Session
 from repositories.sale_repository import SaleRepository
+from repositories.sale_rollup_repository import SaleRollupRepository
+from services.forecast_cache import ForecastCache
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-from utils.utils import ( getRangeIndex, range_summary, calc_variacion, group_daily_distinct_invoices)
+from utils.utils import ( getRangeIndex, calc_variacion )
+
+# Dashboards ya calculados por (fecha de referencia, tipo de rango, marca de agua de ventas)
+dashboard_cache = ForecastCache(max_items=int(os.getenv("DASHBOARD_CACHE_MAX_ITEMS", "64")))
 
 class SaleService:
 
     @staticmethod
-    def getDashboardSummary(db: Session):
+    def getDashboardSummary(db: Session, reference_date=None, range_type="Trimestre"):
         #current_date = date.today()
         current_date = datetime(2025, 3, 31)
+        if reference_date is not None:
+            current_date = datetime(reference_date.year, reference_date.month, reference_date.day)
+
+        # Cache: sólo se recalcula si llegan ventas nuevas (marca de agua resuelta por índice)
+        watermark = SaleRepository.get_watermark(db, exact_count=False)
+        dashboard_cache.observe_watermark(watermark)
+        cache_key = dashboard_cache.make_key("dashboard", current_date.date(), range_type, watermark)
+        cached = dashboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         dashboard = {
             "current_quarter_range": "",
@@ -26,40 +43,37 @@ class SaleService:
         }
 
         # Obtener rango actual
-        anual_range_1 = getRangeIndex(current_date, "Trimestre") # Based on the current date
+        anual_range_1 = getRangeIndex(current_date, range_type) # Based on the current date
         print(f"{anual_range_1['index']} {anual_range_1['range']}, {anual_range_1['start_range']} → {anual_range_1['end_range']}")
         dashboard["current_quarter_range"] = f"{anual_range_1['range']} {anual_range_1['index']}, {anual_range_1['start_range']} → {anual_range_1['end_range']}"
 
         # Obtener rango pasado
-        anual_range_2 = getRangeIndex( datetime.strptime(anual_range_1['start_range'], "%Y-%m-%d") - timedelta(days=1), "Trimestre")
+        anual_range_2 = getRangeIndex( datetime.strptime(anual_range_1['start_range'], "%Y-%m-%d") - timedelta(days=1), range_type)
         print(f"{anual_range_2['index']} {anual_range_2['range']}, {anual_range_2['start_range']} → {anual_range_2['end_range']}")
         dashboard["last_quarter_range"] = f"{anual_range_2['range']} {anual_range_2['index']}, {anual_range_2['start_range']} → {anual_range_2['end_range']}"
 
         # Obtener rango antepasado
-        anual_range_3 = getRangeIndex( datetime.strptime(anual_range_2['start_range'], "%Y-%m-%d") - timedelta(days=1), "Trimestre")
+        anual_range_3 = getRangeIndex( datetime.strptime(anual_range_2['start_range'], "%Y-%m-%d") - timedelta(days=1), range_type)
         print(f"{anual_range_3['index']} {anual_range_3['range']}, {anual_range_3['start_range']} → {anual_range_3['end_range']}")
 
-        ventas = SaleRepository.get_all_by_range(db, datetime.strptime(anual_range_3['start_range'], "%Y-%m-%d"), datetime.strptime(anual_range_1['end_range'], "%Y-%m-%d"))
+        # Convertir strings de los rangos a fechas
+        start_1 = datetime.strptime(anual_range_1['start_range'], "%Y-%m-%d").date()
+        end_1   = datetime.strptime(anual_range_1['end_range'], "%Y-%m-%d").date()
 
-        # Convertir strings de los rangos a datetime
-        start_1 = datetime.strptime(anual_range_1['start_range'], "%Y-%m-%d")
-        end_1   = datetime.strptime(anual_range_1['end_range'], "%Y-%m-%d")
+        start_2 = datetime.strptime(anual_range_2['start_range'], "%Y-%m-%d").date()
+        end_2   = datetime.strptime(anual_range_2['end_range'], "%Y-%m-%d").date()
 
-        start_2 = datetime.strptime(anual_range_2['start_range'], "%Y-%m-%d")
-        end_2   = datetime.strptime(anual_range_2['end_range'], "%Y-%m-%d")
+        start_3 = datetime.strptime(anual_range_3['start_range'], "%Y-%m-%d").date()
+        end_3   = datetime.strptime(anual_range_3['end_range'], "%Y-%m-%d").date()
 
-        start_3 = datetime.strptime(anual_range_3['start_range'], "%Y-%m-%d")
-        end_3   = datetime.strptime(anual_range_3['end_range'], "%Y-%m-%d")
+        # Rollup diario si está al día (o la tabla cruda si no lo está o SALES_ROLLUP=0)
+        source = SaleRollupRepository.source(db)
 
-        # Filtrar ventas para cada rango
-        ventas_range_1 = [v for v in ventas if start_1 <= v.sale_date <= end_1]
-        ventas_range_2 = [v for v in ventas if start_2 <= v.sale_date <= end_2]
-        ventas_range_3 = [v for v in ventas if start_3 <= v.sale_date <= end_3]
-
-        # Calcular resumen de cada rango
-        r1_total, r1_facturas, r1_monto = range_summary(ventas_range_1)
-        r2_total, r2_facturas, r2_monto = range_summary(ventas_range_2)
-        r3_total, r3_facturas, r3_monto = range_summary(ventas_range_3)
+        # Resumen de los tres rangos con consultas agregadas (registros, facturas únicas, monto)
+        totals = source.get_range_totals(db, {1: (start_1, end_1), 2: (start_2, end_2), 3: (start_3, end_3)})
+        r1_total, r1_facturas, r1_monto = totals[1]
+        r2_total, r2_facturas, r2_monto = totals[2]
+        r3_total, r3_facturas, r3_monto = totals[3]
 
         # Variaciones entre rangos
         var_facturas_r1_r2 = calc_variacion(r1_facturas, r2_facturas)
@@ -88,24 +102,30 @@ class SaleService:
         prev_start = current_date - relativedelta(years=1, months=3)
         prev_end   = current_date - relativedelta(years=1)
 
-        ventas_current = SaleRepository.get_all_by_range(db, cur_start, cur_end)
-        ventas_last = SaleRepository.get_all_by_range(db, prev_start, prev_end)
-
-        map_curr = group_daily_distinct_invoices(ventas_current)
-        map_last = group_daily_distinct_invoices(ventas_last)
+        # Facturas únicas por día de ambos periodos (GROUP BY fecha)
+        daily = source.get_daily_invoice_counts(db, [(cur_start.date(), cur_end.date()), (prev_start.date(), prev_end.date())])
+        map_curr = {}
+        map_last = {}
+        for d, n in daily.items():
+            d = d.date() if isinstance(d, datetime) else d  # columna DATE o TIMESTAMP
+            if cur_start.date() <= d <= cur_end.date():
+                map_curr[(d.month, d.day)] = n
+            if prev_start.date() <= d <= prev_end.date():
+                map_last[(d.month, d.day)] = n
 
         d = cur_start
         while d <= cur_end:
             key = (d.month, d.day)
             dashboard["sales"].append({
                 "date": d.strftime("%Y-%m-%d"),
-                "current_year": len(map_curr.get(key, set())),
-                "last_year":    len(map_last.get(key, set()))
+                "current_year": map_curr.get(key, 0),
+                "last_year":    map_last.get(key, 0)
             })
             d += timedelta(days=1)
 
         for row in dashboard["sales"][:50]:
             print(row)
 
+        dashboard_cache.set(cache_key, dashboard)
         return dashboard
 
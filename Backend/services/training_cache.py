@@ -0,0 +1,95 @@
+import os
+import json
+import hashlib
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+from services.artifact_pack import ArtifactPack
+from utils.utils import atomic_write_json
+
+
+class TrainingCache:
+    """
+    Cache de entrenamiento direccionado por contenido.
+    Cada producto entrenado deja un manifiesto (data/models/manifests/<producto>.json) con:
+    - hash de la serie de entrada (desde la primera hasta la última venta),
+    - hash de la configuración (LOOKBACK, VAL_DAYS, EPOCHS, BATCH_SIZE, LEARNING_RATE
+      y la definición de cada arquitectura),
+    - historiales de pérdida por arquitectura.
+    Si ambos hashes coinciden y los artefactos existen, el producto no se reentrena.
+    Los días finales sin ventas no cambian el hash: un SKU sin ventas nuevas se reutiliza.
+    """
+
+    @staticmethod
+    def manifest_path(product, OUT_DIR):
+        return os.path.join(OUT_DIR, "manifests", f"{product}.json")
+
+    @staticmethod
+    def load_manifest(product, OUT_DIR):
+        path = TrainingCache.manifest_path(product, OUT_DIR)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def series_hash(series, origin):
+        arr = np.asarray(series, dtype=np.float32)
+        nz = np.flatnonzero(arr)
+        if len(nz) == 0:
+            return hashlib.sha256(b"empty").hexdigest()
+        first = pd.Timestamp(origin) + pd.Timedelta(days=int(nz[0]))
+        h = hashlib.sha256(first.strftime("%Y-%m-%d").encode("utf-8"))
+        h.update(np.ascontiguousarray(arr[nz[0]:nz[-1] + 1]).tobytes())
+        return h.hexdigest()
+
+    @staticmethod
+    def config_hash(config, builders):
+        """Hash de los hiperparámetros y del código que define cada arquitectura."""
+        archs = {name: hashlib.sha256(inspect.getsource(fn).encode("utf-8")).hexdigest()
+                 for name, fn in sorted(builders.items())}
+        raw = json.dumps({"config": config, "archs": archs}, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def reusable(product, series_hash, config_hash, archs, OUT_DIR, SCALER_DIR):
+        """
+        Retorna las métricas guardadas {arch: {"loss", "val_loss"}} si el producto
+        puede reutilizarse sin reentrenar; None en caso contrario.
+        """
+        manifest = TrainingCache.load_manifest(product, OUT_DIR)
+        if manifest is None:
+            return None
+        if manifest.get("series_hash") != series_hash or manifest.get("config_hash") != config_hash:
+            return None
+        if (not os.path.exists(os.path.join(SCALER_DIR, f"{product}.json"))
+                and ArtifactPack.lookup(SCALER_DIR, ArtifactPack.scaler_key(product)) is None):
+            return None
+        metrics = {}
+        for arch in archs:
+            entry = manifest.get("archs", {}).get(arch)
+            if entry is None or not os.path.exists(os.path.join(OUT_DIR, arch, f"{product}.keras")):
+                return None
+            metrics[arch] = {"loss": entry.get("loss", []), "val_loss": entry.get("val_loss", [])}
+        return metrics
+
+    @staticmethod
+    def save(product, series_hash, config_hash, metrics, OUT_DIR, **extra):
+        os.makedirs(os.path.join(OUT_DIR, "manifests"), exist_ok=True)
+        manifest = {
+            "product": product,
+            "series_hash": series_hash,
+            "config_hash": config_hash,
+            "trained_at": datetime.now().isoformat(timespec="seconds"),
+            "archs": {arch: {"loss": m.get("loss", []), "val_loss": m.get("val_loss", [])}
+                      for arch, m in (metrics or {}).items()},
+            **extra,
+        }
+        atomic_write_json(TrainingCache.manifest_path(product, OUT_DIR), manifest)
+        return manifest
@@ -0,0 +1,24 @@
+from tensorflow.keras import callbacks
+
+
+class EpochProgress(callbacks.Callback):
+    """Callback de Keras que reporta el avance de cada época a una función 'progress'."""
+
+    def __init__(self, progress, product, arch, epochs):
+        super().__init__()
+        self.progress = progress
+        self.product = product
+        self.arch = arch
+        self.epochs = epochs
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        self.progress({
+            "event": "epoch",
+            "product": self.product,
+            "arch": self.arch,
+            "epoch": epoch + 1,
+            "epochs": self.epochs,
+            "loss": float(logs["loss"]) if "loss" in logs else None,
+            "val_loss": float(logs["val_loss"]) if "val_loss" in logs else None,
+        })
@@ -0,0 +1,193 @@
+import os
+import json
+import uuid
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.utils import atomic_write_json
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+class TrainingJobStore:
+    """
+    Persistencia local de los jobs de entrenamiento: un JSON por job en 'jobs_dir'.
+    Las escrituras son atómicas (archivo temporal + os.replace).
+    """
+
+    def __init__(self, jobs_dir):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def save(self, job):
+        atomic_write_json(os.path.join(self.jobs_dir, f"{job['id']}.json"), job)
+
+    def load_all(self):
+        jobs = {}
+        for fname in sorted(os.listdir(self.jobs_dir)):
+            if not fname.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, fname), "r") as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            jobs[job["id"]] = job
+        return jobs
+
+
+class TrainingJobManager:
+    """
+    Ejecuta build_models como job en segundo plano sobre un pool local de workers.
+    - Estado y avance por producto (época, loss actual) consultables mientras corre.
+    - Cancelación cooperativa: se corta al final de la época en curso.
+    - El estado se guarda en disco; los jobs que estaban en curso al reiniciar
+      el proceso quedan marcados como 'interrupted'.
+    """
+
+    ACTIVE = ("queued", "running")
+
+    def __init__(self, store, max_workers=1):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="training-job")
+        self._lock = threading.RLock()
+        self._cancel = {}
+        self._jobs = store.load_all()
+        for job in self._jobs.values():
+            if job["status"] in self.ACTIVE:
+                job["status"] = "interrupted"
+                job["finished_at"] = self._now()
+                self.store.save(job)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            TrainingJobStore(os.getenv("TRAINING_JOBS_DIR", "./data/jobs")),
+            max_workers=int(os.getenv("TRAINING_JOB_WORKERS", "1")),
+        )
+
+    def submit(self, products=None, workers=None, force=False, incremental=False, tiered=False):
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "products": list(products) if products else None,
+            "workers": workers,
+            "force": bool(force),
+            "incremental": bool(incremental),
+            "tiered": bool(tiered),
+            "created_at": self._now(),
+            "started_at": None,
+            "finished_at": None,
+            "current": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._cancel[job["id"]] = threading.Event()
+            self.store.save(job)
+        self._pool.submit(self._run, job["id"])
+        return self.status(job["id"])
+
+    def status(self, job_id):
+        """Estado del job sin el resultado final (que puede ser grande)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in json.loads(json.dumps(job)).items() if k != "result"}
+
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else job.get("result")
+
+    def list(self):
+        with self._lock:
+            ids = sorted(self._jobs, key=lambda i: self._jobs[i]["created_at"], reverse=True)
+        return [self.status(i) for i in ids]
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] == "queued":
+                self._finish(job, "cancelled")
+            if job_id in self._cancel:
+                self._cancel[job_id].set()
+        return self.status(job_id)
+
+    def _run(self, job_id):
+        # imports diferidos: TensorFlow sólo se carga al ejecutar un job
+        from database import SessionLocal
+        from services.model_service import ModelService
+
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] != "queued":
+                return
+            job["status"] = "running"
+            job["started_at"] = self._now()
+            self.store.save(job)
+
+        db = SessionLocal()
+        try:
+            result = ModelService.build_models(db, products=job["products"], workers=job.get("workers"), force=job.get("force", False),
+                                               incremental=job.get("incremental", False), tiered=job.get("tiered", False),
+                                               progress=lambda e: self._on_progress(job_id, e))
+            with self._lock:
+                job["result"] = result
+                self._finish(job, "completed")
+        except TrainingCancelled:
+            with self._lock:
+                self._finish(job, "cancelled")
+        except Exception as exc:
+            traceback.print_exc()
+            with self._lock:
+                job["error"] = f"{type(exc).__name__}: {exc}"
+                self._finish(job, "failed")
+        finally:
+            db.close()
+
+    def _on_progress(self, job_id, event):
+        with self._lock:
+            job = self._jobs[job_id]
+            product = event["product"]
+            entry = job["progress"].setdefault(product, {"status": "pending", "archs": {}})
+            if event["event"] == "product_start":
+                entry["status"] = "running"
+                job["current"] = {"product": product}
+            elif event["event"] == "epoch":
+                entry["archs"][event["arch"]] = {
+                    "epoch": event["epoch"],
+                    "epochs": event["epochs"],
+                    "loss": event["loss"],
+                    "val_loss": event["val_loss"],
+                }
+                job["current"] = {k: event[k] for k in ("product", "arch", "epoch", "epochs", "loss", "val_loss")}
+            elif event["event"] == "product_done":
+                entry["status"] = event["status"]
+            self.store.save(job)
+
+            if self._cancel[job_id].is_set():
+                raise TrainingCancelled(job_id)
+
+    def _finish(self, job, status):
+        job["status"] = status
+        job["finished_at"] = self._now()
+        job["current"] = None
+        self._cancel.pop(job["id"], None)
+        self.store.save(job)
+
+    @staticmethod
+    def _now():
+        return datetime.now().isoformat(timespec="seconds")
+
+
+training_jobs = TrainingJobManager.from_env()
@@ -0,0 +1,93 @@
+import numpy as np
+import tensorflow as tf
+
+
+class WindowDataset:
+    """
+    Pipeline tf.data de ventanas (X, y) para entrenar sin materializar la matriz de ventanas:
+    - la serie escalada se guarda una sola vez como tensor (n valores),
+    - el dataset recorre posiciones de inicio de ventana (enteros) y cada lote arma sus
+      ventanas con un gather [pos, pos + lookback + horizon) en el momento,
+    - prefetch solapa la preparación del siguiente lote con el paso de entrenamiento.
+    La memoria queda en O(n + batch · (lookback + horizon)) en lugar de
+    O(ventanas · (lookback + horizon)), y el mismo pipeline sirve a las cuatro
+    arquitecturas (channel=True agrega el eje de canal de las secuenciales).
+    """
+
+    @staticmethod
+    def n_windows(n, lookback, horizon):
+        return n - lookback - horizon + 1
+
+    @staticmethod
+    def split_positions(n, lookback, horizon, val_len):
+        """Posiciones de inicio de train y validación con el mismo corte que ModelService.time_split."""
+        total = WindowDataset.n_windows(n, lookback, horizon)
+        if val_len <= 0 or val_len >= total:
+            raise ValueError(f"val_len inválido: {val_len} (total muestras={total})")
+        return np.arange(0, total - val_len), np.arange(total - val_len, total)
+
+    @staticmethod
+    def make(series, lookback, horizon, positions, batch_size, channel=False, shuffle=False, seed=None):
+        """
+        Dataset de lotes (X, y) con las ventanas que empiezan en 'positions':
+        X: (lote, lookback[, 1]) e y: (lote, horizon). shuffle re-baraja las posiciones en cada época
+        (como model.fit con arreglos).
+        """
+        series = tf.constant(np.asarray(series, dtype=np.float32))
+        positions = np.asarray(positions, dtype=np.int64)
+        offsets = tf.range(lookback + horizon, dtype=tf.int64)
+
+        def windows(pos):
+            w = tf.gather(series, pos[:, None] + offsets[None, :])
+            X = w[:, :lookback]
+            return (X[..., None] if channel else X), w[:, lookback:]
+
+        ds = tf.data.Dataset.from_tensor_slices(positions)
+        if shuffle:
+            ds = ds.shuffle(len(positions), seed=seed, reshuffle_each_iteration=True)
+        return (ds.batch(batch_size)
+                  .map(windows, num_parallel_calls=tf.data.AUTOTUNE)
+                  .prefetch(tf.data.AUTOTUNE))
+
+    @staticmethod
+    def make_many(series_list, ids, lookback, horizon, positions_list, batch_size, channel=False, shuffle=False, seed=None):
+        """
+        Igual que make para varias series (modelo global): las series van concatenadas en un
+        único tensor, las posiciones de cada una se desplazan a su tramo (ninguna ventana cruza
+        de una serie a otra) y cada ventana lleva el id de su serie.
+        Lotes ((X, id), y) con id: (lote, 1) int32.
+        """
+        starts = np.cumsum([0] + [len(s) for s in series_list[:-1]])
+        series = tf.constant(np.concatenate([np.asarray(s, dtype=np.float32) for s in series_list]))
+        positions = np.concatenate([np.asarray(p, dtype=np.int64) + s for p, s in zip(positions_list, starts)])
+        pids = np.concatenate([np.full(len(p), i, dtype=np.int32) for p, i in zip(positions_list, ids)])
+        offsets = tf.range(lookback + horizon, dtype=tf.int64)
+
+        def windows(pos, pid):
+            w = tf.gather(series, pos[:, None] + offsets[None, :])
+            X = w[:, :lookback]
+            return ((X[..., None] if channel else X), pid[:, None]), w[:, lookback:]
+
+        ds = tf.data.Dataset.from_tensor_slices((positions, pids))
+        if shuffle:
+            ds = ds.shuffle(len(positions), seed=seed, reshuffle_each_iteration=True)
+        return (ds.batch(batch_size)
+                  .map(windows, num_parallel_calls=tf.data.AUTOTUNE)
+                  .prefetch(tf.data.AUTOTUNE))
+
+    @staticmethod
+    def split_many(series_list, ids, lookback, horizon, val_len, batch_size, channel=False, seed=None):
+        """(train, validación) de varias series con el mismo corte por serie que split. Retorna también el total de ventanas de train."""
+        splits = [WindowDataset.split_positions(len(s), lookback, horizon, val_len) for s in series_list]
+        tr = [t for t, _ in splits]
+        va = [v for _, v in splits]
+        return (WindowDataset.make_many(series_list, ids, lookback, horizon, tr, batch_size, channel, shuffle=True, seed=seed),
+                WindowDataset.make_many(series_list, ids, lookback, horizon, va, batch_size, channel),
+                int(sum(len(t) for t in tr)))
+
+    @staticmethod
+    def split(series, lookback, horizon, val_len, batch_size, channel=False, seed=None):
+        """(train, validación) para model.fit: train barajado, validación en orden."""
+        tr, va = WindowDataset.split_positions(len(series), lookback, horizon, val_len)
+        return (WindowDataset.make(series, lookback, horizon, tr, batch_size, channel, shuffle=True, seed=seed),
+                WindowDataset.make(series, lookback, horizon, va, batch_size, channel))
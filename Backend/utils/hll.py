@@ -0,0 +1,105 @@
+import math
+import hashlib
+
+import numpy as np
+
+
+class HyperLogLog:
+    """
+    Sketch HyperLogLog para contar valores distintos (p. ej. números de factura) en
+    memoria constante: m = 2^p registros de 1 byte, error estándar relativo ≈ 1.04/√m.
+    Los sketches con la misma precisión se combinan con el máximo por registro, así que
+    el conteo de un rango de días es la unión (merge) de los sketches diarios.
+    """
+
+    MIN_P = 7          # menor precisión de los sketches nuevos (m >= 128)
+    MIN_READ_P = 4     # sketches ya guardados con HLL_ERROR grande se siguen leyendo
+    MAX_P = 16
+    # alpha tabulado para m < 128; la fórmula 0.7213 / (1 + 1.079/m) sólo vale para m >= 128
+    SMALL_ALPHA = {16: 0.673, 32: 0.697, 64: 0.709}
+
+    def __init__(self, p=12, registers=None):
+        if not HyperLogLog.MIN_READ_P <= p <= HyperLogLog.MAX_P:
+            raise ValueError(f"precisión fuera de rango: {p}")
+        self.p = p
+        self.m = 1 << p
+        if registers is None:
+            self.registers = np.zeros(self.m, dtype=np.uint8)
+        else:
+            self.registers = np.frombuffer(registers, dtype=np.uint8).copy() if isinstance(registers, (bytes, bytearray, memoryview)) \
+                else np.asarray(registers, dtype=np.uint8).copy()
+            if len(self.registers) != self.m:
+                raise ValueError(f"se esperaban {self.m} registros; recibido {len(self.registers)}")
+
+    @staticmethod
+    def precision_for_error(error):
+        """Menor precisión p cuyo error estándar relativo es <= error."""
+        p = math.ceil(math.log2((1.04 / error) ** 2))
+        return min(max(p, HyperLogLog.MIN_P), HyperLogLog.MAX_P)
+
+    @staticmethod
+    def relative_error(p):
+        return 1.04 / math.sqrt(1 << p)
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, value):
+        self.add_many([value])
+
+    def add_many(self, values):
+        p, regs = self.p, self.registers
+        rest_bits = 64 - p
+        mask = (1 << rest_bits) - 1
+        for value in values:
+            h = HyperLogLog._hash(value)
+            idx = h >> rest_bits
+            rank = rest_bits - (h & mask).bit_length() + 1  # posición del primer 1 en los bits restantes
+            if rank > regs[idx]:
+                regs[idx] = rank
+        return self
+
+    def merge(self, other):
+        """Unión en el lugar (máximo por registro); ambas con la misma precisión."""
+        if other.p != self.p:
+            other = other.fold(self.p) if other.p > self.p else other
+            if other.p != self.p:
+                raise ValueError(f"no se puede combinar p={other.p} en p={self.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def fold(self, p):
+        """Reduce la precisión a p (< self.p) combinando registros; permite unir sketches de distinta precisión."""
+        if p == self.p:
+            return self
+        if p > self.p:
+            raise ValueError("sólo se puede reducir la precisión")
+        shift = self.p - p
+        regs = self.registers.reshape(1 << p, 1 << shift).astype(np.int16)
+        # los bits de índice que se pierden pasan a formar parte del valor: si no son todos 0
+        # el rango queda determinado por ellos (1..shift); si son 0 se suma shift al rango previo
+        low = np.arange(1 << shift)
+        low_rank = np.where(low == 0, 0, shift - np.floor(np.log2(np.maximum(low, 1))).astype(np.int16))
+        ranks = np.where(regs == 0, 0, np.where(low_rank[None, :] == 0, regs + shift, low_rank[None, :]))
+        return HyperLogLog(p, ranks.max(axis=1).astype(np.uint8))
+
+    def count(self):
+        """Estimación del número de valores distintos (con corrección de rango pequeño)."""
+        m = float(self.m)
+        alpha = HyperLogLog.SMALL_ALPHA.get(self.m) or 0.7213 / (1.0 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, p, data):
+        return cls(p, data)
+
+    def __repr__(self):
+        return f"HyperLogLog(p={self.p}, m={self.m}, estimate={self.count()})"
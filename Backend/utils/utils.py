@@ -1,4 +1,9 @@
-from datetime import date
+import os
+import json
+import importlib
+
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
 
 def getRangeIndex(d: date, range: str) -> int:
     month = d.month
@@ -32,6 +37,32 @@ def getRangeIndex(d: date, range: str) -> int:
 
     return index
 
+# Granularidades de periodo (con alias en español de getRangeIndex) → meses por periodo
+PERIOD_MONTHS = {"month": 1, "mes": 1, "quarter": 3, "Trimestre": 3, "trimestre": 3,
+                 "4-month": 4, "cuatrimestre": 4, "half": 6, "semestre": 6, "year": 12, "anio": 12}
+PERIOD_GRANULARITIES = ("day", "week", "month", "quarter", "4-month", "half", "year")
+
+def period_range(d: date, granularity: str):
+    """
+    Periodo del calendario que contiene la fecha d.
+    Retorna (inicio, fin, índice) con fechas inclusivas; el índice es el número
+    del periodo dentro del año (día del año, semana ISO, mes, trimestre, ...).
+    """
+    if isinstance(d, datetime):
+        d = d.date()
+    if granularity in ("day", "dia"):
+        return d, d, d.timetuple().tm_yday
+    if granularity in ("week", "semana"):
+        start = d - timedelta(days=d.weekday())
+        return start, start + timedelta(days=6), d.isocalendar()[1]
+    months = PERIOD_MONTHS.get(granularity)
+    if months is None:
+        raise ValueError(f"granularidad inválida: {granularity}; usar una de {PERIOD_GRANULARITIES}")
+    index = (d.month - 1) // months
+    start = date(d.year, index * months + 1, 1)
+    end = start + relativedelta(months=months) - timedelta(days=1)
+    return start, end, index + 1
+
 def range_summary(ventas):
     total_registros = len(ventas)
     facturas_unicas = len({v.invoice_number for v in ventas})
@@ -62,3 +93,33 @@ def build_daily_series(df, product):
          .sort_index()["quantity"]
          .asfreq("D", fill_value=0.0))
     return s
+
+def atomic_write_json(path, obj):
+    """
+    Escribe JSON en un temporal del mismo directorio y lo reemplaza de forma atómica,
+    así nunca queda visible un archivo a medio escribir.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self._name} ({'cargado' if self._module is not None else 'sin cargar'})>"
+
+def lazy_module(name):
+    """
+    Módulo que se importa recién al usar uno de sus atributos (p. ej. tensorflow.keras.layers):
+    así importar un servicio no carga TensorFlow si sólo se usa para inferencia.
+    """
+    return _LazyModule(name)